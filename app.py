@@ -1,15 +1,26 @@
 import streamlit as st
-from config.database import init_database, verificar_tabla_control
-from sqlalchemy import text
+from config.database import verificar_tabla_control
+from config import repositorio as repo
+from config.registro import obtener_logger
 
-# Inicializar base de datos al iniciar la app - MÁS ROBUSTO
+log = obtener_logger('app')
+
+# Verificar el esquema (una consulta a schema_version por proceso; las
+# migraciones se aplican al desplegar con 'python migrar.py')
 try:
-    init_database()
-    # Verificar específicamente la tabla de control
-    verificar_tabla_control()
-    st.success("✅ Base de datos inicializada correctamente")
+    if verificar_tabla_control():
+        st.success("✅ Base de datos inicializada correctamente")
+    else:
+        st.warning("⚠️ Hay migraciones de base de datos pendientes: ejecuta `python migrar.py`")
 except Exception as e:
-    st.error(f"❌ Error inicializando base de datos: {e}")
+    log.exception("verificar_base_error")
+    st.error(f"❌ Error verificando base de datos: {e}")
+
+# Sincronización y asignación de turnos en segundo plano (una vez por proceso)
+from config.worker import iniciar_worker_en_hilo
+from config.metricas import iniciar_servidor_metricas
+iniciar_worker_en_hilo()
+iniciar_servidor_metricas()
 
 # Configurar página principal
 st.set_page_config(
@@ -42,21 +53,20 @@ st.markdown("""
 
 # Verificar conexión a base de datos
 from config.database import get_db_engine
+from utils.helpers import seleccionar_sede
 engine = get_db_engine()
 if engine:
     st.success("✅ **Base de datos:** Conectada correctamente")
     
-    # Mostrar estadísticas rápidas
+    # Mostrar estadísticas rápidas de la sede
+    sede = seleccionar_sede()
     try:
         with engine.connect() as conn:
-            result = conn.execute(text("SELECT COUNT(*) FROM turnos WHERE estado = 'espera'"))
-            en_espera = result.fetchone()[0]
-            
-            result = conn.execute(text("SELECT COUNT(*) FROM turnos WHERE estado = 'llamando'"))
-            llamando = result.fetchone()[0]
-            
-            result = conn.execute(text("SELECT COUNT(*) FROM turnos WHERE estado = 'atendido'"))
-            atendidos = result.fetchone()[0]
+            # Contadores de hoy mantenidos en cada cambio de estado: no recorre el histórico
+            conteos = {estado: int(cantidad) for estado, cantidad in conn.execute(repo.CONTAR_POR_ESTADO, {"sede": sede})}
+            en_espera = conteos.get('espera', 0)
+            llamando = conteos.get('llamando', 0)
+            atendidos = conteos.get('atendido', 0)
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -64,9 +74,10 @@ if engine:
             with col2:
                 st.metric("📢 Llamando", llamando)
             with col3:
-                st.metric("✅ Atendidos", atendidos)
+                st.metric("✅ Atendidos hoy", atendidos)
                 
     except Exception as e:
+        log.exception("estadisticas_error")
         st.error(f"Error obteniendo estadísticas: {e}")
 else:
     st.error("❌ **Base de datos:** No conectada")
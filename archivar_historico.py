@@ -0,0 +1,36 @@
+"""
+Pasa a las tablas de histórico los turnos atendidos y filas de control de días anteriores
+Uso: python archivar_historico.py [--dias 0] [--lote 1000] [--pausa 0.1] [--verificar]
+Pensado para ejecutarse cada noche (cron); los lotes son transacciones cortas, así
+que también puede correr con el servicio abierto. Los reportes sobre todo el
+histórico usan las vistas turnos_todos y control_todos.
+"""
+
+import sys
+import argparse
+from config.archivo import archivar, contar_archivables, dia_de_corte, ARCHIVO_DIAS, ARCHIVO_LOTE, ARCHIVO_PAUSA
+from config.conexiones import cerrar_engines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archivo de turnos y control de días anteriores")
+    parser.add_argument("--dias", type=int, default=ARCHIVO_DIAS, help="Días anteriores a hoy que se conservan")
+    parser.add_argument("--lote", type=int, default=ARCHIVO_LOTE, help="Filas por transacción")
+    parser.add_argument("--pausa", type=float, default=ARCHIVO_PAUSA, help="Segundos entre lotes")
+    parser.add_argument("--verificar", action="store_true", help="Solo cuenta lo que se archivaría")
+    args = parser.parse_args()
+
+    try:
+        print(f"📦 Archivando lo anterior a {dia_de_corte(args.dias)}")
+        if args.verificar:
+            pendientes = contar_archivables(args.dias)
+            if pendientes is None:
+                sys.exit(1)
+            print(f"   {pendientes[0]} turnos atendidos y {pendientes[1]} filas de control por archivar")
+        else:
+            movidos = archivar(args.dias, args.lote, args.pausa)
+            if movidos is None:
+                print("❌ Error archivando (los lotes terminados ya quedaron en el histórico)")
+                sys.exit(1)
+            print(f"✅ {movidos['turnos']} turnos y {movidos['control']} filas de control archivados")
+    finally:
+        cerrar_engines()
@@ -0,0 +1,209 @@
+"""
+Benchmark de las operaciones principales con presupuesto de sentencias SQL
+Uso: python benchmark_operaciones.py [--historico 50000] [--registros 1000]
+                                     [--repeticiones 20] [--salida benchmark_resultados.json]
+                                     [--comparar resultados_anteriores.json]
+Crea una base SQLite temporal con volúmenes realistas (turnos históricos y
+registros externos de hoy) y mide tiempo y sentencias de: sincronización,
+asignación, llamar, atender, refresco de pantalla, cola de taquillas y panel.
+Falla (código 1) si alguna operación supera su presupuesto de sentencias, para
+que una regresión N+1 se detecte en CI. Los resultados quedan en JSON para
+comparar entre commits.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+# Presupuesto de sentencias por operación: fijas + por_fila * filas procesadas
+# (filas = registros leídos en la sincronización, personas en la asignación).
+# La asignación hace 5 sentencias por lote de 50 personas con un solo módulo, más
+# una por cada (sede, módulo) adicional del lote
+PRESUPUESTOS = {
+    'sincronizar': (1, 1 / 500),
+    'asignar': (1, 5 / 50),
+    'llamar': (8, 0),
+    'atender': (6, 0),
+    'tablero': (2, 0),
+    'cola': (3, 0),
+    'panel': (3, 0),
+}
+
+TAQUILLAS = 8
+
+
+def _percentil(valores, porcentaje):
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(len(ordenados) * porcentaje / 100) - 1)
+    return ordenados[indice]
+
+
+def _presupuesto(operacion, filas):
+    fijas, por_fila = PRESUPUESTOS[operacion]
+    return fijas + math.ceil(por_fila * filas)
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Mediciones:
+    """Tiempos y sentencias de cada ejecución, agrupados por operación"""
+
+    def __init__(self):
+        self.datos = {}
+
+    def medir(self, operacion, funcion, *args, filas=None):
+        from config.metricas import medir
+
+        with medir(f"benchmark_{operacion}") as medicion:
+            inicio = time.perf_counter()
+            resultado = funcion(*args)
+            segundos = time.perf_counter() - inicio
+        cantidad = filas(resultado) if filas else 0
+        self.datos.setdefault(operacion, []).append((segundos, medicion.sentencias, cantidad))
+        return resultado
+
+    def resumen(self):
+        resultados = {}
+        for operacion, ejecuciones in self.datos.items():
+            tiempos = [segundos * 1000 for segundos, _, _ in ejecuciones]
+            peor = max(ejecuciones, key=lambda e: e[1] - _presupuesto(operacion, e[2]))
+            presupuesto = _presupuesto(operacion, peor[2])
+            resultados[operacion] = {
+                'ejecuciones': len(ejecuciones),
+                'ms_p50': round(_percentil(tiempos, 50), 3),
+                'ms_p95': round(_percentil(tiempos, 95), 3),
+                'ms_max': round(max(tiempos), 3),
+                'sentencias_max': max(sentencias for _, sentencias, _ in ejecuciones),
+                'sentencias_peor': peor[1],
+                'filas_peor': peor[2],
+                'presupuesto': presupuesto,
+                'ok': peor[1] <= presupuesto,
+            }
+        return resultados
+
+
+def _preparar(historico, registros):
+    from config.database import get_db_engine, get_external_db_engine, inicializar_contadores_turnos
+    from config.base_local import preparar_base_local, sembrar_historico, registrar_externos
+
+    engine = get_db_engine()
+    preparar_base_local(engine, get_external_db_engine())
+    inicializar_contadores_turnos()
+    sembrar_historico(engine, historico, semilla=1)
+    registrar_externos(get_external_db_engine(), registros, prefijo='BENCH-', semilla=1)
+
+
+def correr_benchmark(historico, registros, repeticiones):
+    """Ejecuta todas las operaciones y devuelve el resumen por operación"""
+    from config.database import (
+        sincronizar_control_externo, obtener_personas_pendientes, llamar_siguiente_turno,
+        marcar_turno_atendido, obtener_version_tablero, obtener_llamados_recientes,
+        obtener_cola_turnos
+    )
+    from config.vistas import obtener_estadisticas_panel
+    from config.asignacion import asignar_turnos
+
+    print(f"🌱 Sembrando {historico} turnos históricos y {registros} registros externos...")
+    _preparar(historico, registros)
+    mediciones = Mediciones()
+
+    # Ingreso: la primera pasada inserta, las siguientes reconcilian sin cambios
+    for _ in range(repeticiones):
+        mediciones.medir('sincronizar', sincronizar_control_externo, filas=lambda r: r['leidos'])
+
+    # Asignación por ciclos del worker (cada ciclo toma el siguiente lote de pendientes)
+    for _ in range(repeticiones):
+        personas = obtener_personas_pendientes()
+        if not personas:
+            break
+        mediciones.medir('asignar', asignar_turnos, personas, filas=lambda _: len(personas))
+
+    # Taquillas: llamar y atender en rotación
+    for i in range(repeticiones):
+        taquilla = f"Taquilla {i % TAQUILLAS + 1}"
+        turno = mediciones.medir('llamar', llamar_siguiente_turno, taquilla)
+        if turno[1] is not None:
+            mediciones.medir('atender', marcar_turno_atendido, turno[1])
+
+    # Lecturas de las páginas
+    siguiente = None
+    for _ in range(repeticiones):
+        mediciones.medir('tablero', lambda: (obtener_version_tablero(), obtener_llamados_recientes(5)))
+        cola = mediciones.medir('cola', obtener_cola_turnos, siguiente)
+        siguiente = cola['siguiente']
+        mediciones.medir('panel', obtener_estadisticas_panel)
+
+    return mediciones.resumen()
+
+
+def _imprimir(resultados, anteriores=None):
+    print(f"{'operación':<12} {'p50 ms':>9} {'p95 ms':>9} {'sent.':>6} {'presup.':>8}  {'vs anterior':>11}")
+    for operacion, datos in resultados.items():
+        comparacion = ''
+        previo = (anteriores or {}).get(operacion)
+        if previo and previo['ms_p50']:
+            comparacion = f"x{datos['ms_p50'] / previo['ms_p50']:.2f}"
+        estado = '✅' if datos['ok'] else '❌'
+        print(f"{operacion:<12} {datos['ms_p50']:>9.3f} {datos['ms_p95']:>9.3f} "
+              f"{datos['sentencias_peor']:>6} {datos['presupuesto']:>8}  {comparacion:>11} {estado}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de operaciones con presupuesto de sentencias")
+    parser.add_argument("--historico", type=int, default=50000, help="Turnos históricos sembrados")
+    parser.add_argument("--registros", type=int, default=1000, help="Registros externos de hoy")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Ejecuciones por operación")
+    parser.add_argument("--salida", default="benchmark_resultados.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="benchmark_turnos_")
+    url = f"sqlite:///{os.path.join(directorio, 'benchmark.db')}"
+    os.environ['DATABASE_URL'] = url
+    os.environ['EXTERNAL_DATABASE_URL'] = url
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    # Los módulos de config se importan después de fijar la base y el nivel de log
+    from config.conexiones import cerrar_engines
+
+    try:
+        resultados = correr_benchmark(args.historico, args.registros, args.repeticiones)
+    finally:
+        cerrar_engines()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    anteriores = None
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            anteriores = json.load(archivo)['operaciones']
+    _imprimir(resultados, anteriores)
+
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump({
+            'commit': _commit_actual(),
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'base': 'sqlite',
+            'historico': args.historico,
+            'registros': args.registros,
+            'repeticiones': args.repeticiones,
+            'operaciones': resultados,
+        }, archivo, indent=2, ensure_ascii=False)
+    print(f"📄 Resultados en {args.salida}")
+
+    exito = all(datos['ok'] for datos in resultados.values())
+    print("✅ PRESUPUESTOS CUMPLIDOS" if exito else "❌ ALGUNA OPERACIÓN SUPERÓ SU PRESUPUESTO")
+    sys.exit(0 if exito else 1)
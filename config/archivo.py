@@ -0,0 +1,116 @@
+"""
+Archivo de días anteriores: turnos atendidos y filas de control de antes del día
+de corte pasan, por lotes, a turnos_historico y control_turnos_externos_historico,
+así las tablas operativas solo guardan el trabajo del día (y los turnos que siguen
+abiertos). Cada lote es una transacción
+corta (copiar, borrar y descontar contadores_estado), para no bloquear a las
+taquillas si se ejecuta con el servicio abierto. Los reportes sobre todo el
+histórico leen las vistas turnos_todos y control_todos.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.exc import SQLAlchemyError
+from config.database import get_db_engine
+from config import repositorio as repo
+from config.registro import obtener_logger
+
+log = obtener_logger('archivo')
+
+ARCHIVO_DIAS = int(os.getenv('ARCHIVO_DIAS', '0'))        # días anteriores a hoy que se quedan en las tablas operativas
+ARCHIVO_LOTE = int(os.getenv('ARCHIVO_LOTE', '1000'))     # filas por transacción
+ARCHIVO_PAUSA = float(os.getenv('ARCHIVO_PAUSA', '0.1'))  # segundos entre lotes
+
+
+def dia_de_corte(dias=None):
+    """Primer día que se queda en las tablas operativas (hoy con ARCHIVO_DIAS=0)"""
+    dias = ARCHIVO_DIAS if dias is None else dias
+    return datetime.now().date() - timedelta(days=dias)
+
+
+def contar_archivables(dias=None):
+    """(turnos atendidos, filas de control) anteriores al día de corte; None si falla"""
+    engine = get_db_engine()
+    if not engine:
+        return None
+
+    dia = dia_de_corte(dias)
+    try:
+        with engine.connect() as conn:
+            turnos, control = conn.execute(
+                repo.CONTAR_ARCHIVABLES, {"corte": datetime.combine(dia, datetime.min.time()), "dia": dia}
+            ).fetchone()
+        return int(turnos), int(control)
+    except SQLAlchemyError as e:
+        log.error("contar_archivables_error", error=e)
+        return None
+
+
+def _archivar_lote_turnos(conn, corte, lote):
+    """Mueve un lote de turnos atendidos anteriores a `corte`. Devuelve cuántos movió (0 = terminado)."""
+    with conn.begin():
+        fin = conn.execute(repo.FIN_LOTE_TURNOS, {"corte": corte, "lote": lote}).fetchone()
+        if not fin:
+            return 0
+        params = {"corte": corte, "fecha": fin[0], "id": fin[1]}
+        conteos = conn.execute(repo.CONTEOS_LOTE_TURNOS, params).fetchall()
+        conn.execute(repo.ARCHIVAR_TURNOS, params)
+        movidos = conn.execute(repo.BORRAR_TURNOS_ARCHIVADOS, params).rowcount
+        conn.execute(repo.DESCONTAR_CONTADOR_ESTADO, [
+            {"sede": sede, "dia": dia, "modulo": modulo, "estado": estado, "cantidad": cantidad}
+            for sede, dia, modulo, estado, cantidad in conteos
+        ])
+    return movidos
+
+
+def _archivar_lote_control(conn, dia, lote):
+    """Mueve un lote de filas de control anteriores a `dia`. Devuelve cuántas movió (0 = terminado)."""
+    with conn.begin():
+        hasta = conn.execute(repo.FIN_LOTE_CONTROL, {"dia": dia, "lote": lote}).scalar()
+        if hasta is None:
+            return 0
+        params = {"dia": dia, "hasta": hasta}
+        conn.execute(repo.ARCHIVAR_CONTROL, params)
+        return conn.execute(repo.BORRAR_CONTROL_ARCHIVADO, params).rowcount
+
+
+def archivar(dias=None, lote=None, pausa=None):
+    """
+    Pasa al histórico los turnos atendidos creados y las filas de control leídas antes
+    del día de corte (ver dia_de_corte), en lotes de `lote` filas con `pausa` segundos
+    entre uno y otro. Devuelve {'turnos': n, 'control': n}; None si falla (los
+    lotes ya terminados quedan archivados y la siguiente ejecución sigue desde ahí).
+    """
+    lote = lote or ARCHIVO_LOTE
+    pausa = ARCHIVO_PAUSA if pausa is None else pausa
+    engine = get_db_engine()
+    if not engine:
+        return None
+
+    dia = dia_de_corte(dias)
+    corte = datetime.combine(dia, datetime.min.time())
+    movidos = {'turnos': 0, 'control': 0}
+    inicio = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            for tabla, archivar_lote, limite in (
+                ('turnos', _archivar_lote_turnos, corte),
+                ('control', _archivar_lote_control, dia),
+            ):
+                while True:
+                    cantidad = archivar_lote(conn, limite, lote)
+                    if not cantidad:
+                        break
+                    movidos[tabla] += cantidad
+                    log.debug("lote_archivado", tabla=tabla, filas=cantidad)
+                    time.sleep(pausa)
+            # Los días archivados completos quedan en cero
+            with conn.begin():
+                conn.execute(repo.BORRAR_CONTADORES_VACIOS)
+    except SQLAlchemyError as e:
+        log.error("archivar_error", dia_corte=dia, error=e, **movidos)
+        return None
+
+    log.info("archivo", dia_corte=dia, segundos=round(time.perf_counter() - inicio, 3), **movidos)
+    return movidos
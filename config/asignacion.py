@@ -0,0 +1,135 @@
+import os
+import time
+from collections import Counter
+from sqlalchemy.exc import SQLAlchemyError
+from config import repositorio as repo
+from config.registro import obtener_logger
+from config.metricas import medir
+from config.database import (
+    get_db_engine, reservar_numeros, sincronizar_y_obtener_personas_ordenadas, limpiar_cache_personas
+)
+
+log = obtener_logger('asignacion')
+
+ASIGNACION_LOTE = int(os.getenv('ASIGNACION_LOTE', '50'))  # personas por transacción de asignación
+
+def modulo_para_tema(tema_solicitud):
+    """Módulo (letra del turno) según el tema de solicitud"""
+    if tema_solicitud == 'Legalización fondo':
+        return 'P'
+    return 'A'  # 'Inscripción convocatoria' o cualquier otro
+
+def _nombre_simple(persona):
+    """nombre1 + apellido1, tolerando nulos"""
+    nombre1 = str(persona[1]).strip() if persona[1] is not None else ''
+    apellido1 = str(persona[3]).strip() if persona[3] is not None else ''
+    return f"{nombre1} {apellido1}".strip()
+
+def _asignar_lote(conn, lote):
+    """
+    Asigna turnos a un lote de personas en la transacción abierta de `conn`, con un
+    número fijo de sentencias: reclamo de las filas de control, documentos con turno
+    pendiente (un IN), reserva de números por (sede, módulo), INSERT multi-fila de
+    turnos, contadores por estado y un UPDATE de las filas de control. Conserva el
+    orden del lote y, como antes, una persona con turno de hoy en espera o llamando
+    (también si aparece dos veces en el lote) solo se marca como procesada.
+    Solo se asignan las filas de control que esta transacción reclamó: las que otro
+    asignador (worker de otro proceso o contenedor) ya tomó o procesó se saltan.
+    Devuelve (asignados, omitidos).
+    """
+    reclamadas = {fila[0] for fila in conn.execute(
+        repo.reclamar_lote_control(len(lote)), {f"id_{i}": persona[0] for i, persona in enumerate(lote)}
+    )}
+    lote = [persona for persona in lote if persona[0] in reclamadas]
+    if not lote:
+        return 0, 0
+
+    documentos = {f"doc_{i}": persona[5] for i, persona in enumerate(lote)}
+    con_turno = {fila[0] for fila in conn.execute(repo.pendientes_hoy_documentos(len(lote)), documentos)}
+    
+    nuevos, omitidos = [], []
+    for persona in lote:
+        if persona[5] in con_turno:
+            log.fila("persona_con_turno_pendiente", documento=persona[5], id_control=persona[0])
+            omitidos.append(persona)
+            continue
+        con_turno.add(persona[5])
+        nuevos.append((persona, modulo_para_tema(persona[6])))
+    
+    # Un bloque contiguo de números por (sede, módulo), repartido en el orden del lote
+    cantidades = Counter((persona[7], modulo) for persona, modulo in nuevos)
+    siguiente = {
+        (sede, modulo): reservar_numeros(conn, modulo, cantidad, sede)
+        for (sede, modulo), cantidad in cantidades.items()
+    }
+    params_turnos, params_control = {}, {}
+    for i, (persona, modulo) in enumerate(nuevos):
+        clave = (persona[7], modulo)
+        numero = f"{siguiente[clave]:03d}"
+        siguiente[clave] += 1
+        params_turnos.update({
+            f"sede_{i}": persona[7], f"modulo_{i}": modulo, f"numero_{i}": numero,
+            f"nombre_{i}": _nombre_simple(persona), f"cedula_{i}": persona[5], f"tramite_{i}": persona[6]
+        })
+        params_control.update({f"id_{i}": persona[0], f"turno_{i}": f"{modulo}{numero}"})
+        log.fila("turno_asignado", sede=persona[7], turno=f"{modulo}{numero}", documento=persona[5], id_control=persona[0], tema=persona[6])
+    params_control.update({f"omitido_{j}": persona[0] for j, persona in enumerate(omitidos)})
+    
+    if nuevos:
+        conn.execute(repo.insertar_lote_turnos(len(nuevos)), params_turnos)
+        conn.execute(repo.SUMAR_CONTADOR_ESTADO_HOY, [
+            {"sede": sede, "modulo": modulo, "estado": 'espera', "cantidad": cantidad}
+            for (sede, modulo), cantidad in cantidades.items()
+        ])
+    marcadas = conn.execute(repo.marcar_lote_control(len(nuevos), len(omitidos)), params_control).rowcount
+    if marcadas != len(lote):
+        # Las filas reclamadas están bloqueadas: si no coinciden, se deshace el lote completo
+        raise SQLAlchemyError(f"se marcaron {marcadas} de {len(lote)} filas de control reclamadas")
+    return len(nuevos), len(omitidos)
+
+@medir('asignar')
+def asignar_turnos(personas, tamano_lote=None):
+    """
+    Asigna turnos a las personas pendientes de la tabla de control, en el orden recibido,
+    en lotes de ASIGNACION_LOTE personas (una transacción por lote, ver _asignar_lote).
+    Si un lote falla no se asigna nadie de ese lote: sus filas de control siguen
+    pendientes para el próximo ciclo. Devuelve cuántos turnos se asignaron.
+    """
+    if not personas:
+        log.debug("asignacion_sin_personas")
+        return 0
+    
+    tamano_lote = tamano_lote or ASIGNACION_LOTE
+    turnos_asignados = omitidos = errores = 0
+    inicio = time.perf_counter()
+    engine = get_db_engine()
+    if not engine:
+        return 0
+    
+    for desde in range(0, len(personas), tamano_lote):
+        lote = personas[desde:desde + tamano_lote]
+        try:
+            with engine.connect() as conn:
+                with conn.begin():
+                    asignados, omitidos_lote = _asignar_lote(conn, lote)
+            turnos_asignados += asignados
+            omitidos += omitidos_lote
+        except SQLAlchemyError as e:
+            log.error("asignar_lote_error", personas=len(lote), primer_id_control=lote[0][0], error=e)
+            errores += len(lote)
+    
+    log.info(
+        "asignacion",
+        personas=len(personas), asignados=turnos_asignados, omitidos=omitidos,
+        errores=errores, segundos=round(time.perf_counter() - inicio, 3)
+    )
+    return turnos_asignados
+
+def asignar_turnos_rapido():
+    """Sincroniza con la lista externa y asigna turnos - USANDO TABLA DE CONTROL"""
+    # LIMPIAR CACHE ANTES DE ASIGNAR
+    limpiar_cache_personas()
+    
+    # Obtener personas EN ORDEN CORRECTO desde la tabla de control
+    personas = sincronizar_y_obtener_personas_ordenadas()
+    return asignar_turnos(personas)
@@ -0,0 +1,80 @@
+"""
+Lecturas concurrentes con asyncio sobre los pools compartidos de config/conexiones.py.
+Cada lectura corre en un hilo del executor con su propia conexión, así una
+página que necesita varias consultas independientes (o la vista externa y la
+tabla de control a la vez) tarda lo que la más lenta y no la suma.
+No usa un driver async: mysql-connector es bloqueante y los pools, métricas y
+dialectos ya existen sobre el engine síncrono. ASYNC_HILOS limita cuántas
+conexiones extra pueden pedir estas lecturas en todo el proceso.
+"""
+
+import os
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from config.metricas import operaciones_activas, heredar_operaciones
+
+ASYNC_HILOS = int(os.getenv('ASYNC_HILOS', '8'))
+
+_loop = None
+_lock = threading.Lock()
+# Operaciones medidas del hilo que llamó a ejecutar(), para contar allí las sentencias
+_operaciones_llamador = contextvars.ContextVar('operaciones_llamador', default=[])
+
+
+def _obtener_loop():
+    """Loop de asyncio del proceso, en un hilo daemon propio (se crea una sola vez)"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=ASYNC_HILOS, thread_name_prefix='lecturas'))
+            threading.Thread(target=loop.run_forever, name='asyncio', daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def ejecutar(corrutina):
+    """
+    Corre una corrutina desde código síncrono (páginas de Streamlit, worker,
+    scripts) y devuelve su resultado. Las sentencias de sus lecturas cuentan en
+    las operaciones medidas del hilo que llama.
+    """
+    operaciones = operaciones_activas()
+
+    async def _con_operaciones():
+        _operaciones_llamador.set(operaciones)
+        return await corrutina
+
+    return asyncio.run_coroutine_threadsafe(_con_operaciones(), _obtener_loop()).result()
+
+
+async def en_hilo(funcion, *args, **kwargs):
+    """Ejecuta una función bloqueante en el executor de lecturas"""
+    operaciones = _operaciones_llamador.get()
+
+    def _llamar():
+        with heredar_operaciones(operaciones):
+            return funcion(*args, **kwargs)
+
+    return await asyncio.get_running_loop().run_in_executor(None, _llamar)
+
+
+def _leer(engine, consulta, params):
+    with engine.connect() as conn:
+        return conn.execute(consulta, params or {}).fetchall()
+
+
+async def consultar(engine, consulta, params=None):
+    """fetchall de una consulta en su propia conexión del pool"""
+    return await en_hilo(_leer, engine, consulta, params)
+
+
+async def en_paralelo(**lecturas):
+    """
+    Espera varias corrutinas a la vez y devuelve sus resultados por nombre:
+    await en_paralelo(cola=consultar(...), conteos=consultar(...))
+    """
+    resultados = await asyncio.gather(*lecturas.values())
+    return dict(zip(lecturas.keys(), resultados))
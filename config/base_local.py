@@ -0,0 +1,162 @@
+"""
+Base SQLite local para desarrollo, pruebas y benchmarks: el esquema se crea con
+las mismas migraciones que en MySQL y la vista externa se reemplaza por una
+tabla con las mismas columnas.
+"""
+
+import os
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from config.database import EXTERNAL_TABLE_NAME, SEDE, get_db_engine, reconstruir_contadores_estado
+from config.migraciones import aplicar_migraciones
+from config.conexiones import cerrar_engines
+from config.registro import obtener_logger
+
+log = obtener_logger('base_local')
+
+NOMBRES = ["Ana", "Luis", "María", "Carlos", "Sofía", "Jorge", "Laura", "Andrés", "Diana", "Camilo"]
+APELLIDOS = ["Gómez", "Restrepo", "Zapata", "Muñoz", "Arango", "Vélez", "Ospina", "Mejía"]
+
+
+def crear_vista_externa(engine):
+    """
+    Tabla con las columnas de la vista externa (la consulta de sync no distingue),
+    más una columna `sede` para probar varias oficinas con EXTERNAL_SEDE_COLUMN=sede
+    """
+    with engine.connect() as conn:
+        conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {EXTERNAL_TABLE_NAME} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre1 VARCHAR(100),
+            nombre2 VARCHAR(100),
+            apellido1 VARCHAR(100),
+            apellido2 VARCHAR(100),
+            documento VARCHAR(20),
+            tema_de_solicitud VARCHAR(100),
+            fecha VARCHAR(10),
+            sede VARCHAR(30)
+        )
+        """))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_externa_fecha ON {EXTERNAL_TABLE_NAME} (fecha, tema_de_solicitud)"))
+        conn.commit()
+
+
+def registrar_externos(engine, cantidad, prefijo='LOCAL-', inicio=0, fecha=None, semilla=None, sedes=None):
+    """
+    Inserta `cantidad` registros telefónicos en la vista externa local, con
+    documentos prefijo+inicio ... prefijo+(inicio+cantidad-1), repartidos en
+    rotación entre `sedes` (por defecto todos en SEDE). Devuelve los documentos.
+    """
+    sedes = sedes or [SEDE]
+    azar = random.Random(semilla)
+    fecha = (fecha or datetime.now()).strftime('%Y-%m-%d')
+    filas = [
+        {
+            "nombre1": azar.choice(NOMBRES),
+            "nombre2": "",
+            "apellido1": azar.choice(APELLIDOS),
+            "apellido2": azar.choice(APELLIDOS),
+            "documento": f"{prefijo}{i}",
+            "fecha": fecha,
+            "sede": sedes[i % len(sedes)],
+        }
+        for i in range(inicio, inicio + cantidad)
+    ]
+    if not filas:
+        return []
+    with engine.connect() as conn:
+        conn.execute(
+            text(f"""
+            INSERT INTO {EXTERNAL_TABLE_NAME}
+            (nombre1, nombre2, apellido1, apellido2, documento, tema_de_solicitud, fecha, sede)
+            VALUES (:nombre1, :nombre2, :apellido1, :apellido2, :documento, 'Notificaciones', :fecha, :sede)
+            """),
+            filas
+        )
+        conn.commit()
+    return [fila["documento"] for fila in filas]
+
+
+def preparar_base_local(engine_principal, engine_externa=None):
+    """Aplica las migraciones y crea la vista externa local (en la misma base si no se indica otra)"""
+    aplicadas = aplicar_migraciones(engine_principal)
+    crear_vista_externa(engine_externa or engine_principal)
+    log.info("base_local_lista", migraciones=len(aplicadas), url=engine_principal.url)
+    return aplicadas
+
+
+def sembrar_historico(engine, cantidad, prefijo='HIST-', dias=60, semilla=None, sedes=None):
+    """
+    Inserta `cantidad` turnos atendidos de días anteriores (cédulas prefijo+i),
+    repartidos en los últimos `dias` días y en rotación entre `sedes` (por
+    defecto SEDE), y reconstruye los contadores por estado.
+    """
+    sedes = sedes or [SEDE]
+    azar = random.Random(semilla)
+    ahora = datetime.now().replace(microsecond=0)
+    filas = []
+    for i in range(cantidad):
+        creado = ahora - timedelta(days=1 + i % dias, minutes=azar.randint(0, 600))
+        filas.append({
+            "sede": sedes[i % len(sedes)],
+            "modulo": 'A' if i % 3 else 'P',
+            "numero": f"{i % 1000:03d}",
+            "nombre": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+            "cedula": f"{prefijo}{i}",
+            "taquilla": f"Taquilla {i % 8 + 1}",
+            "creado": creado,
+            "llamado": creado + timedelta(minutes=azar.randint(1, 90)),
+        })
+    with engine.connect() as conn:
+        for i in range(0, len(filas), 5000):
+            conn.execute(
+                text("""
+                INSERT INTO turnos
+                (sede, modulo, numero_turno, estado, nombre_usuario, cedula_usuario, tipo_tramite,
+                 taquilla_asignada, fecha_creacion, fecha_llamado)
+                VALUES (:sede, :modulo, :numero, 'atendido', :nombre, :cedula, 'Notificaciones',
+                        :taquilla, :creado, :llamado)
+                """),
+                filas[i:i + 5000]
+            )
+        conn.commit()
+    reconstruir_contadores_estado()
+    log.info("historico_sembrado", turnos=cantidad, dias=dias)
+
+
+@contextmanager
+def base_de_prueba(url=None):
+    """
+    Base aislada para las pruebas (test_*.py): una SQLite temporal con el esquema
+    completo o, si se indica, la `url` de una base de pruebas (p. ej. MySQL), a la que
+    solo se le aplican las migraciones. Mientras dura, DATABASE_URL y
+    EXTERNAL_DATABASE_URL apuntan a ella, así nunca se usa la base configurada en el
+    .env; al salir se cierran los engines, se restauran las variables y se borra la
+    SQLite temporal. Devuelve el engine principal.
+    """
+    directorio = None
+    if url is None:
+        directorio = tempfile.mkdtemp(prefix='turnos_prueba_')
+        url = f"sqlite:///{os.path.join(directorio, 'prueba.db')}"
+    anteriores = {nombre: os.environ.get(nombre) for nombre in ('DATABASE_URL', 'EXTERNAL_DATABASE_URL')}
+    os.environ['DATABASE_URL'] = os.environ['EXTERNAL_DATABASE_URL'] = url
+    try:
+        engine = get_db_engine()
+        if directorio:
+            preparar_base_local(engine)
+        else:
+            aplicar_migraciones(engine)
+        yield engine
+    finally:
+        cerrar_engines()
+        for nombre, valor in anteriores.items():
+            if valor is None:
+                os.environ.pop(nombre, None)
+            else:
+                os.environ[nombre] = valor
+        if directorio:
+            shutil.rmtree(directorio, ignore_errors=True)
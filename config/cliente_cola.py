@@ -0,0 +1,115 @@
+"""
+Cliente del motor de cola en memoria (config/motor_cola.py). Si MOTOR_COLA_URL
+está vacío el motor no se usa y todo va directo a la base de datos, como antes.
+
+Las lecturas devuelven None cuando el motor no responde y quien llama consulta
+la base. Las escrituras solo caen a la base cuando el motor no está escuchando:
+si se cortó a mitad de un llamado, repetirlo podría dar dos turnos.
+"""
+
+import os
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from urllib.error import URLError
+from config.database import llamar_siguiente_turno, marcar_turno_atendido
+from config.registro import obtener_logger
+
+log = obtener_logger('cliente_cola')
+
+MOTOR_COLA_URL = os.getenv('MOTOR_COLA_URL', '').rstrip('/')   # p. ej. http://127.0.0.1:8765
+MOTOR_COLA_TIMEOUT = float(os.getenv('MOTOR_COLA_TIMEOUT', '2'))
+
+
+def motor_activo():
+    return bool(MOTOR_COLA_URL)
+
+
+def _fecha(valor):
+    return datetime.fromisoformat(valor) if valor else None
+
+
+def _fila(fila):
+    """Fila de cola con fecha_llamado y fecha_creacion de vuelta como datetime"""
+    fila = list(fila)
+    fila[8], fila[9] = _fecha(fila[8]), _fecha(fila[9])
+    return tuple(fila)
+
+
+def _pedir(ruta, params=None, datos=None):
+    url = f"{MOTOR_COLA_URL}{ruta}"
+    if params:
+        url += '?' + urlencode(params)
+    cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else None
+    peticion = Request(url, data=cuerpo, headers={'Content-Type': 'application/json'})
+    with urlopen(peticion, timeout=MOTOR_COLA_TIMEOUT) as respuesta:
+        return json.loads(respuesta.read())
+
+
+def _sin_conexion(error):
+    """True si el motor no estaba escuchando (la petición no llegó a procesarse)"""
+    return isinstance(getattr(error, 'reason', None), ConnectionRefusedError)
+
+
+def vista_taquilla(taquilla, sede, desde=None, limite=10):
+    """Mismo diccionario que cargar_vista_taquilla, o None si el motor no está disponible"""
+    if not motor_activo():
+        return None
+    params = {'sede': sede, 'taquilla': taquilla, 'limite': limite}
+    if desde:
+        params.update(desde_fecha=desde[0].isoformat(), desde_id=desde[1])
+    try:
+        vista = _pedir('/vista_taquilla', params)
+    except (URLError, OSError, ValueError) as e:
+        log.warning("motor_no_disponible", operacion='vista_taquilla', error=e)
+        return None
+
+    cola = vista['cola']
+    cola['espera'] = [_fila(fila) for fila in cola['espera']]
+    cola['llamando'] = [_fila(fila) for fila in cola['llamando']]
+    if cola['siguiente']:
+        cola['siguiente'] = (_fecha(cola['siguiente'][0]), cola['siguiente'][1])
+    if vista['turno_activo']:
+        activo = vista['turno_activo']
+        vista['turno_activo'] = (*activo[:5], _fecha(activo[5]))
+    return vista
+
+
+def tablero(sede, limite=5):
+    """(version, llamados) del tablero de la sede, o None si el motor no está disponible"""
+    if not motor_activo():
+        return None
+    try:
+        datos = _pedir('/tablero', {'sede': sede, 'limite': limite})
+    except (URLError, OSError, ValueError) as e:
+        log.warning("motor_no_disponible", operacion='tablero', error=e)
+        return None
+    return datos['version'], [tuple(fila) for fila in datos['llamados']]
+
+
+def llamar(taquilla, sede):
+    """llamar_siguiente_turno a través del motor (directo a la base si no está configurado o no escucha)"""
+    if not motor_activo():
+        return llamar_siguiente_turno(taquilla, sede)
+    try:
+        return tuple(_pedir('/llamar', datos={'taquilla': taquilla, 'sede': sede}))
+    except (URLError, OSError, ValueError) as e:
+        if _sin_conexion(e):
+            log.warning("motor_no_disponible", operacion='llamar', error=e)
+            return llamar_siguiente_turno(taquilla, sede)
+        # Pudo haberse reclamado el turno: no se repite, la vista mostrará el resultado
+        log.error("motor_llamar_error", taquilla=taquilla, sede=sede, error=e)
+        return None, None, f"❌ Error al llamar turno: {e}", None, None
+
+
+def atender(turno_id):
+    """marcar_turno_atendido a través del motor; repetirlo no cambia nada, así que se reintenta en la base"""
+    if not motor_activo():
+        return marcar_turno_atendido(turno_id)
+    try:
+        exito, turno = _pedir('/atender', datos={'turno_id': int(turno_id)})
+        return exito, tuple(turno) if turno else None
+    except (URLError, OSError, ValueError) as e:
+        log.warning("motor_no_disponible", operacion='atender', error=e)
+        return marcar_turno_atendido(turno_id)
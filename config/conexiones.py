@@ -0,0 +1,126 @@
+import os
+import time
+import atexit
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from config.registro import obtener_logger
+from config.metricas import instrumentar_engine, observar_espera_pool
+from config.dialectos import preparar_engine_sqlite
+
+log = obtener_logger('conexiones')
+
+# Registro de engines compartido por todo el proceso.
+# Streamlit atiende cada pestaña (cada TV, cada taquilla) en un hilo del mismo
+# proceso, así que basta un engine (y un pool) por DSN para todas las sesiones.
+_engines = {}
+_lock = threading.Lock()
+
+
+def _entero_env(nombre, por_defecto):
+    """Lee un entero de las variables de entorno con valor por defecto"""
+    try:
+        return int(os.getenv(nombre, por_defecto))
+    except (TypeError, ValueError):
+        return por_defecto
+
+
+class PoolMedido(QueuePool):
+    """QueuePool que acumula cuánto se espera para obtener una conexión"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.nombre = 'sin_nombre'
+        self._lock_medidas = threading.Lock()
+        self.esperas = 0
+        self.tiempo_espera_total = 0.0
+        self.tiempo_espera_max = 0.0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock_medidas:
+                self.esperas += 1
+                self.tiempo_espera_total += espera
+                if espera > self.tiempo_espera_max:
+                    self.tiempo_espera_max = espera
+            observar_espera_pool(self.nombre, espera)
+
+
+def obtener_engine(database_url, nombre):
+    """
+    Devuelve el engine compartido para un DSN, creándolo una sola vez.
+    El tamaño del pool se configura con DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT y DB_POOL_RECYCLE.
+    Con una URL sqlite:///archivo.db el mismo código corre sobre SQLite local
+    (pruebas y benchmarks); debe ser un archivo para que los hilos compartan datos.
+    """
+    registro = _engines.get(database_url)
+    if registro:
+        return registro['engine']
+
+    with _lock:
+        registro = _engines.get(database_url)
+        if not registro:
+            opciones = {}
+            if database_url.startswith('sqlite'):
+                opciones['connect_args'] = {'check_same_thread': False, 'timeout': 30}
+            engine = create_engine(
+                database_url,
+                poolclass=PoolMedido,
+                pool_pre_ping=True,
+                pool_recycle=_entero_env('DB_POOL_RECYCLE', 3600),
+                pool_size=_entero_env('DB_POOL_SIZE', 10),
+                max_overflow=_entero_env('DB_MAX_OVERFLOW', 20),
+                pool_timeout=_entero_env('DB_POOL_TIMEOUT', 30),
+                **opciones
+            )
+            if engine.dialect.name == 'sqlite':
+                preparar_engine_sqlite(engine)
+            engine.pool.nombre = nombre
+            instrumentar_engine(engine, nombre)
+            registro = {'nombre': nombre, 'engine': engine}
+            _engines[database_url] = registro
+            log.info("engine_creado", nombre=nombre, pool_size=engine.pool.size())
+    return registro['engine']
+
+
+def estadisticas_pools():
+    """Estadísticas de cada pool registrado, indexadas por nombre del engine"""
+    estadisticas = {}
+    for registro in list(_engines.values()):
+        pool = registro['engine'].pool
+        datos = {
+            'tamano': pool.size(),
+            'en_uso': pool.checkedout(),
+            'disponibles': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0)
+        }
+        if isinstance(pool, PoolMedido):
+            with pool._lock_medidas:
+                esperas = pool.esperas
+                total = pool.tiempo_espera_total
+                maximo = pool.tiempo_espera_max
+            datos['esperas'] = esperas
+            datos['espera_promedio_ms'] = round(total / esperas * 1000, 2) if esperas else 0.0
+            datos['espera_max_ms'] = round(maximo * 1000, 2)
+        estadisticas[registro['nombre']] = datos
+    return estadisticas
+
+
+def cerrar_engines():
+    """Cierra todos los pools del proceso (se llama automáticamente al salir)"""
+    with _lock:
+        registros = list(_engines.values())
+        _engines.clear()
+    for registro in registros:
+        try:
+            registro['engine'].dispose()
+        except Exception as e:
+            log.error("engine_cerrar_error", nombre=registro['nombre'], error=e)
+
+
+atexit.register(cerrar_engines)
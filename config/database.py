@@ -1,16 +1,43 @@
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 import streamlit as st
 from datetime import datetime, timedelta
 import threading
+import time
+from config.conexiones import obtener_engine
+from config.migraciones import aplicar_migraciones, esquema_al_dia
+from config import repositorio as repo
+from config.registro import obtener_logger
+from config.metricas import medir
+
+log = obtener_logger('database')
 
 load_dotenv()
 
 EXTERNAL_TABLE_NAME = os.getenv('EXTERNAL_TABLE_NAME', 'vw_pqrs_registro_telefonico')
 
+# Tamaño de cada lote de INSERT multi-fila en la sincronización
+SYNC_CHUNK_SIZE = int(os.getenv('SYNC_CHUNK_SIZE', '500'))
+
+# Sincronización incremental: columna creciente de la vista externa (id o
+# timestamp de registro) usada como cursor. Sin ella cada sync relee todo el día.
+EXTERNAL_CURSOR_COLUMN = os.getenv('EXTERNAL_CURSOR_COLUMN', '').strip()
+SYNC_MODE = os.getenv('SYNC_MODE', 'incremental')  # 'incremental' o 'completo'
+SYNC_CURSOR_FUENTE = f"{os.getenv('EXTERNAL_DB_NAME', 'convocatoria_sapiencia')}.{EXTERNAL_TABLE_NAME}"
+
+# Sede (oficina) de este proceso: la que usan páginas y scripts si no se indica otra.
+# SEDES son las que se pueden elegir en las páginas. EXTERNAL_SEDE_COLUMN es la
+# columna de la vista externa con la sede de cada registro; sin ella todo va a SEDE.
+SEDE = os.getenv('SEDE', 'principal')
+SEDES = [sede.strip() for sede in os.getenv('SEDES', SEDE).split(',') if sede.strip()]
+EXTERNAL_SEDE_COLUMN = os.getenv('EXTERNAL_SEDE_COLUMN', '').strip()
+
+# Llamados recientes que se guardan para las pantallas (buffer circular, por sede)
+TABLERO_LLAMADOS_RECIENTES = int(os.getenv('TABLERO_LLAMADOS_RECIENTES', '10'))
+
 # Cache mejorado para múltiples usuarios
 _cache = {
     'last_check': None,
@@ -20,225 +47,227 @@ _cache = {
 }
 
 def get_db_engine():
-    """Engine para BD principal con conexión persistente"""
-    if 'main_engine' not in st.session_state:
-        try:
-            database_url = f"mysql+mysqlconnector://{os.getenv('DB_USER', 'root')}:{os.getenv('DB_PASSWORD', '')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '3306')}/{os.getenv('DB_NAME', 'analitica_fondos')}"
-            st.session_state.main_engine = create_engine(
-                database_url, 
-                pool_pre_ping=True, 
-                pool_recycle=3600,
-                pool_size=10,  # Aumentado para múltiples usuarios
-                max_overflow=20
-            )
-        except SQLAlchemyError as e:
-            print(f"❌ Error creando engine principal: {e}")
-            return None
-    return st.session_state.main_engine
+    """
+    Engine para BD principal, compartido por todas las sesiones del proceso.
+    DATABASE_URL (p. ej. sqlite:///turnos_local.db) reemplaza la conexión MySQL.
+    """
+    try:
+        database_url = os.getenv('DATABASE_URL') or f"mysql+mysqlconnector://{os.getenv('DB_USER', 'root')}:{os.getenv('DB_PASSWORD', '')}@{os.getenv('DB_HOST', 'localhost')}:{os.getenv('DB_PORT', '3306')}/{os.getenv('DB_NAME', 'analitica_fondos')}"
+        return obtener_engine(database_url, 'principal')
+    except SQLAlchemyError as e:
+        log.error("engine_error", base="principal", error=e)
+        return None
 
 def get_external_db_engine():
-    """Engine para BD externa con conexión persistente"""
-    if 'external_engine' not in st.session_state:
-        try:
-            external_db_config = {
-                'host': os.getenv('EXTERNAL_DB_HOST', 'localhost'),
-                'database': os.getenv('EXTERNAL_DB_NAME', 'convocatoria_sapiencia'),
-                'user': os.getenv('EXTERNAL_DB_USER', 'root'),
-                'password': os.getenv('EXTERNAL_DB_PASSWORD', ''),
-                'port': os.getenv('EXTERNAL_DB_PORT', '3306')
-            }
-            database_url = f"mysql+mysqlconnector://{external_db_config['user']}:{external_db_config['password']}@{external_db_config['host']}:{external_db_config['port']}/{external_db_config['database']}"
-            st.session_state.external_engine = create_engine(
-                database_url, 
-                pool_pre_ping=True, 
-                pool_recycle=3600,
-                pool_size=10,
-                max_overflow=20
-            )
-        except SQLAlchemyError as e:
-            print(f"❌ Error creando engine externo: {e}")
-            return None
-    return st.session_state.external_engine
+    """
+    Engine para BD externa, compartido por todas las sesiones del proceso.
+    EXTERNAL_DATABASE_URL reemplaza la conexión MySQL (puede ser la misma base local).
+    """
+    try:
+        if os.getenv('EXTERNAL_DATABASE_URL'):
+            return obtener_engine(os.getenv('EXTERNAL_DATABASE_URL'), 'externa')
+        external_db_config = {
+            'host': os.getenv('EXTERNAL_DB_HOST', 'localhost'),
+            'database': os.getenv('EXTERNAL_DB_NAME', 'convocatoria_sapiencia'),
+            'user': os.getenv('EXTERNAL_DB_USER', 'root'),
+            'password': os.getenv('EXTERNAL_DB_PASSWORD', ''),
+            'port': os.getenv('EXTERNAL_DB_PORT', '3306')
+        }
+        database_url = f"mysql+mysqlconnector://{external_db_config['user']}:{external_db_config['password']}@{external_db_config['host']}:{external_db_config['port']}/{external_db_config['database']}"
+        return obtener_engine(database_url, 'externa')
+    except SQLAlchemyError as e:
+        log.error("engine_error", base="externa", error=e)
+        return None
 
 def verificar_tabla_control():
-    """Verifica que la tabla de control exista, si no, la crea"""
+    """
+    Verifica que el esquema esté al día (tabla de control incluida).
+    Solo consulta schema_version la primera vez en el proceso; las tablas se
+    crean y actualizan con migraciones (python migrar.py), no en cada carga.
+    """
     engine = get_db_engine()
     if not engine:
         return False
     
-    try:
-        with engine.connect() as conn:
-            # Verificar si la tabla existe
-            result = conn.execute(
-                text("""
-                SELECT COUNT(*) FROM information_schema.tables 
-                WHERE table_schema = 'analitica_fondos' 
-                AND table_name = 'control_turnos_externos'
-                """)
-            )
-            tabla_existe = result.fetchone()[0] > 0
-            
-            if not tabla_existe:
-                print("🔄 La tabla control_turnos_externos no existe, creándola...")
-                # Crear solo la tabla de control
-                create_control_query = text("""
-                CREATE TABLE IF NOT EXISTS control_turnos_externos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nombre1 VARCHAR(100),
-                    nombre2 VARCHAR(100),
-                    apellido1 VARCHAR(100),
-                    apellido2 VARCHAR(100),
-                    documento VARCHAR(20) NOT NULL,
-                    tema_solicitud VARCHAR(100),
-                    fecha_lectura TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    procesado BOOLEAN DEFAULT FALSE,
-                    turno_asignado VARCHAR(20),
-                    fecha_procesado TIMESTAMP NULL,
-                    INDEX idx_documento (documento),
-                    INDEX idx_procesado (procesado),
-                    INDEX idx_fecha_lectura (fecha_lectura),
-                    INDEX idx_documento_fecha (documento, fecha_lectura)
-                )
-                """)
-                conn.execute(create_control_query)
-                conn.commit()
-                print("✅ Tabla 'control_turnos_externos' creada exitosamente")
-            else:
-                print("✅ Tabla control_turnos_externos verificada")
-            
-            return True
-            
-    except SQLAlchemyError as e:
-        print(f"❌ Error verificando tabla control: {e}")
+    if not esquema_al_dia(engine):
+        log.warning("migraciones_pendientes", accion="python migrar.py")
         return False
+    return True
 
-def sincronizar_y_obtener_personas_ordenadas():
+def _insertar_lote_control(conn, lote):
     """
-    1. Sincroniza la vista externa con nuestra tabla de control
-    2. Devuelve personas NO procesadas en ORDEN DE LLEGADA
+    Inserta un lote de registros externos con un solo INSERT IGNORE multi-fila.
+    La clave única (documento, tema_solicitud, dia_lectura) descarta los repetidos.
+    Devuelve cuántas filas se insertaron realmente.
     """
-    # Primero verificar que la tabla de control existe
-    if not verificar_tabla_control():
-        return []
-    
+    params = {}
+    for i, registro in enumerate(lote):
+        params[f"nombre1_{i}"] = registro[0] or ''
+        params[f"nombre2_{i}"] = registro[1] or ''
+        params[f"apellido1_{i}"] = registro[2] or ''
+        params[f"apellido2_{i}"] = registro[3] or ''
+        params[f"documento_{i}"] = registro[4]
+        params[f"tema_{i}"] = registro[5]
+        params[f"sede_{i}"] = _sede_registro(registro)
+    result = conn.execute(repo.insertar_lote_control(len(lote)), params)
+    return result.rowcount
+
+def _sede_registro(registro):
+    """Sede de un registro externo (columna EXTERNAL_SEDE_COLUMN, en la posición 6) o SEDE"""
+    if EXTERNAL_SEDE_COLUMN.isidentifier():
+        return registro[6] or SEDE
+    return SEDE
+
+def _leer_cursor_sync(conn, fuente):
+    """Devuelve el último valor sincronizado de una fuente, o None si no hay cursor"""
+    result = conn.execute(
+        repo.LEER_CURSOR_SYNC,
+        {"fuente": fuente}
+    )
+    row = result.fetchone()
+    return row[0] if row else None
+
+def _guardar_cursor_sync(conn, fuente, valor):
+    """Guarda el último valor sincronizado de una fuente"""
+    conn.execute(
+        repo.GUARDAR_CURSOR_SYNC,
+        {"fuente": fuente, "valor": str(valor)}
+    )
+
+def consulta_vista_externa(cursor=None):
+    """
+    (consulta, parámetros) con la que la sincronización lee los registros de hoy de la
+    vista externa; con `cursor` solo los posteriores a EXTERNAL_CURSOR_COLUMN.
+    Las columnas son nombre1..tema_de_solicitud, luego la sede y el cursor si están configurados.
+    """
+    columnas = "nombre1, nombre2, apellido1, apellido2, documento, tema_de_solicitud"
+    if EXTERNAL_SEDE_COLUMN.isidentifier():
+        columnas += f", {EXTERNAL_SEDE_COLUMN}"
+    filtro_cursor = ""
+    orden = ""
+    if EXTERNAL_CURSOR_COLUMN.isidentifier():
+        columnas += f", {EXTERNAL_CURSOR_COLUMN}"
+        orden = f"ORDER BY {EXTERNAL_CURSOR_COLUMN}"
+        if cursor is not None:
+            filtro_cursor = f"AND {EXTERNAL_CURSOR_COLUMN} > :cursor"
+
+    # Intentar diferentes formatos de fecha (IN en lugar de OR para poder usar índice)
+    query = text(f"""
+    SELECT {columnas}
+    FROM {EXTERNAL_TABLE_NAME}
+    WHERE fecha IN (:fecha1, :fecha2, :fecha3)
+    AND tema_de_solicitud IN ('Notificaciones')  -- MODIFICADO
+    {filtro_cursor}
+    {orden}
+    """)
+
+    # Probar diferentes formatos de fecha
+    ahora = datetime.now()
+    params = {
+        "fecha1": ahora.strftime('%d/%m/%Y'),  # DD/MM/YYYY
+        "fecha2": ahora.strftime('%Y-%m-%d'),  # YYYY-MM-DD
+        "fecha3": ahora.strftime('%d-%m-%Y')   # DD-MM-YYYY
+    }
+    if filtro_cursor:
+        params["cursor"] = cursor
+    return query, params
+
+@medir('sincronizar')
+def sincronizar_control_externo(tamano_lote=None, modo=None):
+    """
+    Copia los registros de hoy de la vista externa a control_turnos_externos.
+    Usa un INSERT IGNORE multi-fila y un commit por lote, así que el número de
+    sentencias depende de los lotes y no de las filas leídas.
+
+    modo='incremental' solo lee filas con EXTERNAL_CURSOR_COLUMN mayor que el
+    cursor guardado en sync_cursores; modo='completo' relee todo el día como
+    reconciliación (los repetidos se descartan igual). Sin columna de cursor
+    configurada siempre se hace la lectura completa.
+    Devuelve un resumen: modo, leidos, insertados, omitidos y segundos.
+    """
+    tamano_lote = tamano_lote or SYNC_CHUNK_SIZE
+    modo = modo or SYNC_MODE
+    usa_cursor = EXTERNAL_CURSOR_COLUMN.isidentifier()
+    if not usa_cursor:
+        modo = 'completo'
+    resumen = {'modo': modo, 'leidos': 0, 'insertados': 0, 'omitidos': 0, 'segundos': 0.0}
+    inicio = time.perf_counter()
+
     engine_ext = get_external_db_engine()
     engine_main = get_db_engine()
-    
     if not engine_ext or not engine_main:
+        return resumen
+
+    cursor = None
+    if modo == 'incremental':
+        with engine_main.connect() as conn_main:
+            cursor = _leer_cursor_sync(conn_main, SYNC_CURSOR_FUENTE)
+
+    # PASO 1: Obtener los registros de hoy de la vista externa (solo los nuevos si hay cursor)
+    query_todos, params = consulta_vista_externa(cursor)
+    with engine_ext.connect() as conn_ext:
+        todos_registros = conn_ext.execute(query_todos, params).fetchall()
+
+    resumen['leidos'] = len(todos_registros)
+    registros_validos = [registro for registro in todos_registros if registro[4]]
+
+    # PASO 2: Insertar por lotes; los duplicados los descarta la clave única
+    with engine_main.connect() as conn_main:
+        for i in range(0, len(registros_validos), tamano_lote):
+            lote = registros_validos[i:i + tamano_lote]
+            resumen['insertados'] += _insertar_lote_control(conn_main, lote)
+            conn_main.commit()
+
+        # El cursor avanza solo después de confirmar los lotes: si algo falla a
+        # mitad, la próxima sync relee esas filas y la clave única las descarta
+        if usa_cursor and todos_registros:
+            _guardar_cursor_sync(conn_main, SYNC_CURSOR_FUENTE, max(registro[-1] for registro in todos_registros))
+            conn_main.commit()
+
+    resumen['omitidos'] = resumen['leidos'] - resumen['insertados']
+    resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+    log.info("sincronizacion", **resumen)
+    return resumen
+
+def obtener_personas_pendientes():
+    """
+    Devuelve las personas de hoy NO procesadas en la tabla de control.
+    No captura errores de base de datos: el worker los usa para aplicar backoff.
+    """
+    engine_main = get_db_engine()
+    if not engine_main:
         return []
-    
-    try:
-        # Obtener fecha actual en formato YYYY-MM-DD
-        fecha_actual = datetime.now().strftime('%Y-%m-%d')
-        fecha_actual_formato_vista = datetime.now().strftime('%d/%m/%Y')  # Formato común para vistas
+
+    with engine_main.connect() as conn_main:
+        result_pendientes = conn_main.execute(repo.PERSONAS_PENDIENTES)
+        personas_pendientes = result_pendientes.fetchall()
         
-        print(f"📅 Buscando registros para hoy: {fecha_actual_formato_vista} (formato vista)")
+        # Orden de procesamiento: solo una muestra por fila en DEBUG
+        for posicion, persona in enumerate(personas_pendientes, 1):
+            log.fila("persona_pendiente", posicion=posicion, id_control=persona[0], documento=persona[5], tema=persona[6])
         
-        # PASO 1: Obtener TODOS los registros de hoy de la vista externa
-        with engine_ext.connect() as conn_ext:
-            # Intentar diferentes formatos de fecha
-            query_todos = text(f"""
-            SELECT 
-                nombre1, nombre2, apellido1, apellido2, documento, tema_de_solicitud
-            FROM {EXTERNAL_TABLE_NAME}
-            WHERE (fecha = :fecha1 OR fecha = :fecha2 OR fecha = :fecha3)
-            AND tema_de_solicitud IN ('Notificaciones')  -- MODIFICADO
-            """)
-            
-            # Probar diferentes formatos de fecha
-            fecha_formato1 = datetime.now().strftime('%d/%m/%Y')  # DD/MM/YYYY
-            fecha_formato2 = datetime.now().strftime('%Y-%m-%d')  # YYYY-MM-DD
-            fecha_formato3 = datetime.now().strftime('%d-%m-%Y')  # DD-MM-YYYY
-            
-            result_todos = conn_ext.execute(query_todos, {
-                "fecha1": fecha_formato1,
-                "fecha2": fecha_formato2, 
-                "fecha3": fecha_formato3
-            })
-            
-            todos_registros = result_todos.fetchall()
-            print(f"👥 Total de registros en vista externa: {len(todos_registros)}")
-            
-            if todos_registros:
-                for registro in todos_registros:
-                    print(f"   - Documento: {registro[4]}, Tema: {registro[5]}")
+        log.info("personas_pendientes", cantidad=len(personas_pendientes))
         
-        # PASO 2: Para cada registro, verificar si ya existe en control e insertar si no existe
-        nuevos_count = 0
-        with engine_main.connect() as conn_main:
-            for registro in todos_registros:
-                documento = registro[4]
-                tema_solicitud = registro[5]
-                
-                if not documento:
-                    continue
-                
-                # Verificar si ya existe en control_turnos_externos HOY con el mismo tema
-                result_existe = conn_main.execute(
-                    text("""
-                    SELECT COUNT(*) FROM control_turnos_externos 
-                    WHERE documento = :documento 
-                    AND DATE(fecha_lectura) = CURDATE()
-                    AND tema_solicitud = :tema_solicitud
-                    """),
-                    {"documento": documento, "tema_solicitud": tema_solicitud}
-                )
-                existe = result_existe.fetchone()[0] > 0
-                
-                if not existe:
-                    try:
-                        conn_main.execute(
-                            text("""
-                            INSERT INTO control_turnos_externos 
-                            (nombre1, nombre2, apellido1, apellido2, documento, tema_solicitud)
-                            VALUES (:nombre1, :nombre2, :apellido1, :apellido2, :documento, :tema)
-                            """),
-                            {
-                                "nombre1": registro[0] or '', 
-                                "nombre2": registro[1] or '',
-                                "apellido1": registro[2] or '', 
-                                "apellido2": registro[3] or '',
-                                "documento": documento, 
-                                "tema": tema_solicitud
-                            }
-                        )
-                        nuevos_count += 1
-                        print(f"📥 Nuevo registro en control: {documento} - {tema_solicitud}")
-                    except Exception as e:
-                        if "Duplicate" not in str(e):
-                            print(f"❌ Error insertando en control para {documento}: {e}")
-            
-            if nuevos_count > 0:
-                conn_main.commit()
-                print(f"✅ Sincronización completada: {nuevos_count} registros nuevos")
+        return personas_pendientes
+
+def sincronizar_y_obtener_personas_ordenadas(modo=None):
+    """
+    1. Sincroniza la vista externa con nuestra tabla de control
+    2. Devuelve personas NO procesadas en ORDEN DE LLEGADA
+    modo: 'incremental' o 'completo' (ver sincronizar_control_externo)
+    """
+    # Primero verificar que la tabla de control existe
+    if not verificar_tabla_control():
+        return []
+    
+    try:
+        sincronizar_control_externo(modo=modo)
         
         # PASO 3: Obtener personas NO procesadas en ORDEN CORRECTO DE LLEGADA
-        with engine_main.connect() as conn_main:
-            query_pendientes = text("""
-            SELECT 
-                id, nombre1, nombre2, apellido1, apellido2, documento, tema_solicitud
-            FROM control_turnos_externos
-            WHERE DATE(fecha_lectura) = CURDATE()
-            AND procesado = FALSE
-            ORDER BY id DESC
-            LIMIT 50
-            """)
-            
-            result_pendientes = conn_main.execute(query_pendientes)
-            personas_pendientes = result_pendientes.fetchall()
-            
-            # Mostrar el orden en que se van a procesar
-            if personas_pendientes:
-                print("📋 ORDEN DE PROCESAMIENTO (primero los más antiguos):")
-                for i, persona in enumerate(personas_pendientes):
-                    print(f"   {i+1}. ID: {persona[0]} - {persona[5]} - {persona[6]}")
-            
-            print(f"👥 Personas pendientes por turno: {len(personas_pendientes)}")
-            
-            return personas_pendientes
+        return obtener_personas_pendientes()
             
     except SQLAlchemyError as e:
-        print(f"❌ Error en sincronización: {e}")
+        log.error("sincronizacion_error", error=e)
         return []
 
 def obtener_personas_sin_turno():
@@ -263,7 +292,7 @@ def ya_tiene_turno_pendiente(cedula):
     try:
         with engine.connect() as conn:
             result = conn.execute(
-                text("SELECT COUNT(*) FROM turnos WHERE cedula_usuario = :cedula AND estado != 'atendido'"),
+                repo.CONTAR_NO_ATENDIDOS_CEDULA,
                 {"cedula": cedula}
             )
             count = result.fetchone()[0]
@@ -273,11 +302,12 @@ def ya_tiene_turno_pendiente(cedula):
             return tiene_turno
             
     except SQLAlchemyError as e:
-        print(f"❌ Error verificando turno: {e}")
+        log.error("verificar_turno_error", cedula=cedula, error=e)
         return False
 
-def inicializar_contadores_turnos():
-    """Inicializa los contadores en cero para módulos nuevos - NO sincroniza con histórico"""
+def inicializar_contadores_turnos(sede=None):
+    """Inicializa los contadores en cero para módulos nuevos de la sede - NO sincroniza con histórico"""
+    sede = sede or SEDE
     engine = get_db_engine()
     if not engine:
         return False
@@ -289,69 +319,92 @@ def inicializar_contadores_turnos():
                 for modulo in modulos:
                     # Verificar si el contador existe
                     result = conn.execute(
-                        text("SELECT COUNT(*) FROM contadores_turnos WHERE modulo = :modulo"),
-                        {"modulo": modulo}
+                        repo.EXISTE_CONTADOR,
+                        {"sede": sede, "modulo": modulo}
                     )
                     if result.fetchone()[0] == 0:
                         # Crear contador en cero - SIN sincronizar con histórico
                         conn.execute(
-                            text("INSERT INTO contadores_turnos (modulo, ultimo_turno, fecha_reseteo) VALUES (:modulo, 0, NOW())"),
-                            {"modulo": modulo}
+                            repo.CREAR_CONTADOR,
+                            {"sede": sede, "modulo": modulo}
                         )
-                        print(f"✅ Contador inicializado para módulo {modulo}: Último turno = 0")
+                        log.info("contador_inicializado", sede=sede, modulo=modulo)
         return True
     except SQLAlchemyError as e:
-        print(f"❌ Error inicializando contadores: {e}")
+        log.error("inicializar_contadores_error", error=e)
         return False
 
-def obtener_siguiente_turno_lote(modulo):
-    """Obtiene y incrementa el siguiente número de turno del contador"""
+def reservar_numeros(conn, modulo, cantidad, sede):
+    """
+    Reserva `cantidad` números consecutivos del contador (sede, módulo) en la conexión dada.
+    El incremento es una sola sentencia atómica: LAST_INSERT_ID(expr) deja el nuevo
+    valor en la sesión sin un SELECT previo (en SQLite lo devuelve RETURNING), así
+    dos taquillas o kioscos nunca reciben el mismo número. Devuelve el primer
+    número del bloque.
+    """
+    params = {"sede": sede, "modulo": modulo, "cantidad": cantidad}
+    ultimo = _incrementar_contador(conn, params)
+
+    if ultimo is None:
+        # Si no existe contador, crearlo (IGNORE por si otro proceso lo creó a la vez)
+        conn.execute(
+            repo.CREAR_CONTADOR,
+            {"sede": sede, "modulo": modulo}
+        )
+        ultimo = _incrementar_contador(conn, params)
+    return ultimo - cantidad + 1
+
+def _incrementar_contador(conn, params):
+    """Ejecuta RESERVAR_NUMEROS y devuelve el nuevo ultimo_turno, o None si no hay contador"""
+    result = conn.execute(repo.RESERVAR_NUMEROS, params)
+    if result.returns_rows:
+        fila = result.fetchone()
+        return fila[0] if fila else None
+
+    if result.rowcount == 0:
+        return None
+    ultimo = result.lastrowid
+    if not ultimo:
+        ultimo = conn.execute(repo.ULTIMO_ID_INSERTADO).scalar()
+    return ultimo
+
+def reservar_numeros_turno(modulo, cantidad=1, sede=None):
+    """
+    Reserva un bloque contiguo de `cantidad` números para un módulo de la sede en su propia
+    transacción corta y devuelve el primero (el bloque es primero..primero+cantidad-1).
+    Devuelve None si no se pudo reservar: nunca inventa un número.
+    """
+    if cantidad < 1:
+        raise ValueError("cantidad debe ser mayor que cero")
+
+    sede = sede or SEDE
     engine = get_db_engine()
     if not engine:
-        return 1
+        return None
     
     try:
         with engine.connect() as conn:
-            # Usar transacción para evitar condiciones de carrera
-            with conn.begin():
-                # Obtener el siguiente turno
-                result = conn.execute(
-                    text("SELECT ultimo_turno FROM contadores_turnos WHERE modulo = :modulo"),
-                    {"modulo": modulo}
-                )
-                row = result.fetchone()
-                
-                if not row:
-                    # Si no existe contador, crearlo
-                    conn.execute(
-                        text("INSERT INTO contadores_turnos (modulo, ultimo_turno) VALUES (:modulo, 0)"),
-                        {"modulo": modulo}
-                    )
-                    siguiente_numero = 1
-                else:
-                    siguiente_numero = row[0] + 1
-                
-                # Actualizar el contador
-                conn.execute(
-                    text("UPDATE contadores_turnos SET ultimo_turno = :numero WHERE modulo = :modulo"),
-                    {"numero": siguiente_numero, "modulo": modulo}
-                )
-                
-                return siguiente_numero
-                
+            primero = reservar_numeros(conn, modulo, cantidad, sede)
+            conn.commit()
+            return primero
     except SQLAlchemyError as e:
-        print(f"Error obteniendo turno: {e}")
-        return 1
+        log.error("reservar_numeros_error", sede=sede, modulo=modulo, cantidad=cantidad, error=e)
+        return None
 
-def desbloquear_contadores_turnos(modulo=None):
+def obtener_siguiente_turno_lote(modulo, sede=None):
+    """Obtiene y incrementa el siguiente número de turno del contador (None si falla)"""
+    return reservar_numeros_turno(modulo, 1, sede)
+
+def desbloquear_contadores_turnos(modulo=None, sede=None):
     """
-    Desbloquea los contadores para permitir sincronización automática
+    Desbloquea los contadores de la sede para permitir sincronización automática
     Si modulo es None, desbloquea TODOS los módulos
     Retorna True si fue exitoso
     """
+    sede = sede or SEDE
     engine = get_db_engine()
     if not engine:
-        print("❌ No hay conexión a la base de datos")
+        log.error("sin_conexion")
         return False
     
     try:
@@ -359,34 +412,33 @@ def desbloquear_contadores_turnos(modulo=None):
             if modulo:
                 # Desbloquear un módulo específico
                 conn.execute(
-                    text("UPDATE contadores_turnos SET manual_reset = FALSE WHERE modulo = :modulo"),
-                    {"modulo": modulo}
+                    repo.DESBLOQUEAR_CONTADOR,
+                    {"sede": sede, "modulo": modulo}
                 )
                 conn.commit()
-                print(f"✅ Contador del módulo {modulo} desbloqueado")
+                log.info("contador_desbloqueado", sede=sede, modulo=modulo)
             else:
                 # Desbloquear todos los módulos
-                conn.execute(
-                    text("UPDATE contadores_turnos SET manual_reset = FALSE")
-                )
+                conn.execute(repo.DESBLOQUEAR_CONTADORES, {"sede": sede})
                 conn.commit()
-                print("✅ Todos los contadores han sido desbloqueados")
+                log.info("contador_desbloqueado", sede=sede, modulo="todos")
             
             return True
             
     except SQLAlchemyError as e:
-        print(f"❌ Error desbloqueando contadores: {e}")
+        log.error("desbloquear_contadores_error", error=e)
         return False
 
-def resetear_contadores_turnos(modulo=None):
+def resetear_contadores_turnos(modulo=None, sede=None):
     """
-    Resetea los contadores de turnos a cero
+    Resetea los contadores de turnos de la sede a cero
     Si modulo es None, resetea TODOS los módulos
     Retorna True si fue exitoso
     """
+    sede = sede or SEDE
     engine = get_db_engine()
     if not engine:
-        print("❌ No hay conexión a la base de datos")
+        log.error("sin_conexion")
         return False
     
     try:
@@ -394,204 +446,391 @@ def resetear_contadores_turnos(modulo=None):
             if modulo:
                 # Resetear un módulo específico
                 conn.execute(
-                    text("UPDATE contadores_turnos SET ultimo_turno = 0, fecha_reseteo = NOW() WHERE modulo = :modulo"),
-                    {"modulo": modulo}
+                    repo.RESETEAR_CONTADOR,
+                    {"sede": sede, "modulo": modulo}
                 )
                 conn.commit()
-                print(f"✅ Contador del módulo {modulo} reseteado a 0")
+                log.info("contador_reseteado", sede=sede, modulo=modulo)
             else:
                 # Resetear todos los módulos
-                conn.execute(
-                    text("UPDATE contadores_turnos SET ultimo_turno = 0, fecha_reseteo = NOW()")
-                )
+                conn.execute(repo.RESETEAR_CONTADORES, {"sede": sede})
                 conn.commit()
-                print("✅ Todos los contadores han sido reseteados a 0")
-            
-            print(f"📅 Fecha/Hora del reseteo: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                log.info("contador_reseteado", sede=sede, modulo="todos")
+
             return True
             
     except SQLAlchemyError as e:
-        print(f"❌ Error reseteando contadores: {e}")
+        log.error("resetear_contadores_error", error=e)
         return False
-    """Versión silenciosa para asignación automática en background"""
-    # Limpiar cache al inicio
-    limpiar_cache_personas()
-    
-    personas = sincronizar_y_obtener_personas_ordenadas()
-    if not personas:
-        return 0
+
+def obtener_cola_turnos(desde=None, limite=10, sede=None):
+    """
+    Turnos en atención, una página de la cola de espera y los conteos por estado de la sede.
+    `desde` es la clave (fecha_creacion, id) del último turno ya mostrado; la página
+    siguiente se pide con el valor 'siguiente' devuelto (None si no hay más).
+    Las filas traen (id, modulo, numero_turno, nombre_usuario, cedula_usuario,
+    tipo_tramite, estado, taquilla_asignada, fecha_llamado, fecha_creacion).
+    """
+    sede = sede or SEDE
+    engine = get_db_engine()
+    if not engine:
+        return armar_cola([], [], [], limite)
     
-    turnos_asignados = 0
+    try:
+        with engine.connect() as conn:
+            espera = conn.execute(*consulta_pagina_espera(desde, limite, sede)).fetchall()
+            llamando = conn.execute(repo.TURNOS_LLAMANDO, {"sede": sede}).fetchall()
+            conteos = conn.execute(repo.CONTAR_POR_ESTADO, {"sede": sede}).fetchall()
+        return armar_cola(espera, llamando, conteos, limite)
+    except SQLAlchemyError as e:
+        log.error("cola_turnos_error", sede=sede, error=e)
+        return armar_cola([], [], [], limite)
+
+def consulta_pagina_espera(desde, limite, sede):
+    """(consulta, parámetros) de una página de la cola, con una fila de más para saber si hay otra"""
+    if desde:
+        return repo.COLA_ESPERA_DESDE, {"sede": sede, "fecha": desde[0], "id": desde[1], "limite": limite + 1}
+    return repo.COLA_ESPERA, {"sede": sede, "limite": limite + 1}
+
+def armar_cola(espera, llamando, conteos, limite):
+    """Diccionario de obtener_cola_turnos a partir de las filas leídas"""
+    cola = {
+        'llamando': llamando,
+        'espera': espera[:limite],
+        'conteos': {estado: int(cantidad) for estado, cantidad in conteos},
+        'siguiente': None
+    }
+    if len(espera) > limite:
+        ultimo = espera[limite - 1]
+        cola['siguiente'] = (ultimo[9], ultimo[0])
+    return cola
+
+def registrar_transicion_estado(conn, turno_id, desde, hacia):
+    """
+    Mueve un turno entre contadores de contadores_estado (desde=None al crearlo),
+    dentro de la transacción que cambia su estado
+    """
+    if desde:
+        conn.execute(repo.MOVER_CONTADOR_ESTADO, {"estado": desde, "delta": -1, "id": turno_id})
+    conn.execute(repo.MOVER_CONTADOR_ESTADO, {"estado": hacia, "delta": 1, "id": turno_id})
+
+def reconstruir_contadores_estado(dia=None, solo_verificar=False):
+    """
+    Recalcula contadores_estado desde turnos (todo el histórico o solo `dia`, todas las sedes).
+    Devuelve las diferencias encontradas como (sede, dia, modulo, estado, contador, real);
+    con solo_verificar=True no modifica nada. None si falla.
+    """
+    engine = get_db_engine()
+    if not engine:
+        return None
     
-    for persona in personas:
-        if hasattr(persona, '_mapping'):
-            persona_dict = dict(persona._mapping)
-        else:
-            persona_dict = {
-                'nombre1': persona[0], 'nombre2': persona[1],
-                'apellido1': persona[2], 'apellido2': persona[3],
-                'documento': persona[4], 'tema_solicitud': persona[5]  # Nota: aquí es tema_solicitud
-            }
-        
-        # SOLO GUARDAR NOMBRE1 Y APELLIDO1
-        nombre1 = persona_dict.get('nombre1', '').strip()
-        apellido1 = persona_dict.get('apellido1', '').strip()
-        
-        # Construir nombre simple: nombre1 + apellido1
-        nombre_simple = f"{nombre1} {apellido1}".strip()
-        
-        cedula = persona_dict.get('documento', '')
-        tipo_solicitud = persona_dict.get('tema_solicitud', '')  # Cambiado de tema_de_solicitud a tema_solicitud
-        
-        if not cedula:
-            continue
-        
-        # SOLO evitar si tiene turnos PENDIENTES HOY (espera o llamando)
-        if ya_tiene_turno_pendiente_robusto(cedula):
-            continue
-        
-        # DETERMINAR MÓDULO SEGÚN TEMA DE SOLICITUD
-        if tipo_solicitud == 'Legalización fondo':
-            modulo = 'P'
-        else:  # Cualquier otro
-            modulo = 'A'
-        
-        siguiente_numero = obtener_siguiente_turno_lote(modulo)
-        turno_formateado = f"{siguiente_numero:03d}"
+    params = {"dia": dia} if dia else {}
+    try:
+        with engine.connect() as conn:
+            with conn.begin():
+                reales = conn.execute(repo.CONTEOS_REALES_DIA if dia else repo.CONTEOS_REALES, params).fetchall()
+                guardados = conn.execute(repo.LEER_CONTADORES_ESTADO_DIA if dia else repo.LEER_CONTADORES_ESTADO, params).fetchall()
+                
+                reales = {(f[0], str(f[1]), f[2], f[3]): int(f[4]) for f in reales}
+                guardados = {(f[0], str(f[1]), f[2], f[3]): int(f[4]) for f in guardados}
+                diferencias = [
+                    (*clave, guardados.get(clave, 0), reales.get(clave, 0))
+                    for clave in sorted(set(reales) | set(guardados))
+                    if guardados.get(clave, 0) != reales.get(clave, 0)
+                ]
+                
+                if not solo_verificar and diferencias:
+                    conn.execute(repo.BORRAR_CONTADORES_ESTADO_DIA if dia else repo.BORRAR_CONTADORES_ESTADO, params)
+                    conn.execute(repo.RECONSTRUIR_CONTADORES_ESTADO_DIA if dia else repo.RECONSTRUIR_CONTADORES_ESTADO, params)
         
-        engine = get_db_engine()
-        if engine:
-            try:
-                with engine.connect() as conn:
-                    # Verificación final en transacción - solo HOY
-                    result = conn.execute(
-                        text("""
-                        SELECT COUNT(*) FROM turnos 
-                        WHERE cedula_usuario = :cedula 
-                        AND estado IN ('espera', 'llamando')
-                        AND DATE(fecha_creacion) = CURDATE()
-                        """),
-                        {"cedula": cedula}
-                    )
-                    if result.fetchone()[0] > 0:
-                        continue
-                    
-                    conn.execute(
-                        text("""
-                        INSERT INTO turnos 
-                        (modulo, numero_turno, estado, nombre_usuario, cedula_usuario, tipo_tramite) 
-                        VALUES (:modulo, :numero_turno, 'espera', :nombre, :cedula, :tramite)
-                        """),
-                        {
-                            "modulo": modulo, "numero_turno": turno_formateado,
-                            "nombre": nombre_simple, "cedula": cedula, "tramite": tipo_solicitud
-                        }
-                    )
-                    
-                    # Marcar como procesado en tabla de control
-                    conn.execute(
-                        text("""
-                        UPDATE control_turnos_externos 
-                        SET procesado = TRUE, turno_asignado = :turno, fecha_procesado = NOW()
-                        WHERE documento = :documento 
-                        AND DATE(fecha_lectura) = CURDATE()
-                        """),
-                        {"documento": cedula, "turno": f"{modulo}{turno_formateado}"}
-                    )
-                    
-                    conn.commit()
-                    turnos_asignados += 1
-                    print(f"✅ Turno automático: {modulo}{turno_formateado} para {cedula} ({tipo_solicitud})")
-                    
-            except SQLAlchemyError as e:
-                if "Duplicate" not in str(e):
-                    print(f"❌ Error asignando turno: {e}")
+        log.info("contadores_estado_revisados", dia=dia or "todos", diferencias=len(diferencias), solo_verificar=solo_verificar)
+        return diferencias
+    except SQLAlchemyError as e:
+        log.error("contadores_estado_error", error=e)
+        return None
+
+def depurar_contadores_estado():
+    """
+    Borra los contadores de espera y llamando de días anteriores que quedaron en cero
+    (todas las sedes), así los conteos en vivo solo leen días con turnos abiertos.
+    Devuelve cuántas filas borró; None si falla.
+    """
+    engine = get_db_engine()
+    if not engine:
+        return None
+
+    try:
+        with engine.connect() as conn:
+            with conn.begin():
+                borradas = sum(
+                    conn.execute(repo.BORRAR_CONTADORES_ABIERTOS_VACIOS, {"sede": sede}).rowcount
+                    for sede in SEDES
+                )
+        log.debug("contadores_estado_depurados", filas=borradas)
+        return borradas
+    except SQLAlchemyError as e:
+        log.error("contadores_estado_depurar_error", error=e)
+        return None
+
+def _incrementar_version_tablero(conn, sede):
+    """Incrementa la versión del tablero de la sede dentro de la transacción del cambio de estado"""
+    conn.execute(repo.INCREMENTAR_VERSION_TABLERO, {"sede": sede})
+
+def obtener_version_tablero(sede=None):
+    """
+    Versión actual del tablero de la sede (lectura de una sola fila por clave primaria).
+    Las pantallas solo vuelven a consultar turnos cuando cambia. None si falla
+    (o si la sede aún no tuvo ningún llamado).
+    """
+    engine = get_db_engine()
+    if not engine:
+        return None
     
-    return turnos_asignados
+    try:
+        with engine.connect() as conn:
+            return conn.execute(repo.VERSION_TABLERO, {"sede": sede or SEDE}).scalar()
+    except SQLAlchemyError as e:
+        log.error("version_tablero_error", error=e)
+        return None
 
-def verificar_sincronizacion():
-    """Función para depurar la sincronización"""
-    engine_ext = get_external_db_engine()
-    engine_main = get_db_engine()
+def _registrar_llamado_reciente(conn, turno_id, sede):
+    """
+    Agrega el turno recién llamado al buffer de llamados recientes de su sede y
+    descarta los que exceden TABLERO_LLAMADOS_RECIENTES, dentro de la transacción del llamado.
+    """
+    conn.execute(
+        repo.REGISTRAR_LLAMADO_RECIENTE,
+        {"id": turno_id}
+    )
+    conn.execute(
+        repo.RECORTAR_LLAMADOS_RECIENTES,
+        {"sede": sede, "conservar": TABLERO_LLAMADOS_RECIENTES}
+    )
+
+def obtener_llamados_recientes(limite=5, sede=None):
+    """
+    Últimos llamados de la sede para las pantallas, del más reciente al más antiguo:
+    (turno, nombre_usuario, taquilla, hora_llamado, estado, id). Lee como máximo
+    TABLERO_LLAMADOS_RECIENTES filas sin importar el tamaño del histórico.
+    """
+    engine = get_db_engine()
+    if not engine:
+        return []
     
-    if not engine_ext or not engine_main:
-        print("❌ No se pudo conectar a las bases de datos")
-        return
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(
+                repo.LLAMADOS_RECIENTES,
+                {"sede": sede or SEDE, "limite": limite}
+            )
+            return result.fetchall()
+    except SQLAlchemyError as e:
+        log.error("llamados_recientes_error", error=e)
+        return []
+
+def ordenar_modulos(rutas):
+    """
+    Orden en que una taquilla con rutas prueba sus módulos: primero el más atrasado
+    respecto a su peso, (servidos + 1) / peso; a igual valor, el de más peso.
+    `rutas` son filas (modulo, peso, servidos) de RUTAS_TAQUILLA. Con pesos A=2 y
+    P=1 y ambas colas con turnos, la taquilla llama A, A, P, A, A, P...
+    """
+    return [ruta[0] for ruta in sorted(rutas, key=lambda ruta: ((ruta[2] + 1) / ruta[1], -ruta[1], ruta[0]))]
+
+def obtener_rutas_taquilla(taquilla, sede=None):
+    """Rutas (modulo, peso, servidos hoy) de la taquilla; lista vacía = atiende todos los módulos"""
+    engine = get_db_engine()
+    if not engine:
+        return []
     
     try:
-        # Obtener fecha actual en diferentes formatos
-        fecha_formato1 = datetime.now().strftime('%d/%m/%Y')
-        fecha_formato2 = datetime.now().strftime('%Y-%m-%d')
-        fecha_formato3 = datetime.now().strftime('%d-%m-%Y')
-        
-        print(f"🔍 Verificando sincronización para hoy:")
-        print(f"   - Formato 1: {fecha_formato1}")
-        print(f"   - Formato 2: {fecha_formato2}")
-        print(f"   - Formato 3: {fecha_formato3}")
+        with engine.connect() as conn:
+            return conn.execute(repo.RUTAS_TAQUILLA, {"sede": sede or SEDE, "taquilla": taquilla}).fetchall()
+    except SQLAlchemyError as e:
+        log.error("rutas_taquilla_error", taquilla=taquilla, error=e)
+        return []
+
+def guardar_rutas_taquilla(taquilla, pesos, sede=None):
+    """
+    Reemplaza las rutas de la taquilla por `pesos` ({modulo: peso}; peso 0 = no lo atiende).
+    Sin ningún peso la taquilla vuelve a atender todos los módulos. El reparto del
+    día empieza de nuevo para esa taquilla.
+    """
+    sede = sede or SEDE
+    engine = get_db_engine()
+    if not engine:
+        return False
+    
+    rutas = [
+        {"sede": sede, "taquilla": taquilla, "modulo": modulo, "peso": int(peso)}
+        for modulo, peso in pesos.items() if peso and int(peso) > 0
+    ]
+    try:
+        with engine.connect() as conn:
+            with conn.begin():
+                conn.execute(repo.BORRAR_RUTAS_TAQUILLA, {"sede": sede, "taquilla": taquilla})
+                if rutas:
+                    conn.execute(repo.INSERTAR_RUTA, rutas)
+        log.info("rutas_guardadas", sede=sede, taquilla=taquilla, rutas={r["modulo"]: r["peso"] for r in rutas})
+        return True
+    except SQLAlchemyError as e:
+        log.error("guardar_rutas_error", sede=sede, taquilla=taquilla, error=e)
+        return False
+
+def listar_rutas(sede=None):
+    """Rutas de todas las taquillas de la sede: (taquilla, modulo, peso, servidos hoy)"""
+    engine = get_db_engine()
+    if not engine:
+        return []
+    
+    try:
+        with engine.connect() as conn:
+            return conn.execute(repo.LISTAR_RUTAS, {"sede": sede or SEDE}).fetchall()
+    except SQLAlchemyError as e:
+        log.error("listar_rutas_error", error=e)
+        return []
+
+def _siguiente_en_espera(conn, sede, rutas):
+    """
+    Turno más antiguo de la sede o, si la taquilla tiene rutas, el más antiguo del
+    módulo que le toca (el siguiente módulo en orden si esa cola está vacía)
+    """
+    if not rutas:
+        return conn.execute(repo.SIGUIENTE_EN_ESPERA, {"sede": sede}).fetchone()
+    for modulo in ordenar_modulos(rutas):
+        turno = conn.execute(repo.SIGUIENTE_EN_MODULO, {"sede": sede, "modulo": modulo}).fetchone()
+        if turno:
+            return turno
+    return None
+
+def _servir_ruta(conn, sede, taquilla, modulo, rutas):
+    """Cuenta el turno llamado en las rutas de la taquilla, dentro de la transacción del llamado"""
+    for ruta_modulo, peso, servidos in rutas:
+        if ruta_modulo == modulo:
+            conn.execute(repo.SERVIR_RUTA, {
+                "sede": sede, "taquilla": taquilla, "modulo": modulo,
+                "servidos": servidos + 1, "virtual": (servidos + 1) / peso
+            })
+            return
+
+@medir('llamar')
+def llamar_siguiente_turno(taquilla, sede=None):
+    """
+    Reclama para la taquilla el turno en espera más antiguo de su sede (o de los
+    módulos de sus rutas, ver ordenar_modulos) en una sola transacción. FOR UPDATE
+    SKIP LOCKED hace que dos taquillas simultáneas tomen turnos distintos, y la clave
+    única sobre (sede, taquilla_activa) rechaza un segundo turno 'llamando' en la
+    misma taquilla. Devuelve (turno, id, mensaje, usuario, tramite).
+    """
+    taquilla = taquilla.strip()
+    sede = sede or SEDE
+    engine = get_db_engine()
+    if not engine:
+        return None, None, "❌ Error de conexión a la base de datos", None, None
+    
+    try:
+        with engine.connect() as conn:
+            with conn.begin():
+                rutas = conn.execute(repo.RUTAS_TAQUILLA, {"sede": sede, "taquilla": taquilla}).fetchall()
+                
+                # Tomar el turno más antiguo (que llegó primero) que nadie más tenga bloqueado
+                turno = _siguiente_en_espera(conn, sede, rutas)
+                
+                if not turno:
+                    log.debug("cola_vacia", sede=sede, taquilla=taquilla, rutas=len(rutas))
+                    return None, None, mensaje_cola_vacia(rutas), None, None
+                
+                conn.execute(
+                    repo.MARCAR_LLAMANDO,
+                    {"taquilla": taquilla, "id": turno[0]}
+                )
+                registrar_transicion_estado(conn, turno[0], 'espera', 'llamando')
+                _registrar_llamado_reciente(conn, turno[0], sede)
+                _incrementar_version_tablero(conn, sede)
+                _servir_ruta(conn, sede, taquilla, turno[1], rutas)
         
-        # Ver vista externa
-        with engine_ext.connect() as conn:
-            query = text(f"""
-            SELECT fecha, documento, tema_de_solicitud 
-            FROM {EXTERNAL_TABLE_NAME}
-            WHERE tema_de_solicitud IN ('Notificaciones')
-            ORDER BY fecha DESC
-            LIMIT 20
-            """)
-            result = conn.execute(query)
-            registros = result.fetchall()
-            
-            print(f"📋 Registros en vista {EXTERNAL_TABLE_NAME}:")
-            for reg in registros:
-                print(f"   Fecha: {reg[0]}, Doc: {reg[1]}, Tema: {reg[2]}")
+        turno_info = f"{turno[1]}{turno[2]}"
+        log.info("turno_llamado", sede=sede, taquilla=taquilla, turno=turno_info, turno_id=turno[0])
+        return turno_info, turno[0], f"✅ Turno {turno_info} asignado a {taquilla}", turno[3], turno[4]
         
-        # Ver tabla de control
-        with engine_main.connect() as conn:
-            query = text("""
-            SELECT documento, tema_solicitud, procesado, fecha_lectura
-            FROM control_turnos_externos 
-            WHERE DATE(fecha_lectura) >= CURDATE() - INTERVAL 1 DAY
-            ORDER BY fecha_lectura DESC
-            """)
-            result = conn.execute(query)
-            registros_control = result.fetchall()
-            
-            print(f"📋 Registros en control_turnos_externos (último día):")
-            for reg in registros_control:
-                print(f"   Doc: {reg[0]}, Tema: {reg[1]}, Procesado: {reg[2]}, Fecha: {reg[3]}")
-                
-    except Exception as e:
-        print(f"❌ Error en verificación: {e}")
+    except SQLAlchemyError as e:
+        if es_taquilla_ocupada(e):
+            return None, None, "❌ Ya tienes un turno en atención. Termina el actual primero.", None, None
+        log.error("llamar_turno_error", sede=sede, taquilla=taquilla, error=e)
+        return None, None, f"❌ Error al llamar turno: {e}", None, None
+
+def es_taquilla_ocupada(error):
+    """
+    True si el error es la violación de la clave única de un turno 'llamando' por taquilla
+    (uk_sede_taquilla_activa); cualquier otra (llamados recientes, contadores...) es un error real
+    """
+    if not isinstance(error, IntegrityError):
+        return False
+    mensaje = str(error.orig)
+    # MySQL nombra la clave; SQLite, las columnas del índice único parcial
+    return 'taquilla_activa' in mensaje or 'turnos.sede, turnos.taquilla_asignada' in mensaje
 
-def obtener_turnos_por_estado():
-    """Obtiene todos los turnos agrupados por estado"""
+def mensaje_cola_vacia(rutas):
+    """Mensaje para la taquilla cuando no hay turno que llamar"""
+    if rutas:
+        return f"ℹ️ No hay turnos en espera de los módulos {', '.join(ruta[0] for ruta in rutas)}"
+    return "ℹ️ No hay turnos en espera"
+
+@medir('reclamar')
+def reclamar_turno(taquilla, turno_id, sede=None, modulo=None, rutas=None):
+    """
+    Pasa a 'llamando' un turno concreto si sigue en espera, con los mismos efectos
+    que llamar_siguiente_turno (contadores, llamados recientes, versión del tablero
+    y, si se pasan las rutas de la taquilla, su reparto por módulo) en una sola
+    transacción. Lo usa el motor de cola, que ya eligió el turno en memoria.
+    Devuelve False si el turno ya no estaba en espera; los errores de base de datos
+    (incluido IntegrityError si la taquilla ya tiene un turno activo, ver es_taquilla_ocupada) se propagan.
+    """
+    sede = sede or SEDE
     engine = get_db_engine()
-    if engine:
-        try:
-            with engine.connect() as conn:
-                query = text("""
-                SELECT 
-                    id, modulo, numero_turno, nombre_usuario, cedula_usuario, 
-                    tipo_tramite, estado, taquilla_asignada, fecha_llamado
-                FROM turnos 
-                WHERE estado IN ('espera', 'llamando')
-                ORDER BY 
-                    CASE 
-                        WHEN estado = 'llamando' THEN 1
-                        WHEN estado = 'espera' THEN 2
-                    END,
-                    fecha_creacion
-                """)
-                result = conn.execute(query)
-                turnos = result.fetchall()
-                return turnos
-        except SQLAlchemyError as e:
-            print(f"❌ Error obteniendo turnos por estado: {e}")
-            return []
-    return []
+    if not engine:
+        raise SQLAlchemyError("Sin conexión a la base de datos")
+    
+    with engine.connect() as conn:
+        with conn.begin():
+            result = conn.execute(repo.RECLAMAR_TURNO, {"taquilla": taquilla, "id": turno_id})
+            if result.rowcount == 0:
+                return False
+            registrar_transicion_estado(conn, turno_id, 'espera', 'llamando')
+            _registrar_llamado_reciente(conn, turno_id, sede)
+            _incrementar_version_tablero(conn, sede)
+            if rutas:
+                _servir_ruta(conn, sede, taquilla, modulo, rutas)
+    return True
+
+@medir('atender')
+def marcar_turno_atendido(turno_id):
+    """
+    Marca un turno como atendido y actualiza contadores y versión del tablero en la
+    misma transacción. Si ya estaba atendido no cambia nada (doble clic).
+    Devuelve (exito, turno) con turno = (modulo, numero_turno, taquilla_asignada, cedula_usuario, estado, sede).
+    """
+    engine = get_db_engine()
+    if not engine:
+        return False, None
+    
+    with engine.connect() as conn:
+        with conn.begin():
+            # Obtener (y bloquear) el turno antes de marcarlo como atendido
+            turno = conn.execute(repo.DATOS_TURNO, {"id": int(turno_id)}).fetchone()
+            
+            if turno and turno[4] != 'atendido':
+                conn.execute(repo.MARCAR_ATENDIDO, {"id": int(turno_id)})
+                conn.execute(repo.ATENDER_LLAMADO_RECIENTE, {"id": int(turno_id)})
+                registrar_transicion_estado(conn, int(turno_id), turno[4], 'atendido')
+                _incrementar_version_tablero(conn, turno[5])
+    
+    if turno:
+        log.info("turno_atendido", sede=turno[5], turno=f"{turno[0]}{turno[1]}", taquilla=turno[2], estado_anterior=turno[4])
+    return True, turno
 
-def taquilla_tiene_turno_activo(taquilla):
-    """Verifica si una taquilla ya tiene un turno en estado 'llamando'"""
+def taquilla_tiene_turno_activo(taquilla, sede=None):
+    """Verifica si una taquilla de la sede ya tiene un turno en estado 'llamando'"""
     engine = get_db_engine()
     if not engine:
         return False
@@ -599,21 +838,17 @@ def taquilla_tiene_turno_activo(taquilla):
     try:
         with engine.connect() as conn:
             result = conn.execute(
-                text("""
-                SELECT COUNT(*) FROM turnos 
-                WHERE taquilla_asignada = :taquilla 
-                AND estado = 'llamando'
-                """),
-                {"taquilla": taquilla}
+                repo.CONTAR_LLAMANDO_TAQUILLA,
+                {"sede": sede or SEDE, "taquilla": taquilla}
             )
             count = result.fetchone()[0]
             return count > 0
     except SQLAlchemyError as e:
-        print(f"❌ Error verificando taquilla activa: {e}")
+        log.error("taquilla_activa_error", taquilla=taquilla, error=e)
         return False
 
-def obtener_turno_activo_taquilla(taquilla):
-    """Obtiene el turno activo de una taquilla específica"""
+def obtener_turno_activo_taquilla(taquilla, sede=None):
+    """Obtiene el turno activo de una taquilla específica de la sede"""
     engine = get_db_engine()
     if not engine:
         return None
@@ -621,18 +856,12 @@ def obtener_turno_activo_taquilla(taquilla):
     try:
         with engine.connect() as conn:
             result = conn.execute(
-                text("""
-                SELECT id, modulo, numero_turno, nombre_usuario, tipo_tramite, fecha_llamado
-                FROM turnos 
-                WHERE taquilla_asignada = :taquilla 
-                AND estado = 'llamando'
-                LIMIT 1
-                """),
-                {"taquilla": taquilla}
+                repo.TURNO_ACTIVO_TAQUILLA,
+                {"sede": sede or SEDE, "taquilla": taquilla}
             )
             return result.fetchone()
     except SQLAlchemyError as e:
-        print(f"❌ Error obteniendo turno activo: {e}")
+        log.error("turno_activo_error", taquilla=taquilla, error=e)
         return None
     
 def limpiar_cache_personas():
@@ -640,7 +869,7 @@ def limpiar_cache_personas():
     with _cache['lock']:
         _cache['last_check'] = None
         _cache['personas_cache'] = []
-    print("🧹 Cache de personas limpiado")
+    log.debug("cache_personas_limpiado")
 
 def ya_tiene_turno_pendiente_robusto(cedula):
     """SOLO evita tener múltiples turnos PENDIENTES simultáneamente"""
@@ -652,19 +881,14 @@ def ya_tiene_turno_pendiente_robusto(cedula):
         with engine.connect() as conn:
             # Solo verificar turnos que aún NO han sido atendidos
             result = conn.execute(
-                text("""
-                SELECT COUNT(*) FROM turnos 
-                WHERE cedula_usuario = :cedula 
-                AND estado IN ('espera', 'llamando')
-                AND DATE(fecha_creacion) = CURDATE()  # ← AGREGAR ESTO
-                """),
+                repo.CONTAR_PENDIENTES_HOY_CEDULA,
                 {"cedula": cedula}
             )
             count = result.fetchone()[0]
             return count > 0
             
     except SQLAlchemyError as e:
-        print(f"❌ Error verificando turno (robusto): {e}")
+        log.error("verificar_turno_error", cedula=cedula, error=e)
         return False
     
 def limpiar_cache_turnos_pendientes(cedula=None):
@@ -675,85 +899,24 @@ def limpiar_cache_turnos_pendientes(cedula=None):
             keys_a_eliminar = [key for key in st.session_state.turnos_pendientes.keys() if key.startswith(cedula)]
             for key in keys_a_eliminar:
                 del st.session_state.turnos_pendientes[key]
-            print(f"🧹 Cache limpiado para cédula: {cedula}")
+            log.debug("cache_turnos_limpiado", cedula=cedula)
         else:
             # Limpiar todo el cache
             st.session_state.turnos_pendientes = {}
-            print("🧹 Cache de turnos pendientes limpiado completamente")
+            log.debug("cache_turnos_limpiado", cedula="todas")
 
 def init_database():
     """
-    Inicializa la tabla de turnos en analitica_fondos
+    Inicializa la base de datos aplicando las migraciones pendientes
+    (equivale a 'python migrar.py')
     """
     engine = get_db_engine()
     if engine:
         try:
-            with engine.connect() as conn:
-                # Asegurarnos de usar la base de datos correcta
-                conn.execute(text("USE analitica_fondos"))
-                
-                # Tabla de turnos principal
-                create_table_query = text("""
-                CREATE TABLE IF NOT EXISTS turnos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    modulo VARCHAR(10) NOT NULL,
-                    numero_turno VARCHAR(10) NOT NULL,
-                    estado ENUM('espera', 'llamando', 'atendido') DEFAULT 'espera',
-                    taquilla_asignada VARCHAR(50),
-                    nombre_usuario VARCHAR(100),
-                    cedula_usuario VARCHAR(20),
-                    tipo_tramite VARCHAR(50),
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    fecha_llamado TIMESTAMP NULL,
-                    INDEX idx_estado (estado),
-                    INDEX idx_modulo (modulo),
-                    INDEX idx_fecha_creacion (fecha_creacion)
-                )
-                """)
-                conn.execute(create_table_query)
-                print("✅ Tabla 'turnos' verificada en analitica_fondos")
-                
-                # NUEVA: Tabla de control para capturar el orden de llegada
-                create_control_query = text("""
-                CREATE TABLE IF NOT EXISTS control_turnos_externos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nombre1 VARCHAR(100),
-                    nombre2 VARCHAR(100),
-                    apellido1 VARCHAR(100),
-                    apellido2 VARCHAR(100),
-                    documento VARCHAR(20) NOT NULL,
-                    tema_solicitud VARCHAR(100),
-                    fecha_lectura TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    procesado BOOLEAN DEFAULT FALSE,
-                    turno_asignado VARCHAR(20),
-                    fecha_procesado TIMESTAMP NULL,
-                    INDEX idx_documento (documento),
-                    INDEX idx_procesado (procesado),
-                    INDEX idx_fecha_lectura (fecha_lectura),
-                    INDEX idx_documento_fecha (documento, fecha_lectura)
-                )
-                """)
-                conn.execute(create_control_query)
-                print("✅ Tabla 'control_turnos_externos' creada en analitica_fondos")
-                
-                # NUEVA: Tabla de contadores para gestionar números de turnos
-                create_contadores_query = text("""
-                CREATE TABLE IF NOT EXISTS contadores_turnos (
-                    modulo VARCHAR(10) NOT NULL PRIMARY KEY,
-                    ultimo_turno INT DEFAULT 0,
-                    fecha_reseteo TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    manual_reset BOOLEAN DEFAULT FALSE,
-                    INDEX idx_modulo (modulo)
-                )
-                """)
-                conn.execute(create_contadores_query)
-                print("✅ Tabla 'contadores_turnos' creada en analitica_fondos")
-                
-                conn.commit()
-                print("✅✅ Todas las tablas inicializadas correctamente en analitica_fondos")
-                
-                # Inicializar contadores para cada módulo si no existen
-                inicializar_contadores_turnos()
-                
+            aplicadas = aplicar_migraciones(engine)
+            if aplicadas:
+                log.info("migraciones_aplicadas", versiones=','.join(f'{v:04d}' for v in aplicadas))
+            else:
+                log.info("esquema_al_dia")
         except SQLAlchemyError as e:
-            print(f"❌ Error inicializando base de datos: {e}")
\ No newline at end of file
+            log.error("init_database_error", error=e)
@@ -0,0 +1,284 @@
+"""
+Diagnóstico de la sincronización vista externa → control_turnos_externos, a pedido
+(diagnostico_sincronizacion.py). Reúne lo que antes hacía verificar_sincronizacion
+en cada render de la Interfaz de Taquillas: conteos de filas, planes de ejecución de
+las lecturas de la sincronización y del worker, latencia de cada base y retraso
+entre el registro externo, la lectura en control y la asignación del turno.
+Nada de esto corre en las páginas: las taquillas no pagan estas consultas.
+"""
+
+import math
+import time
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from config.database import (
+    get_db_engine, get_external_db_engine, consulta_vista_externa,
+    EXTERNAL_TABLE_NAME, EXTERNAL_CURSOR_COLUMN,
+)
+from config import repositorio as repo
+from config.dialectos import es_sqlite, SQLPorDialecto
+from config.asincrono import ejecutar, en_paralelo, consultar
+from config.registro import obtener_logger
+
+log = obtener_logger('diagnostico')
+
+# Lecturas del lado de control cuyo plan se muestra (las del worker y la verificación)
+PLANES_CONTROL = {
+    'personas_pendientes': repo.PERSONAS_PENDIENTES,
+    'control_hoy': repo.CONTROL_HOY,
+    'control_reciente': repo.CONTROL_RECIENTE,
+}
+
+
+def _percentil(valores, porcentaje):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(len(ordenados) * porcentaje / 100) - 1)
+    return ordenados[indice]
+
+
+def _resumen(segundos):
+    """n, p50, p95 y máximo de una lista de duraciones en segundos"""
+    return {
+        'n': len(segundos),
+        'p50': _percentil(segundos, 50),
+        'p95': _percentil(segundos, 95),
+        'max': max(segundos) if segundos else None,
+    }
+
+
+def explicar(conn, consulta, params):
+    """Filas del EXPLAIN de una consulta (del repositorio o text()) como diccionarios"""
+    sqlite = es_sqlite(conn)
+    if isinstance(consulta, SQLPorDialecto):
+        sql = consulta.sql('sqlite' if sqlite else 'mysql')
+    else:
+        sql = consulta.text
+    if sqlite:
+        result = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)
+        return [_fila_plan_sqlite(fila.detail) for fila in result]
+    result = conn.execute(text(f"EXPLAIN {sql}"), params)
+    return [dict(fila) for fila in result.mappings()]
+
+
+def _fila_plan_sqlite(detalle):
+    """Traduce un paso de EXPLAIN QUERY PLAN a las columnas de EXPLAIN de MySQL que se revisan"""
+    partes = detalle.split()
+    tabla = partes[1] if len(partes) > 1 and partes[0] in ('SCAN', 'SEARCH') else None
+    recorrido = partes[:1] == ['SCAN'] and 'INDEX' not in partes
+    return {'table': tabla, 'type': 'ALL' if recorrido else partes[0], 'key': detalle, 'rows': None}
+
+
+def _engines():
+    """(engine externo, engine principal), o None si falta alguno"""
+    engine_ext = get_external_db_engine()
+    engine_main = get_db_engine()
+    if not engine_ext or not engine_main:
+        log.error("diagnostico_sin_conexion", externa=bool(engine_ext), principal=bool(engine_main))
+        return None
+    return engine_ext, engine_main
+
+
+def contar_filas():
+    """
+    Filas de la vista externa (hoy con el filtro de la sincronización y en total) y de
+    control (total, hoy y pendientes de hoy). None si falla.
+    """
+    engines = _engines()
+    if not engines:
+        return None
+    engine_ext, engine_main = engines
+
+    query, params = consulta_vista_externa()
+    try:
+        with engine_ext.connect() as conn:
+            externa_hoy = conn.execute(text(f"SELECT COUNT(*) FROM ({query.text}) hoy"), params).scalar()
+            externa_total = conn.execute(text(f"SELECT COUNT(*) FROM {EXTERNAL_TABLE_NAME}")).scalar()
+        with engine_main.connect() as conn:
+            total, hoy, pendientes = conn.execute(repo.CONTROL_CONTEOS).fetchone()
+    except SQLAlchemyError as e:
+        log.error("contar_filas_error", error=e)
+        return None
+    return {
+        'externa': {'hoy': int(externa_hoy), 'total': int(externa_total)},
+        'control': {'hoy': int(hoy), 'pendientes': int(pendientes), 'total': int(total)},
+    }
+
+
+def planes():
+    """
+    EXPLAIN de la lectura de la sincronización en la vista externa y de las lecturas
+    de control: {'externa': {nombre: filas}, 'control': {nombre: filas}}. None si falla.
+    """
+    engines = _engines()
+    if not engines:
+        return None
+    engine_ext, engine_main = engines
+
+    query, params = consulta_vista_externa()
+    try:
+        with engine_ext.connect() as conn:
+            externa = {'sincronizacion': explicar(conn, query, params)}
+        with engine_main.connect() as conn:
+            control = {nombre: explicar(conn, consulta, {}) for nombre, consulta in PLANES_CONTROL.items()}
+    except SQLAlchemyError as e:
+        log.error("planes_error", error=e)
+        return None
+    return {'externa': externa, 'control': control}
+
+
+def _cronometrar(conn, consulta, params, repeticiones):
+    segundos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        conn.execute(consulta, params).fetchall()
+        segundos.append(time.perf_counter() - inicio)
+    return _resumen(segundos)
+
+
+def medir_latencias(repeticiones=5):
+    """
+    Tiempo por base de una ida y vuelta (SELECT 1) y de su lectura principal: la de la
+    sincronización en la vista externa y la de pendientes del worker en control.
+    Cada base se mide por separado, con una conexión ya abierta. None si falla.
+    """
+    engines = _engines()
+    if not engines:
+        return None
+    engine_ext, engine_main = engines
+
+    query, params = consulta_vista_externa()
+    fuentes = {
+        'externa': (engine_ext, query, params),
+        'principal': (engine_main, repo.PERSONAS_PENDIENTES, {}),
+    }
+    latencias = {}
+    try:
+        for fuente, (engine, consulta, parametros) in fuentes.items():
+            with engine.connect() as conn:
+                latencias[fuente] = {
+                    'ida_vuelta': _cronometrar(conn, text("SELECT 1"), {}, repeticiones),
+                    'consulta': _cronometrar(conn, consulta, parametros, repeticiones),
+                }
+    except SQLAlchemyError as e:
+        log.error("medir_latencias_error", error=e)
+        return None
+    return latencias
+
+
+def verificar_sincronizacion(muestra=20):
+    """
+    Últimos `muestra` registros de la vista externa y la tabla de control desde ayer
+    (leídas a la vez, cada una en su base), y cuáles de esos registros externos de hoy
+    aún no tienen fila en control. None si falla.
+    """
+    engines = _engines()
+    if not engines:
+        return None
+    engine_ext, engine_main = engines
+
+    query = text(f"""
+    SELECT fecha, documento, tema_de_solicitud
+    FROM {EXTERNAL_TABLE_NAME}
+    WHERE tema_de_solicitud IN ('Notificaciones')
+    ORDER BY fecha DESC
+    LIMIT :muestra
+    """)
+    try:
+        lecturas = ejecutar(en_paralelo(
+            externos=consultar(engine_ext, query, {"muestra": muestra}),
+            control=consultar(engine_main, repo.CONTROL_RECIENTE)
+        ))
+    except SQLAlchemyError as e:
+        log.error("verificacion_error", error=e)
+        return None
+
+    registros = lecturas['externos']
+    registros_control = lecturas['control']
+    # Misma comparación de fecha que la sincronización (cualquiera de sus formatos de hoy)
+    fechas_hoy = set(consulta_vista_externa()[1].values())
+    en_control = {(reg[0], reg[1]) for reg in registros_control}
+    faltantes = [
+        reg for reg in registros
+        if reg[1] and str(reg[0]) in fechas_hoy and (reg[1], reg[2]) not in en_control
+    ]
+
+    for reg in registros:
+        log.fila("verificacion_registro_externo", fecha=reg[0], documento=reg[1], tema=reg[2])
+    for reg in registros_control:
+        log.fila("verificacion_registro_control", documento=reg[0], tema=reg[1], procesado=reg[2], fecha=reg[3])
+    log.info("verificacion", vista=EXTERNAL_TABLE_NAME, externos=len(registros),
+             control=len(registros_control), faltantes=len(faltantes))
+    return {'externos': registros, 'control': registros_control, 'faltantes': faltantes}
+
+
+def _registros_externos_hoy(engine_ext):
+    """
+    (documento, tema) -> momento de registro de las filas de hoy de la vista externa.
+    El momento es EXTERNAL_CURSOR_COLUMN cuando esa columna trae fechas; si no está
+    configurada o es un id, el valor queda en None y solo se mide desde la lectura.
+    """
+    query, params = consulta_vista_externa()
+    usa_cursor = EXTERNAL_CURSOR_COLUMN.isidentifier()
+    with engine_ext.connect() as conn:
+        filas = conn.execute(query, params).fetchall()
+
+    registros = {}
+    for fila in filas:
+        momento = fila[-1] if usa_cursor else None
+        if isinstance(momento, str):
+            try:
+                momento = datetime.fromisoformat(momento)
+            except ValueError:
+                momento = None
+        registros[(fila[4], fila[5])] = momento if isinstance(momento, datetime) else None
+    return registros
+
+
+def medir_retrasos():
+    """
+    Retraso de hoy entre cada etapa, en segundos (n, p50, p95, max):
+    registro externo → lectura en control, lectura → turno asignado y registro → turno.
+    También cuenta registros externos que aún no llegan a control y pendientes de
+    asignar con la edad del más antiguo. None si falla.
+    """
+    engines = _engines()
+    if not engines:
+        return None
+    engine_ext, engine_main = engines
+
+    try:
+        registros = _registros_externos_hoy(engine_ext)
+        with engine_main.connect() as conn:
+            filas = conn.execute(repo.CONTROL_HOY).fetchall()
+    except SQLAlchemyError as e:
+        log.error("medir_retrasos_error", error=e)
+        return None
+
+    ahora = datetime.now()
+    lectura, asignacion, total = [], [], []
+    pendientes = []
+    vistos = set()
+    for documento, tema, procesado, turno, fecha_lectura, fecha_procesado in filas:
+        vistos.add((documento, tema))
+        registro = registros.get((documento, tema))
+        if registro and fecha_lectura:
+            lectura.append((fecha_lectura - registro).total_seconds())
+        if turno and fecha_procesado:
+            if fecha_lectura:
+                asignacion.append((fecha_procesado - fecha_lectura).total_seconds())
+            if registro:
+                total.append((fecha_procesado - registro).total_seconds())
+        elif not procesado and fecha_lectura:
+            pendientes.append((ahora - fecha_lectura).total_seconds())
+
+    return {
+        'registro_a_lectura': _resumen(lectura),
+        'lectura_a_turno': _resumen(asignacion),
+        'registro_a_turno': _resumen(total),
+        'sin_leer': sum(1 for clave in registros if clave[0] and clave not in vistos),
+        'pendientes': len(pendientes),
+        'pendiente_mas_antiguo': max(pendientes) if pendientes else None,
+    }
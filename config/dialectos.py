@@ -0,0 +1,98 @@
+"""
+SQL portable entre MySQL (producción) y SQLite (pruebas y benchmarks locales).
+Las sentencias se escriben una vez con marcadores como {hoy} o {ahora}; las que
+no se pueden expresar así (upserts, RETURNING, formatos de fecha) llevan una
+variante SQLite completa. La variante se elige al compilar según el dialecto
+de la conexión, así que el código llama conn.execute(consulta) igual en ambos.
+"""
+
+from sqlalchemy import text, event
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.ext.compiler import compiles
+
+FRAGMENTOS = {
+    'mysql': {
+        'hoy': "CURDATE()",
+        'manana': "CURDATE() + INTERVAL 1 DAY",
+        'ayer': "CURDATE() - INTERVAL 1 DAY",
+        'dia_siguiente': ":dia + INTERVAL 1 DAY",
+        'ahora': "NOW()",
+        'insertar_ignorando': "INSERT IGNORE",
+        'bloquear': "FOR UPDATE",
+        'bloquear_saltando': "FOR UPDATE SKIP LOCKED",
+    },
+    'sqlite': {
+        'hoy': "date('now', 'localtime')",
+        'manana': "date('now', 'localtime', '+1 day')",
+        'ayer': "date('now', 'localtime', '-1 day')",
+        'dia_siguiente': "date(:dia, '+1 day')",
+        'ahora': "datetime('now', 'localtime')",
+        'insertar_ignorando': "INSERT OR IGNORE",
+        # SQLite no tiene bloqueo por fila: las transacciones se abren con
+        # BEGIN IMMEDIATE (ver preparar_engine_sqlite) y se serializan
+        'bloquear': "",
+        'bloquear_saltando': "",
+    },
+}
+DIALECTO_POR_DEFECTO = 'mysql'
+
+
+def es_sqlite(conn):
+    """True si la conexión o engine es SQLite"""
+    return conn.dialect.name == 'sqlite'
+
+
+class SQLPorDialecto(Executable, ClauseElement):
+    """Sentencia con una variante de SQL por dialecto, elegida al compilar"""
+
+    inherit_cache = False
+
+    def __init__(self, sql, sqlite=None, tipos=None):
+        self.variantes = {}
+        for dialecto, fragmentos in FRAGMENTOS.items():
+            base = sqlite if dialecto == 'sqlite' and sqlite is not None else sql
+            self.variantes[dialecto] = base.format(**fragmentos)
+        self.tipos = tipos or {}
+        self._clausulas = {}
+
+    def sql(self, dialecto=DIALECTO_POR_DEFECTO):
+        """Texto SQL de la variante para un dialecto"""
+        return self.variantes.get(dialecto, self.variantes[DIALECTO_POR_DEFECTO])
+
+    def para(self, dialecto=DIALECTO_POR_DEFECTO):
+        """Cláusula text() (con tipos de columnas si se indicaron) para un dialecto"""
+        clausula = self._clausulas.get(dialecto)
+        if clausula is None:
+            clausula = text(self.sql(dialecto))
+            if self.tipos:
+                clausula = clausula.columns(**self.tipos)
+            self._clausulas[dialecto] = clausula
+        return clausula
+
+
+@compiles(SQLPorDialecto)
+def _compilar(elemento, compilador, **kw):
+    return compilador.process(elemento.para(compilador.dialect.name), **kw)
+
+
+def preparar_engine_sqlite(engine):
+    """
+    Ajustes para usar SQLite como sustituto de MySQL con varios hilos: WAL para
+    que las lecturas no esperen a las escrituras y BEGIN IMMEDIATE para que
+    'leer y luego actualizar' (llamar turno, reservar números) sea atómico.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _al_conectar(conexion_dbapi, registro):
+        # El driver no abre transacciones por su cuenta; las abre el evento begin
+        conexion_dbapi.isolation_level = None
+        cursor = conexion_dbapi.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _al_empezar(conn):
+        # Directo al driver: no es una sentencia de la aplicación y no debe
+        # sumar en los conteos de sentencias por operación
+        conn.connection.dbapi_connection.execute("BEGIN IMMEDIATE")
@@ -0,0 +1,247 @@
+import os
+import time
+import bisect
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import event
+from config.registro import obtener_logger
+
+# Métricas del proceso en formato de texto de Prometheus. Se exponen en la
+# sección de administración del Panel de Control y, si METRICAS_PUERTO > 0,
+# en http://<METRICAS_HOST>:<puerto>/metrics (solo local salvo que se abra el host)
+METRICAS_PUERTO = int(os.getenv('METRICAS_PUERTO', '0'))
+METRICAS_HOST = os.getenv('METRICAS_HOST', '127.0.0.1')
+
+BUCKETS_SEGUNDOS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_SENTENCIAS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+log = obtener_logger('metricas')
+
+_metricas = {}
+_lock = threading.Lock()
+_operaciones = threading.local()
+_servidor = None
+
+
+def _etiquetas(valores):
+    if not valores:
+        return ''
+    return '{' + ','.join(f'{clave}="{valor}"' for clave, valor in valores) + '}'
+
+
+class Contador:
+    def __init__(self, nombre, ayuda):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.valores = {}
+
+    def sumar(self, cantidad=1, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with _lock:
+            self.valores[clave] = self.valores.get(clave, 0) + cantidad
+
+    def texto(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"]
+        for clave, valor in sorted(self.valores.items()):
+            lineas.append(f"{self.nombre}{_etiquetas(clave)} {valor}")
+        return lineas
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, buckets):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.buckets = buckets
+        self.valores = {}  # etiquetas -> [conteos por bucket, suma, total]
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with _lock:
+            datos = self.valores.setdefault(clave, [[0] * len(self.buckets), 0.0, 0])
+            indice = bisect.bisect_left(self.buckets, valor)
+            if indice < len(self.buckets):
+                datos[0][indice] += 1
+            datos[1] += valor
+            datos[2] += 1
+
+    def resumen(self):
+        """{etiquetas: (total, promedio)} para mostrar en las páginas"""
+        with _lock:
+            return {clave: (d[2], d[1] / d[2] if d[2] else 0.0) for clave, d in self.valores.items()}
+
+    def texto(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        for clave, (conteos, suma, total) in sorted(self.valores.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(clave + (('le', limite),))} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(clave + (('le', '+Inf'),))} {total}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(clave)} {round(suma, 6)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(clave)} {total}")
+        return lineas
+
+
+def _registrar(metrica):
+    _metricas[metrica.nombre] = metrica
+    return metrica
+
+
+OPERACION_SEGUNDOS = _registrar(Histograma(
+    'turnos_operacion_segundos', 'Duración de cada operación lógica', BUCKETS_SEGUNDOS))
+OPERACION_SENTENCIAS = _registrar(Histograma(
+    'turnos_operacion_sentencias', 'Sentencias SQL ejecutadas por operación lógica', BUCKETS_SENTENCIAS))
+OPERACION_ERRORES = _registrar(Contador(
+    'turnos_operacion_errores_total', 'Operaciones que terminaron con excepción'))
+SQL_SEGUNDOS = _registrar(Histograma(
+    'turnos_sql_segundos', 'Duración de cada sentencia SQL', BUCKETS_SEGUNDOS))
+POOL_ESPERA_SEGUNDOS = _registrar(Histograma(
+    'turnos_pool_espera_segundos', 'Espera para obtener una conexión del pool', BUCKETS_SEGUNDOS))
+
+
+def _activas():
+    if not hasattr(_operaciones, 'pila'):
+        _operaciones.pila = []
+    return _operaciones.pila
+
+
+class medir:
+    """
+    Mide una operación lógica: duración total y sentencias SQL ejecutadas en el
+    hilo mientras dura (incluye las de operaciones anidadas).
+    Se usa como `with medir('llamar'):` o como decorador `@medir('llamar')`.
+    """
+
+    def __init__(self, operacion):
+        self.operacion = operacion
+
+    def __enter__(self):
+        self.sentencias = 0
+        self.inicio = time.perf_counter()
+        _activas().append(self)
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        _activas().remove(self)
+        OPERACION_SEGUNDOS.observar(time.perf_counter() - self.inicio, operacion=self.operacion)
+        OPERACION_SENTENCIAS.observar(self.sentencias, operacion=self.operacion)
+        if tipo is not None:
+            OPERACION_ERRORES.sumar(operacion=self.operacion)
+        return False
+
+    def __call__(self, funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir(self.operacion):
+                return funcion(*args, **kwargs)
+        return envoltura
+
+
+def operaciones_activas():
+    """Operaciones medidas en curso en este hilo, para heredarlas en otro (ver heredar_operaciones)"""
+    return list(_activas())
+
+
+class heredar_operaciones:
+    """
+    Cuenta las sentencias que se ejecuten en este hilo también en operaciones
+    abiertas en otro hilo (lecturas concurrentes de config/asincrono.py)
+    """
+
+    def __init__(self, operaciones):
+        self.operaciones = operaciones
+
+    def __enter__(self):
+        _activas()[:0] = self.operaciones
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        del _activas()[:len(self.operaciones)]
+        return False
+
+
+def instrumentar_engine(engine, nombre):
+    """Registra los eventos de SQLAlchemy que cuentan y cronometran cada sentencia"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('inicio_sentencia', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        inicio = conn.info['inicio_sentencia'].pop()
+        pila = _activas()
+        operacion = pila[-1].operacion if pila else 'otra'
+        SQL_SEGUNDOS.observar(time.perf_counter() - inicio, engine=nombre, operacion=operacion)
+        # Una operación puede recibir sentencias de varios hilos a la vez
+        with _lock:
+            for activa in pila:
+                activa.sentencias += 1
+
+    @event.listens_for(engine, "handle_error")
+    def _error(contexto):
+        if contexto.connection is not None:
+            pendientes = contexto.connection.info.get('inicio_sentencia')
+            if pendientes:
+                pendientes.pop()
+
+
+def observar_espera_pool(nombre, segundos):
+    POOL_ESPERA_SEGUNDOS.observar(segundos, engine=nombre)
+
+
+def texto_prometheus():
+    """Todas las métricas del proceso en formato de texto de Prometheus"""
+    from config.conexiones import estadisticas_pools
+
+    lineas = []
+    for metrica in list(_metricas.values()):
+        with _lock:
+            lineas.extend(metrica.texto())
+
+    pools = estadisticas_pools()
+    for campo, ayuda in (('en_uso', 'Conexiones prestadas'), ('disponibles', 'Conexiones libres en el pool'),
+                         ('overflow', 'Conexiones por encima de pool_size'), ('tamano', 'pool_size configurado')):
+        lineas.append(f"# HELP turnos_pool_{campo} {ayuda}")
+        lineas.append(f"# TYPE turnos_pool_{campo} gauge")
+        for nombre, datos in pools.items():
+            lineas.append(f'turnos_pool_{campo}{{engine="{nombre}"}} {datos[campo]}')
+    return '\n'.join(lineas) + '\n'
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        cuerpo = texto_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def iniciar_servidor_metricas(puerto=None, host=None):
+    """Sirve /metrics en un hilo daemon, una sola vez por proceso (si METRICAS_PUERTO > 0)"""
+    global _servidor
+    puerto = METRICAS_PUERTO if puerto is None else puerto
+    host = host or METRICAS_HOST
+    if not puerto:
+        return False
+    with _lock:
+        if _servidor:
+            return True
+        try:
+            _servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+        except OSError as e:
+            # Otro proceso (p. ej. el worker aparte) ya usa el puerto
+            log.warning("metricas_puerto_ocupado", puerto=puerto, error=e)
+            return False
+        threading.Thread(target=_servidor.serve_forever, name='metricas', daemon=True).start()
+    log.info("metricas_servidor_iniciado", host=host, puerto=puerto)
+    return True
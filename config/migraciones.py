@@ -0,0 +1,119 @@
+import os
+import re
+import importlib.util
+from sqlalchemy import text, inspect
+from sqlalchemy.exc import SQLAlchemyError
+from config.registro import obtener_logger
+
+# Migraciones numeradas: migraciones/NNNN_descripcion.py con DESCRIPCION y aplicar(conn)
+DIRECTORIO_MIGRACIONES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migraciones')
+_PATRON_ARCHIVO = re.compile(r'^(\d{4})_\w+\.py$')
+_NOMBRE_LOCK = 'turnos_migraciones'
+
+_esquema_al_dia = False
+
+log = obtener_logger('migraciones')
+
+
+def existe_tabla(conn, tabla):
+    return inspect(conn).has_table(tabla)
+
+
+def existe_columna(conn, tabla, columna):
+    return any(c['name'] == columna for c in inspect(conn).get_columns(tabla))
+
+
+def existe_indice(conn, tabla, indice):
+    inspector = inspect(conn)
+    nombres = [i['name'] for i in inspector.get_indexes(tabla)]
+    nombres += [u['name'] for u in inspector.get_unique_constraints(tabla)]
+    return indice in nombres
+
+
+def listar_migraciones():
+    """Lista de (version, nombre_archivo) ordenada por versión"""
+    migraciones = []
+    for archivo in os.listdir(DIRECTORIO_MIGRACIONES):
+        coincidencia = _PATRON_ARCHIVO.match(archivo)
+        if coincidencia:
+            migraciones.append((int(coincidencia.group(1)), archivo))
+    return sorted(migraciones)
+
+
+def _cargar_migracion(archivo):
+    ruta = os.path.join(DIRECTORIO_MIGRACIONES, archivo)
+    spec = importlib.util.spec_from_file_location(f"migraciones.m{archivo[:-3]}", ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def _asegurar_tabla_version(conn):
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT NOT NULL PRIMARY KEY,
+        descripcion VARCHAR(200),
+        fecha_aplicacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """))
+    conn.commit()
+
+
+def version_actual(conn):
+    """Última versión aplicada (0 si la base no tiene migraciones)"""
+    if not existe_tabla(conn, 'schema_version'):
+        return 0
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def migraciones_pendientes(engine):
+    """Migraciones (version, archivo) que aún no se aplicaron"""
+    with engine.connect() as conn:
+        actual = version_actual(conn)
+    return [(version, archivo) for version, archivo in listar_migraciones() if version > actual]
+
+
+def aplicar_migraciones(engine, hasta=None):
+    """
+    Aplica en orden las migraciones pendientes (hasta la versión `hasta` si se indica).
+    Un lock con nombre evita que dos despliegues migren a la vez (en SQLite no hace
+    falta: BEGIN IMMEDIATE ya serializa a los escritores).
+    Devuelve la lista de versiones aplicadas; si una falla se detiene y propaga el error.
+    """
+    aplicadas = []
+    with engine.connect() as conn:
+        usa_lock = conn.dialect.name == 'mysql'
+        if usa_lock:
+            conn.execute(text("SELECT GET_LOCK(:nombre, 60)"), {"nombre": _NOMBRE_LOCK})
+        try:
+            _asegurar_tabla_version(conn)
+            actual = version_actual(conn)
+            for version, archivo in listar_migraciones():
+                if version <= actual or (hasta is not None and version > hasta):
+                    continue
+                migracion = _cargar_migracion(archivo)
+                log.info("aplicando_migracion", version=f"{version:04d}", descripcion=migracion.DESCRIPCION)
+                migracion.aplicar(conn)
+                conn.execute(
+                    text("INSERT INTO schema_version (version, descripcion) VALUES (:version, :descripcion)"),
+                    {"version": version, "descripcion": migracion.DESCRIPCION[:200]}
+                )
+                conn.commit()
+                aplicadas.append(version)
+        finally:
+            conn.rollback()
+            if usa_lock:
+                conn.execute(text("SELECT RELEASE_LOCK(:nombre)"), {"nombre": _NOMBRE_LOCK})
+    return aplicadas
+
+
+def esquema_al_dia(engine):
+    """True si no hay migraciones pendientes; se consulta una sola vez por proceso"""
+    global _esquema_al_dia
+    if not _esquema_al_dia:
+        try:
+            _esquema_al_dia = not migraciones_pendientes(engine)
+        except SQLAlchemyError as e:
+            log.error("version_esquema_error", error=e)
+            return False
+    return _esquema_al_dia
@@ -0,0 +1,419 @@
+"""
+Motor de cola en memoria (opcional): un proceso aparte (python motor_cola.py)
+guarda por sede una cola FIFO por módulo ordenada por (fecha_creacion, id), los
+turnos en atención por taquilla y los últimos llamados. Llamar, listar la cola y
+refrescar una pantalla se responden desde memoria; cada transición se escribe
+primero en turnos (write-through) y solo después cambia la memoria.
+
+El estado se reconstruye desde la base al arrancar y cada MOTOR_COLA_RECONSTRUIR
+segundos, y cada MOTOR_COLA_SONDEO segundos se leen los turnos nuevos que creó el
+worker (en espera, desde MOTOR_COLA_VENTANA ids antes del último visto). Los
+procesos de Streamlit lo consultan por HTTP local con config/cliente_cola.py.
+"""
+
+import os
+import json
+import heapq
+import threading
+from collections import deque
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy.exc import SQLAlchemyError
+from config.database import (
+    SEDE, SEDES, TABLERO_LLAMADOS_RECIENTES, get_db_engine, reclamar_turno, es_taquilla_ocupada,
+    marcar_turno_atendido, obtener_llamados_recientes, obtener_turno_activo_taquilla, armar_cola,
+    obtener_rutas_taquilla, ordenar_modulos, mensaje_cola_vacia
+)
+from config import repositorio as repo
+from config.registro import obtener_logger
+
+log = obtener_logger('motor_cola')
+
+MOTOR_COLA_HOST = os.getenv('MOTOR_COLA_HOST', '127.0.0.1')
+MOTOR_COLA_PUERTO = int(os.getenv('MOTOR_COLA_PUERTO', '8765'))
+MOTOR_COLA_SONDEO = float(os.getenv('MOTOR_COLA_SONDEO', '1'))              # segundos entre lecturas de turnos nuevos
+MOTOR_COLA_RECONSTRUIR = float(os.getenv('MOTOR_COLA_RECONSTRUIR', '300'))  # segundos entre reconstrucciones completas
+MOTOR_COLA_VENTANA = int(os.getenv('MOTOR_COLA_VENTANA', '1000'))           # ids antes del último visto que se vuelven a leer
+
+# Posiciones de las filas de cola (mismas columnas que COLA_ESPERA)
+_ID, _MODULO, _NUMERO, _NOMBRE, _CEDULA, _TRAMITE, _ESTADO, _TAQUILLA, _FECHA_LLAMADO, _FECHA_CREACION = range(10)
+# id de llamados_recientes en las filas de LLAMADOS_RECIENTES
+_ID_LLAMADO = 5
+
+
+def _clave(fila):
+    return fila[_FECHA_CREACION], fila[_ID]
+
+
+def _fusionar_llamados(actuales, leidos):
+    """
+    Llamados recientes leídos fuera del lock unidos a los que ya están en memoria (otra
+    taquilla pudo guardar una lectura más nueva): por id, con la fila recién leída primero
+    """
+    por_id = {fila[_ID_LLAMADO]: fila for fila in actuales}
+    por_id.update((fila[_ID_LLAMADO], fila) for fila in leidos)
+    return sorted(por_id.values(), key=lambda fila: fila[_ID_LLAMADO], reverse=True)[:TABLERO_LLAMADOS_RECIENTES]
+
+
+class ColaSede:
+    """Estado en memoria de una sede; se modifica solo con `lock` tomado"""
+
+    def __init__(self):
+        self.espera = {}       # modulo -> deque de filas en orden (fecha_creacion, id)
+        self.ids_espera = set()
+        self.llamando = {}     # taquilla -> fila
+        self.atendidos = 0
+        self.version = 0
+        self.llamados = []     # filas de llamados_recientes, la más reciente primero
+        self.lock = threading.Lock()
+
+    def agregar(self, fila):
+        """
+        Agrega un turno en espera (los nuevos llegan en orden de id, al final de su módulo).
+        Devuelve False si ya estaba en la cola o en atención.
+        """
+        if fila[_ID] in self.ids_espera or any(activo[_ID] == fila[_ID] for activo in self.llamando.values()):
+            return False
+        cola = self.espera.setdefault(fila[_MODULO], deque())
+        if cola and _clave(cola[-1]) > _clave(fila):
+            # Llegó fuera de orden: se reordena solo ese módulo
+            cola.append(fila)
+            self.espera[fila[_MODULO]] = deque(sorted(cola, key=_clave))
+        else:
+            cola.append(fila)
+        self.ids_espera.add(fila[_ID])
+        return True
+
+    def sacar_siguiente(self, modulos=None):
+        """
+        Quita y devuelve el turno en espera más antiguo entre todos los módulos o,
+        con `modulos` (en el orden de ordenar_modulos), el primero del primer módulo con turnos
+        """
+        if modulos:
+            for modulo in modulos:
+                cola = self.espera.get(modulo)
+                if cola:
+                    fila = cola.popleft()
+                    self.ids_espera.discard(fila[_ID])
+                    return fila
+            return None
+        cabezas = [cola for cola in self.espera.values() if cola]
+        if not cabezas:
+            return None
+        fila = min(cabezas, key=lambda cola: _clave(cola[0])).popleft()
+        self.ids_espera.discard(fila[_ID])
+        return fila
+
+    def devolver(self, fila):
+        """Vuelve a poner al frente un turno que no se pudo reclamar por un error"""
+        if fila[_ID] in self.ids_espera:
+            # Una reconstrucción ya lo volvió a cargar
+            return
+        self.espera.setdefault(fila[_MODULO], deque()).appendleft(fila)
+        self.ids_espera.add(fila[_ID])
+
+    def pagina(self, desde, limite):
+        """Página de la cola después de la clave `desde`, con una fila de más (como COLA_ESPERA_DESDE)"""
+        filas = []
+        for fila in heapq.merge(*self.espera.values(), key=_clave):
+            if desde and _clave(fila) <= desde:
+                continue
+            filas.append(fila)
+            if len(filas) > limite:
+                break
+        return filas
+
+    def conteos(self):
+        return [('espera', len(self.ids_espera)), ('llamando', len(self.llamando)), ('atendido', self.atendidos)]
+
+
+class MotorCola:
+    """Colas de todas las sedes, con escritura a la base en cada transición"""
+
+    def __init__(self):
+        self.sedes = {}
+        self.ultimo_id = 0
+        self._lock = threading.Lock()
+
+    def _sede(self, sede):
+        with self._lock:
+            if sede not in self.sedes:
+                self.sedes[sede] = ColaSede()
+            return self.sedes[sede]
+
+    # ------------------------------------------------------------------
+    # Carga desde la base
+    # ------------------------------------------------------------------
+
+    def reconstruir(self):
+        """Recarga todas las sedes desde turnos, contadores_estado y el buffer de llamados"""
+        engine = get_db_engine()
+        if not engine:
+            raise SQLAlchemyError("Sin conexión a la base de datos")
+
+        with engine.connect() as conn:
+            # El último id se lee antes que las colas: lo que se cree en medio lo trae el sondeo
+            ultimo_id = conn.execute(repo.MAX_ID_TURNOS).scalar()
+            for sede in sorted(set(SEDES) | set(self.sedes)):
+                nueva = ColaSede()
+                for fila in conn.execute(repo.COLA_COMPLETA, {"sede": sede}):
+                    nueva.agregar(tuple(fila))
+                for fila in conn.execute(repo.TURNOS_LLAMANDO, {"sede": sede}):
+                    nueva.llamando[fila[_TAQUILLA]] = tuple(fila)
+                conteos = dict(conn.execute(repo.CONTAR_POR_ESTADO, {"sede": sede}).fetchall())
+                nueva.atendidos = int(conteos.get('atendido', 0))
+                nueva.version = conn.execute(repo.VERSION_TABLERO, {"sede": sede}).scalar() or 0
+                nueva.llamados = [tuple(fila) for fila in conn.execute(
+                    repo.LLAMADOS_RECIENTES, {"sede": sede, "limite": TABLERO_LLAMADOS_RECIENTES}
+                )]
+
+                actual = self._sede(sede)
+                with actual.lock:
+                    nueva.lock = actual.lock
+                    self.sedes[sede] = nueva
+        self.ultimo_id = max(self.ultimo_id, ultimo_id)
+        log.info("motor_cola_reconstruido", sedes=len(self.sedes),
+                 espera=sum(len(cola.ids_espera) for cola in self.sedes.values()), ultimo_id=self.ultimo_id)
+
+    def sondear(self):
+        """
+        Agrega los turnos en espera desde MOTOR_COLA_VENTANA ids antes del último visto.
+        Varios asignadores (el worker de cada proceso y worker_turnos.py) confirman lotes
+        a la vez, y uno con ids mayores puede confirmar antes que otro: con la ventana,
+        el lote atrasado entra en el siguiente sondeo aunque el último id visto ya lo
+        haya pasado; lo que ya está en la cola o en atención se omite. Devuelve cuántos agregó.
+        """
+        engine = get_db_engine()
+        if not engine:
+            return 0
+        with engine.connect() as conn:
+            filas = conn.execute(
+                repo.TURNOS_NUEVOS, {"desde": max(0, self.ultimo_id - MOTOR_COLA_VENTANA)}
+            ).fetchall()
+        agregados = 0
+        for fila in filas:
+            cola = self._sede(fila[10])
+            with cola.lock:
+                agregados += self._sede(fila[10]).agregar(tuple(fila[:10]))
+        if filas:
+            self.ultimo_id = max(self.ultimo_id, filas[-1][_ID])
+        if agregados:
+            log.debug("motor_cola_turnos_nuevos", cantidad=agregados)
+        return agregados
+
+    # ------------------------------------------------------------------
+    # Transiciones (primero la base, después la memoria)
+    # ------------------------------------------------------------------
+
+    def llamar(self, taquilla, sede):
+        """
+        Misma respuesta que llamar_siguiente_turno: (turno, id, mensaje, usuario, tramite).
+        El lock de la sede se toma solo para sacar, devolver o registrar el turno en
+        memoria; las lecturas y el reclamo en la base corren fuera de él, así un
+        llamado no hace esperar a las demás taquillas de la sede.
+        """
+        taquilla = taquilla.strip()
+        ocupada = None, None, "❌ Ya tienes un turno en atención. Termina el actual primero.", None, None
+        # reconstruir() reemplaza la cola de la sede conservando su lock: con el lock
+        # tomado se vuelve a pedir la cola vigente
+        cola = self._sede(sede)
+        with cola.lock:
+            activo = self._sede(sede).llamando.get(taquilla)
+        if activo and not self._sigue_llamando(taquilla, sede, activo):
+            activo = None
+        if activo:
+            return ocupada
+        # Las rutas (y su reparto del día) se leen de la base: el panel las puede cambiar
+        rutas = obtener_rutas_taquilla(taquilla, sede)
+        modulos = ordenar_modulos(rutas)
+        while True:
+            with cola.lock:
+                fila = self._sede(sede).sacar_siguiente(modulos)
+            if fila is None:
+                return None, None, mensaje_cola_vacia(rutas), None, None
+            try:
+                reclamado = reclamar_turno(taquilla, fila[_ID], sede, fila[_MODULO], rutas)
+            except SQLAlchemyError as e:
+                self._devolver(sede, fila)
+                if es_taquilla_ocupada(e):
+                    # Otra instancia, proceso o clic le dio un turno a esta taquilla
+                    return ocupada
+                log.error("motor_llamar_error", sede=sede, taquilla=taquilla, error=e)
+                return None, None, f"❌ Error al llamar turno: {e}", None, None
+            if reclamado:
+                break
+            # Lo llamó o atendió alguien sin pasar por el motor: se descarta
+            log.debug("motor_turno_descartado", sede=sede, turno_id=fila[_ID])
+
+        llamados = [tuple(fila) for fila in obtener_llamados_recientes(TABLERO_LLAMADOS_RECIENTES, sede)]
+        llamado = list(fila)
+        llamado[_ESTADO], llamado[_TAQUILLA], llamado[_FECHA_LLAMADO] = 'llamando', taquilla, datetime.now()
+        with cola.lock:
+            cola = self._sede(sede)
+            cola.llamando[taquilla] = tuple(llamado)
+            cola.version += 1
+            cola.llamados = _fusionar_llamados(cola.llamados, llamados)
+
+        turno_info = f"{fila[_MODULO]}{fila[_NUMERO]}"
+        log.info("turno_llamado", motor=True, sede=sede, taquilla=taquilla, turno=turno_info, turno_id=fila[_ID])
+        return turno_info, fila[_ID], f"✅ Turno {turno_info} asignado a {taquilla}", fila[_NOMBRE], fila[_TRAMITE]
+
+    def _sigue_llamando(self, taquilla, sede, activo):
+        """
+        Confirma en la base el turno en atención que la memoria tiene para la taquilla:
+        si se atendió sin pasar por el motor (p. ej. cliente_cola.atender con el motor
+        caído) se quita de la memoria y la taquilla queda libre
+        """
+        if obtener_turno_activo_taquilla(taquilla, sede):
+            return True
+        cola = self._sede(sede)
+        with cola.lock:
+            cola = self._sede(sede)
+            actual = cola.llamando.get(taquilla)
+            if actual and actual[_ID] == activo[_ID]:
+                del cola.llamando[taquilla]
+        log.debug("motor_taquilla_liberada", sede=sede, taquilla=taquilla, turno_id=activo[_ID])
+        return False
+
+    def _devolver(self, sede, fila):
+        """Vuelve a poner en la cola vigente de la sede un turno que no se pudo reclamar"""
+        with self._sede(sede).lock:
+            self._sede(sede).devolver(fila)
+
+    def atender(self, turno_id):
+        """Misma respuesta que marcar_turno_atendido: (exito, turno)"""
+        exito, turno = marcar_turno_atendido(turno_id)
+        if not turno:
+            return exito, turno
+        turno = tuple(turno)
+        llamados = None
+        if turno[4] != 'atendido':
+            llamados = [tuple(fila) for fila in obtener_llamados_recientes(TABLERO_LLAMADOS_RECIENTES, turno[5])]
+        cola = self._sede(turno[5])
+        with cola.lock:
+            cola = self._sede(turno[5])
+            activo = cola.llamando.get(turno[2])
+            if activo and activo[_ID] == int(turno_id):
+                del cola.llamando[turno[2]]
+            if llamados is not None:
+                cola.atendidos += 1
+                cola.version += 1
+                cola.llamados = _fusionar_llamados(cola.llamados, llamados)
+        return exito, turno
+
+    # ------------------------------------------------------------------
+    # Lecturas desde memoria
+    # ------------------------------------------------------------------
+
+    def vista_taquilla(self, taquilla, sede, desde=None, limite=10):
+        """Mismo diccionario que cargar_vista_taquilla"""
+        cola = self._sede(sede)
+        with cola.lock:
+            activo = cola.llamando.get(taquilla)
+            llamando = sorted(cola.llamando.values(), key=lambda fila: fila[_FECHA_LLAMADO] or datetime.min)
+            datos = armar_cola(cola.pagina(desde, limite), llamando, cola.conteos(), limite)
+        turno_activo = None
+        if activo:
+            turno_activo = (activo[_ID], activo[_MODULO], activo[_NUMERO], activo[_NOMBRE], activo[_TRAMITE], activo[_FECHA_LLAMADO])
+        return {'ocupada': activo is not None, 'turno_activo': turno_activo, 'cola': datos}
+
+    def tablero(self, sede, limite=5):
+        """Versión del tablero de la sede y sus últimos llamados"""
+        cola = self._sede(sede)
+        with cola.lock:
+            return {'version': cola.version, 'llamados': cola.llamados[:limite]}
+
+    def salud(self):
+        return {
+            'sedes': {sede: len(cola.ids_espera) for sede, cola in self.sedes.items()},
+            'ultimo_id': self.ultimo_id,
+        }
+
+
+# ----------------------------------------------------------------------
+# API HTTP local
+# ----------------------------------------------------------------------
+
+def _json(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _desde(params):
+    if 'desde_id' not in params:
+        return None
+    return datetime.fromisoformat(params['desde_fecha'][0]), int(params['desde_id'][0])
+
+
+class _ManejadorMotor(BaseHTTPRequestHandler):
+    motor = None
+
+    def _responder(self, datos, estado=200):
+        cuerpo = json.dumps(datos, default=_json).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        sede = params.get('sede', [SEDE])[0]
+        if url.path == '/vista_taquilla':
+            self._responder(self.motor.vista_taquilla(
+                params['taquilla'][0], sede, _desde(params), int(params.get('limite', ['10'])[0])
+            ))
+        elif url.path == '/tablero':
+            self._responder(self.motor.tablero(sede, int(params.get('limite', ['5'])[0])))
+        elif url.path == '/salud':
+            self._responder(self.motor.salud())
+        else:
+            self._responder({'error': 'ruta desconocida'}, 404)
+
+    def do_POST(self):
+        longitud = int(self.headers.get('Content-Length', 0))
+        datos = json.loads(self.rfile.read(longitud) or b'{}')
+        if self.path == '/llamar':
+            self._responder(self.motor.llamar(datos['taquilla'], datos.get('sede') or SEDE))
+        elif self.path == '/atender':
+            self._responder(self.motor.atender(int(datos['turno_id'])))
+        else:
+            self._responder({'error': 'ruta desconocida'}, 404)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def _sondear_en_bucle(motor, detener):
+    """Lee turnos nuevos cada MOTOR_COLA_SONDEO segundos y reconstruye cada MOTOR_COLA_RECONSTRUIR"""
+    transcurrido = 0.0
+    while not detener.wait(MOTOR_COLA_SONDEO):
+        transcurrido += MOTOR_COLA_SONDEO
+        try:
+            if MOTOR_COLA_RECONSTRUIR > 0 and transcurrido >= MOTOR_COLA_RECONSTRUIR:
+                transcurrido = 0.0
+                motor.reconstruir()
+            else:
+                motor.sondear()
+        except SQLAlchemyError as e:
+            log.error("motor_sondeo_error", error=e)
+
+
+def iniciar_motor(host=None, puerto=None, detener=None):
+    """
+    Reconstruye el estado, arranca el sondeo en un hilo daemon y devuelve
+    (motor, servidor HTTP sin iniciar); quien llama ejecuta serve_forever()
+    """
+    motor = MotorCola()
+    motor.reconstruir()
+    threading.Thread(
+        target=_sondear_en_bucle, args=(motor, detener or threading.Event()), name='motor_sondeo', daemon=True
+    ).start()
+
+    manejador = type('ManejadorMotor', (_ManejadorMotor,), {'motor': motor})
+    servidor = ThreadingHTTPServer((host or MOTOR_COLA_HOST, puerto or MOTOR_COLA_PUERTO), manejador)
+    log.info("motor_cola_iniciado", host=host or MOTOR_COLA_HOST, puerto=puerto or MOTOR_COLA_PUERTO)
+    return motor, servidor
@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import random
+import logging
+import threading
+from datetime import datetime
+
+# Registro estructurado de la aplicación: una línea por evento, en formato
+# key=value (por defecto) o JSON, con los campos pasados como argumentos
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMATO = os.getenv('LOG_FORMATO', 'kv')  # 'kv' o 'json'
+# Fracción de eventos por fila (persona, registro) que se registran en DEBUG
+LOG_MUESTREO_FILAS = float(os.getenv('LOG_MUESTREO_FILAS', '0.05'))
+
+_RAIZ = 'turnos'
+_configurado = False
+_lock = threading.Lock()
+
+
+def _valor_kv(valor):
+    texto = str(valor)
+    if not texto or any(c in texto for c in ' ="'):
+        return json.dumps(texto, ensure_ascii=False)
+    return texto
+
+
+class FormatoEstructurado(logging.Formatter):
+    """Línea key=value o JSON con hora, nivel, módulo, evento y campos extra"""
+
+    def __init__(self, formato='kv'):
+        super().__init__()
+        self.formato = formato
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'modulo': record.name[len(_RAIZ) + 1:] or _RAIZ,
+            'evento': record.getMessage(),
+        }
+        datos.update(getattr(record, 'campos', {}))
+        if record.exc_info:
+            datos['error'] = self.formatException(record.exc_info)
+        if self.formato == 'json':
+            return json.dumps(datos, ensure_ascii=False, default=str)
+        return ' '.join(f"{clave}={_valor_kv(valor)}" for clave, valor in datos.items())
+
+
+def _configurar():
+    global _configurado
+    with _lock:
+        if _configurado:
+            return
+        raiz = logging.getLogger(_RAIZ)
+        manejador = logging.StreamHandler(sys.stdout)
+        manejador.setFormatter(FormatoEstructurado(LOG_FORMATO))
+        raiz.addHandler(manejador)
+        raiz.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        raiz.propagate = False
+        _configurado = True
+
+
+class RegistroTurnos(logging.LoggerAdapter):
+    """
+    Logger con campos como argumentos con nombre:
+    log.info("turno_asignado", turno="A001", documento="123")
+    """
+
+    def log(self, level, msg, *args, exc_info=None, **campos):
+        if self.isEnabledFor(level):
+            self.logger.log(level, msg, *args, exc_info=exc_info, extra={'campos': campos})
+
+    def debug(self, msg, *args, **campos):
+        self.log(logging.DEBUG, msg, *args, **campos)
+
+    def info(self, msg, *args, **campos):
+        self.log(logging.INFO, msg, *args, **campos)
+
+    def warning(self, msg, *args, **campos):
+        self.log(logging.WARNING, msg, *args, **campos)
+
+    def error(self, msg, *args, **campos):
+        self.log(logging.ERROR, msg, *args, **campos)
+
+    def exception(self, msg, *args, **campos):
+        self.log(logging.ERROR, msg, *args, exc_info=True, **campos)
+
+    def fila(self, msg, **campos):
+        """DEBUG por fila procesada, solo para una muestra (LOG_MUESTREO_FILAS)"""
+        if self.isEnabledFor(logging.DEBUG) and random.random() < LOG_MUESTREO_FILAS:
+            self.log(logging.DEBUG, msg, muestreado=True, **campos)
+
+
+def obtener_logger(nombre):
+    """Logger 'turnos.<nombre>' con el formato configurado por LOG_LEVEL y LOG_FORMATO"""
+    _configurar()
+    return RegistroTurnos(logging.getLogger(f"{_RAIZ}.{nombre}"), {})
@@ -0,0 +1,645 @@
+"""
+SQL de turnos, tabla de control y contadores en un solo lugar.
+Los filtros por fecha usan rangos semiabiertos (col >= hoy AND col < mañana) en
+lugar de DATE(col) = CURDATE(), para que MySQL pueda usar el índice de la columna.
+Cada consulta queda registrada en CONSULTAS con parámetros de ejemplo, y
+test_planes_consultas.py corre EXPLAIN sobre todas.
+El SQL usa marcadores de config/dialectos.py ({hoy}, {ahora}, {bloquear}...) y,
+donde no alcanza, una variante `sqlite=` completa, para poder correr todo el
+flujo sobre SQLite en local.
+Las consultas de colas, taquillas, contadores y pantallas filtran por :sede con
+la sede al frente del índice, así el costo de una oficina no crece con las demás.
+"""
+
+from sqlalchemy import DateTime
+from config.dialectos import SQLPorDialecto
+
+# Consultas registradas: nombre -> (consulta, parámetros de ejemplo)
+CONSULTAS = {}
+
+# Columnas de fecha en resultados: SQLite las devuelve como texto
+_FECHAS = {'fecha_llamado': DateTime, 'fecha_creacion': DateTime}
+
+
+def hoy(columna):
+    """Predicado indexable para 'columna cae en el día de hoy'"""
+    return f"{columna} >= {{hoy}} AND {columna} < {{manana}}"
+
+
+def _sentencia(sql, sqlite=None, tipos=None):
+    return SQLPorDialecto(sql, sqlite=sqlite, tipos=tipos)
+
+
+def _consulta(nombre, sql, /, sqlite=None, tipos=None, **ejemplo):
+    consulta = _sentencia(sql, sqlite=sqlite, tipos=tipos)
+    CONSULTAS[nombre] = (consulta, ejemplo)
+    return consulta
+
+
+# ============================================================================
+# TURNOS
+# ============================================================================
+
+CONTAR_PENDIENTES_HOY_CEDULA = _consulta('contar_pendientes_hoy_cedula', f"""
+SELECT COUNT(*) FROM turnos
+WHERE cedula_usuario = :cedula
+AND estado IN ('espera', 'llamando')
+AND {hoy('fecha_creacion')}
+""", cedula='1000000000')
+
+CONTAR_NO_ATENDIDOS_CEDULA = _consulta('contar_no_atendidos_cedula', """
+SELECT COUNT(*) FROM turnos
+WHERE cedula_usuario = :cedula
+AND estado IN ('espera', 'llamando')
+""", cedula='1000000000')
+
+# Asignación por lotes: un parámetro por documento/turno del lote (doc_0, sede_0, ...)
+def pendientes_hoy_documentos(documentos):
+    """Documentos (doc_0 ... doc_{documentos-1}) que ya tienen un turno de hoy en espera o llamando"""
+    marcadores = ", ".join(f":doc_{i}" for i in range(documentos))
+    return _sentencia(f"""
+    SELECT DISTINCT cedula_usuario FROM turnos
+    WHERE cedula_usuario IN ({marcadores})
+    AND estado IN ('espera', 'llamando')
+    AND {hoy('fecha_creacion')}
+    """)
+
+def insertar_lote_turnos(filas):
+    """INSERT multi-fila de `filas` turnos en espera (parámetros sede_0 ... tramite_{filas-1}), en ese orden"""
+    valores = [
+        f"(:sede_{i}, :modulo_{i}, :numero_{i}, 'espera', :nombre_{i}, :cedula_{i}, :tramite_{i})"
+        for i in range(filas)
+    ]
+    return _sentencia(f"""
+    INSERT INTO turnos
+    (sede, modulo, numero_turno, estado, nombre_usuario, cedula_usuario, tipo_tramite)
+    VALUES {", ".join(valores)}
+    """)
+
+def reclamar_lote_control(filas):
+    """
+    Toma las filas de control del lote (id_0 ... id_{filas-1}) que siguen sin procesar,
+    bloqueadas hasta el fin de la transacción; SKIP LOCKED salta las que otro asignador
+    ya tomó (en SQLite las transacciones se serializan y basta el filtro de procesado)
+    """
+    marcadores = ", ".join(f":id_{i}" for i in range(filas))
+    return _sentencia(f"""
+    SELECT id FROM control_turnos_externos
+    WHERE id IN ({marcadores}) AND procesado = FALSE
+    {{bloquear_saltando}}
+    """)
+
+def marcar_lote_control(asignados, omitidos):
+    """
+    Marca como procesadas en un solo UPDATE las filas de control del lote: las
+    asignadas (id_i, turno_i) con su turno y fecha, las omitidas (omitido_j) solo procesadas.
+    Solo toca filas aún sin procesar: quien llama compara el rowcount con las filas reclamadas
+    """
+    ids = [f":id_{i}" for i in range(asignados)]
+    todos = ", ".join(ids + [f":omitido_{j}" for j in range(omitidos)])
+    if not asignados:
+        return _sentencia(f"UPDATE control_turnos_externos SET procesado = TRUE WHERE id IN ({todos}) AND procesado = FALSE")
+    casos = " ".join(f"WHEN :id_{i} THEN :turno_{i}" for i in range(asignados))
+    return _sentencia(f"""
+    UPDATE control_turnos_externos
+    SET procesado = TRUE,
+        turno_asignado = CASE id {casos} ELSE turno_asignado END,
+        fecha_procesado = CASE WHEN id IN ({", ".join(ids)}) THEN {{ahora}} ELSE fecha_procesado END
+    WHERE id IN ({todos}) AND procesado = FALSE
+    """)
+
+# Cola de espera paginada por clave (fecha_creacion, id): cada página cuesta lo
+# mismo sin importar cuántos turnos haya antes; usa idx_sede_estado_fecha
+COLA_ESPERA = _consulta('cola_espera', """
+SELECT
+    id, modulo, numero_turno, nombre_usuario, cedula_usuario,
+    tipo_tramite, estado, taquilla_asignada, fecha_llamado, fecha_creacion
+FROM turnos
+WHERE sede = :sede AND estado = 'espera'
+ORDER BY fecha_creacion, id
+LIMIT :limite
+""", tipos=_FECHAS, sede='principal', limite=11)
+
+COLA_ESPERA_DESDE = _consulta('cola_espera_desde', """
+SELECT
+    id, modulo, numero_turno, nombre_usuario, cedula_usuario,
+    tipo_tramite, estado, taquilla_asignada, fecha_llamado, fecha_creacion
+FROM turnos
+WHERE sede = :sede AND estado = 'espera'
+AND (fecha_creacion > :fecha OR (fecha_creacion = :fecha AND id > :id))
+ORDER BY fecha_creacion, id
+LIMIT :limite
+""", tipos=_FECHAS, sede='principal', fecha='2025-01-01 08:00:00', id=1, limite=11)
+
+TURNOS_LLAMANDO = _consulta('turnos_llamando', """
+SELECT
+    id, modulo, numero_turno, nombre_usuario, cedula_usuario,
+    tipo_tramite, estado, taquilla_asignada, fecha_llamado, fecha_creacion
+FROM turnos
+WHERE sede = :sede AND estado = 'llamando'
+ORDER BY fecha_llamado
+""", tipos=_FECHAS, sede='principal')
+
+SIGUIENTE_EN_ESPERA = _consulta('siguiente_en_espera', """
+SELECT id, modulo, numero_turno, nombre_usuario, tipo_tramite
+FROM turnos
+WHERE sede = :sede AND estado = 'espera'
+ORDER BY fecha_creacion, id
+LIMIT 1
+{bloquear_saltando}
+""", sede='principal')
+
+# Taquillas con rutas: el siguiente de cada módulo es una búsqueda en idx_sede_modulo_estado_fecha
+SIGUIENTE_EN_MODULO = _consulta('siguiente_en_modulo', """
+SELECT id, modulo, numero_turno, nombre_usuario, tipo_tramite
+FROM turnos
+WHERE sede = :sede AND modulo = :modulo AND estado = 'espera'
+ORDER BY fecha_creacion, id
+LIMIT 1
+{bloquear_saltando}
+""", sede='principal', modulo='P')
+
+MARCAR_LLAMANDO = _consulta('marcar_llamando', """
+UPDATE turnos
+SET estado = 'llamando', taquilla_asignada = :taquilla, fecha_llamado = {ahora}
+WHERE id = :id
+""", taquilla='Taquilla 1', id=1)
+
+DATOS_TURNO = _consulta('datos_turno', """
+SELECT modulo, numero_turno, taquilla_asignada, cedula_usuario, estado, sede
+FROM turnos WHERE id = :id
+{bloquear}
+""", id=1)
+
+MARCAR_ATENDIDO = _consulta('marcar_atendido', """
+UPDATE turnos SET estado = 'atendido' WHERE id = :id
+""", id=1)
+
+# Motor de cola (config/motor_cola.py): el turno ya se eligió en memoria y solo se
+# reclama si sigue en espera
+RECLAMAR_TURNO = _consulta('reclamar_turno', """
+UPDATE turnos
+SET estado = 'llamando', taquilla_asignada = :taquilla, fecha_llamado = {ahora}
+WHERE id = :id AND estado = 'espera'
+""", taquilla='Taquilla 1', id=1)
+
+COLA_COMPLETA = _consulta('cola_completa', """
+SELECT
+    id, modulo, numero_turno, nombre_usuario, cedula_usuario,
+    tipo_tramite, estado, taquilla_asignada, fecha_llamado, fecha_creacion
+FROM turnos
+WHERE sede = :sede AND estado = 'espera'
+ORDER BY fecha_creacion, id
+""", tipos=_FECHAS, sede='principal')
+
+# Turnos en espera desde un id (rango de la clave primaria); el motor lee una ventana
+# antes del último id visto para no perder lotes que confirman fuera de orden
+TURNOS_NUEVOS = _consulta('turnos_nuevos', """
+SELECT
+    id, modulo, numero_turno, nombre_usuario, cedula_usuario,
+    tipo_tramite, estado, taquilla_asignada, fecha_llamado, fecha_creacion, sede
+FROM turnos
+WHERE id > :desde AND estado = 'espera'
+ORDER BY id
+""", tipos=_FECHAS, desde=0)
+
+MAX_ID_TURNOS = _consulta('max_id_turnos', """
+SELECT COALESCE(MAX(id), 0) FROM turnos
+""")
+
+CONTAR_LLAMANDO_TAQUILLA = _consulta('contar_llamando_taquilla', """
+SELECT COUNT(*) FROM turnos
+WHERE sede = :sede AND taquilla_asignada = :taquilla
+AND estado = 'llamando'
+""", sede='principal', taquilla='Taquilla 1')
+
+TURNO_ACTIVO_TAQUILLA = _consulta('turno_activo_taquilla', """
+SELECT id, modulo, numero_turno, nombre_usuario, tipo_tramite, fecha_llamado
+FROM turnos
+WHERE sede = :sede AND taquilla_asignada = :taquilla
+AND estado = 'llamando'
+LIMIT 1
+""", tipos=_FECHAS, sede='principal', taquilla='Taquilla 1')
+
+TURNOS_NO_ATENDIDOS_TAQUILLA = _consulta('turnos_no_atendidos_taquilla', """
+SELECT id, modulo, numero_turno, estado, nombre_usuario, tipo_tramite, fecha_llamado
+FROM turnos
+WHERE sede = :sede AND taquilla_asignada = :taquilla AND estado IN ('espera', 'llamando')
+ORDER BY fecha_llamado DESC
+""", tipos=_FECHAS, sede='principal', taquilla='Taquilla 1')
+
+PROXIMOS_EN_ESPERA = _consulta('proximos_en_espera', """
+SELECT modulo, numero_turno, nombre_usuario, tipo_tramite
+FROM turnos
+WHERE sede = :sede AND estado = 'espera'
+ORDER BY fecha_creacion, id
+LIMIT 5
+""", sede='principal')
+
+ULTIMOS_REGISTRADOS = _consulta('ultimos_registrados', """
+SELECT modulo, numero_turno, nombre_usuario, tipo_tramite, taquilla_asignada,
+       fecha_creacion, estado
+FROM turnos
+WHERE sede = :sede
+ORDER BY fecha_creacion DESC
+LIMIT 8
+""", tipos=_FECHAS, sede='principal')
+
+# ============================================================================
+# CONTADORES POR ESTADO (sede, dia, modulo, estado)
+# ============================================================================
+
+# Suma `delta` al contador de la sede, día de creación y módulo del turno; se ejecuta en
+# la misma transacción que el cambio de estado
+MOVER_CONTADOR_ESTADO = _consulta('mover_contador_estado', """
+INSERT INTO contadores_estado (sede, dia, modulo, estado, cantidad)
+SELECT sede, DATE(fecha_creacion), modulo, :estado, :delta
+FROM turnos WHERE id = :id
+ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad)
+""", sqlite="""
+INSERT INTO contadores_estado (sede, dia, modulo, estado, cantidad)
+SELECT sede, DATE(fecha_creacion), modulo, :estado, :delta
+FROM turnos WHERE id = :id
+ON CONFLICT (sede, dia, modulo, estado) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+""", estado='espera', delta=1, id=1)
+
+# Turnos nuevos de un lote: un solo upsert por (sede, módulo) en lugar de uno por turno
+SUMAR_CONTADOR_ESTADO_HOY = _sentencia("""
+INSERT INTO contadores_estado (sede, dia, modulo, estado, cantidad)
+VALUES (:sede, {hoy}, :modulo, :estado, :cantidad)
+ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad)
+""", sqlite="""
+INSERT INTO contadores_estado (sede, dia, modulo, estado, cantidad)
+VALUES (:sede, {hoy}, :modulo, :estado, :cantidad)
+ON CONFLICT (sede, dia, modulo, estado) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+""")
+
+# Conteos en vivo de la sede: espera y llamando de todos los días, como la cola (los
+# turnos abiertos de días anteriores siguen en ella y no se archivan), y atendidos
+# solo de hoy, así ese total no cambia al archivar días anteriores
+CONTAR_POR_ESTADO = _consulta('contar_por_estado', """
+SELECT estado, SUM(cantidad) FROM contadores_estado
+WHERE sede = :sede AND estado IN ('espera', 'llamando')
+GROUP BY estado
+UNION ALL
+SELECT estado, SUM(cantidad) FROM contadores_estado
+WHERE sede = :sede AND dia = {hoy} AND estado = 'atendido'
+GROUP BY estado
+""", sede='principal')
+
+# Espera de todos los días por módulo: idx_sede_estado_dia deja la lectura en las filas
+# de espera, y las de días anteriores que quedan en cero se borran (ver abajo)
+ESPERA_POR_MODULO = _consulta('espera_por_modulo', """
+SELECT modulo, SUM(cantidad) as cantidad
+FROM contadores_estado
+WHERE sede = :sede AND estado = 'espera'
+GROUP BY modulo
+HAVING SUM(cantidad) > 0
+ORDER BY modulo
+""", sede='principal')
+
+CONTAR_TURNOS_HOY = _consulta('contar_turnos_hoy', """
+SELECT COALESCE(SUM(cantidad), 0) as total_hoy
+FROM contadores_estado
+WHERE sede = :sede AND dia = {hoy}
+""", sede='principal')
+
+# Los contadores de espera y llamando de días anteriores ya en cero no cuentan nada y
+# harían crecer las lecturas en vivo con cada día guardado
+BORRAR_CONTADORES_ABIERTOS_VACIOS = _consulta('borrar_contadores_abiertos_vacios', """
+DELETE FROM contadores_estado
+WHERE sede = :sede AND estado IN ('espera', 'llamando') AND dia < {hoy} AND cantidad = 0
+""", sede='principal')
+
+# Reparación: recalcula los contadores desde turnos (todo el histórico o un día)
+CONTEOS_REALES = _sentencia("""
+SELECT sede, DATE(fecha_creacion) AS dia, modulo, estado, COUNT(*) AS cantidad
+FROM turnos
+GROUP BY sede, DATE(fecha_creacion), modulo, estado
+""")
+
+CONTEOS_REALES_DIA = _consulta('conteos_reales_dia', """
+SELECT sede, DATE(fecha_creacion) AS dia, modulo, estado, COUNT(*) AS cantidad
+FROM turnos
+WHERE fecha_creacion >= :dia AND fecha_creacion < {dia_siguiente}
+GROUP BY sede, DATE(fecha_creacion), modulo, estado
+""", dia='2025-01-01')
+
+LEER_CONTADORES_ESTADO = _sentencia("""
+SELECT sede, dia, modulo, estado, cantidad FROM contadores_estado
+""")
+
+LEER_CONTADORES_ESTADO_DIA = _consulta('leer_contadores_estado_dia', """
+SELECT sede, dia, modulo, estado, cantidad FROM contadores_estado WHERE dia = :dia
+""", dia='2025-01-01')
+
+BORRAR_CONTADORES_ESTADO = _sentencia("DELETE FROM contadores_estado")
+
+BORRAR_CONTADORES_ESTADO_DIA = _consulta('borrar_contadores_estado_dia', """
+DELETE FROM contadores_estado WHERE dia = :dia
+""", dia='2025-01-01')
+
+RECONSTRUIR_CONTADORES_ESTADO = _sentencia("""
+INSERT INTO contadores_estado (sede, dia, modulo, estado, cantidad)
+SELECT sede, DATE(fecha_creacion), modulo, estado, COUNT(*)
+FROM turnos
+GROUP BY sede, DATE(fecha_creacion), modulo, estado
+""")
+
+RECONSTRUIR_CONTADORES_ESTADO_DIA = _consulta('reconstruir_contadores_estado_dia', """
+INSERT INTO contadores_estado (sede, dia, modulo, estado, cantidad)
+SELECT sede, DATE(fecha_creacion), modulo, estado, COUNT(*)
+FROM turnos
+WHERE fecha_creacion >= :dia AND fecha_creacion < {dia_siguiente}
+GROUP BY sede, DATE(fecha_creacion), modulo, estado
+""", dia='2025-01-01')
+
+# ============================================================================
+# TABLERO (versión y llamados recientes, uno por sede)
+# ============================================================================
+
+# Crea la fila de la sede con su primer cambio
+INCREMENTAR_VERSION_TABLERO = _consulta('incrementar_version_tablero', """
+INSERT INTO estado_tablero (sede, version) VALUES (:sede, 1)
+ON DUPLICATE KEY UPDATE version = version + 1
+""", sqlite="""
+INSERT INTO estado_tablero (sede, version) VALUES (:sede, 1)
+ON CONFLICT (sede) DO UPDATE SET version = version + 1
+""", sede='principal')
+
+VERSION_TABLERO = _consulta('version_tablero', """
+SELECT version FROM estado_tablero WHERE sede = :sede
+""", sede='principal')
+
+REGISTRAR_LLAMADO_RECIENTE = _consulta('registrar_llamado_reciente', """
+INSERT INTO llamados_recientes (sede, turno_id, turno, nombre_usuario, taquilla, hora_llamado, estado)
+SELECT sede, id, CONCAT(modulo, numero_turno), nombre_usuario, taquilla_asignada,
+       DATE_FORMAT(fecha_llamado, '%H:%i:%s'), estado
+FROM turnos WHERE id = :id
+""", sqlite="""
+INSERT INTO llamados_recientes (sede, turno_id, turno, nombre_usuario, taquilla, hora_llamado, estado)
+SELECT sede, id, modulo || numero_turno, nombre_usuario, taquilla_asignada,
+       strftime('%H:%M:%S', fecha_llamado), estado
+FROM turnos WHERE id = :id
+""", id=1)
+
+# Conserva los :conservar más recientes de la sede (la tabla derivada con LIMIT
+# se materializa, así MySQL permite leer la misma tabla que se borra)
+RECORTAR_LLAMADOS_RECIENTES = _consulta('recortar_llamados_recientes', """
+DELETE FROM llamados_recientes
+WHERE sede = :sede
+AND id <= (
+    SELECT id FROM (
+        SELECT id FROM llamados_recientes
+        WHERE sede = :sede
+        ORDER BY id DESC
+        LIMIT 1 OFFSET :conservar
+    ) corte
+)
+""", sede='principal', conservar=10)
+
+ATENDER_LLAMADO_RECIENTE = _consulta('atender_llamado_reciente', """
+UPDATE llamados_recientes SET estado = 'atendido' WHERE turno_id = :id
+""", id=1)
+
+LLAMADOS_RECIENTES = _consulta('llamados_recientes', """
+SELECT turno, nombre_usuario, taquilla, hora_llamado, estado, id
+FROM llamados_recientes
+WHERE sede = :sede
+ORDER BY id DESC
+LIMIT :limite
+""", sede='principal', limite=5)
+
+# ============================================================================
+# TABLA DE CONTROL Y CURSORES DE SINCRONIZACIÓN
+# ============================================================================
+
+PERSONAS_PENDIENTES = _consulta('personas_pendientes', """
+SELECT
+    id, nombre1, nombre2, apellido1, apellido2, documento, tema_solicitud, sede
+FROM control_turnos_externos
+WHERE dia_lectura = {hoy}
+AND procesado = FALSE
+ORDER BY id DESC
+LIMIT 50
+""")
+
+CONTROL_RECIENTE = _consulta('control_reciente', """
+SELECT documento, tema_solicitud, procesado, fecha_lectura
+FROM control_turnos_externos
+WHERE fecha_lectura >= {ayer}
+ORDER BY fecha_lectura DESC
+""")
+
+# Diagnóstico (diagnostico_sincronizacion.py): total de la tabla, filas de hoy y pendientes de hoy
+CONTROL_CONTEOS = _consulta('control_conteos', """
+SELECT
+    (SELECT COUNT(*) FROM control_turnos_externos),
+    (SELECT COUNT(*) FROM control_turnos_externos WHERE dia_lectura = {hoy}),
+    (SELECT COUNT(*) FROM control_turnos_externos WHERE dia_lectura = {hoy} AND procesado = FALSE)
+""")
+
+# Filas de hoy con sus tiempos de lectura y asignación, para medir el retraso
+CONTROL_HOY = _consulta('control_hoy', """
+SELECT documento, tema_solicitud, procesado, turno_asignado, fecha_lectura, fecha_procesado
+FROM control_turnos_externos
+WHERE dia_lectura = {hoy}
+""", tipos={'fecha_lectura': DateTime, 'fecha_procesado': DateTime})
+
+LEER_CURSOR_SYNC = _consulta('leer_cursor_sync', """
+SELECT ultimo_valor FROM sync_cursores WHERE fuente = :fuente
+""", fuente='vista_externa')
+
+GUARDAR_CURSOR_SYNC = _consulta('guardar_cursor_sync', """
+INSERT INTO sync_cursores (fuente, ultimo_valor) VALUES (:fuente, :valor)
+ON DUPLICATE KEY UPDATE ultimo_valor = VALUES(ultimo_valor)
+""", sqlite="""
+INSERT INTO sync_cursores (fuente, ultimo_valor) VALUES (:fuente, :valor)
+ON CONFLICT (fuente) DO UPDATE SET ultimo_valor = excluded.ultimo_valor
+""", fuente='vista_externa', valor='0')
+
+
+def insertar_lote_control(filas):
+    """INSERT IGNORE multi-fila para `filas` registros (parámetros nombre1_0 ... sede_{filas-1})"""
+    valores = [
+        f"(:nombre1_{i}, :nombre2_{i}, :apellido1_{i}, :apellido2_{i}, :documento_{i}, :tema_{i}, :sede_{i}, {{hoy}})"
+        for i in range(filas)
+    ]
+    return _sentencia(f"""
+    {{insertar_ignorando}} INTO control_turnos_externos
+    (nombre1, nombre2, apellido1, apellido2, documento, tema_solicitud, sede, dia_lectura)
+    VALUES {", ".join(valores)}
+    """)
+
+# ============================================================================
+# CONTADORES (uno por sede y módulo)
+# ============================================================================
+
+# MySQL deja el nuevo valor en LAST_INSERT_ID (lastrowid); SQLite lo devuelve con RETURNING
+RESERVAR_NUMEROS = _consulta('reservar_numeros', """
+UPDATE contadores_turnos
+SET ultimo_turno = LAST_INSERT_ID(ultimo_turno + :cantidad)
+WHERE sede = :sede AND modulo = :modulo
+""", sqlite="""
+UPDATE contadores_turnos
+SET ultimo_turno = ultimo_turno + :cantidad
+WHERE sede = :sede AND modulo = :modulo
+RETURNING ultimo_turno
+""", sede='principal', modulo='A', cantidad=1)
+
+CREAR_CONTADOR = _consulta('crear_contador', """
+{insertar_ignorando} INTO contadores_turnos (sede, modulo, ultimo_turno, fecha_reseteo) VALUES (:sede, :modulo, 0, {ahora})
+""", sede='principal', modulo='A')
+
+ULTIMO_ID_INSERTADO = _sentencia("SELECT LAST_INSERT_ID()", sqlite="SELECT last_insert_rowid()")
+
+EXISTE_CONTADOR = _consulta('existe_contador', """
+SELECT COUNT(*) FROM contadores_turnos WHERE sede = :sede AND modulo = :modulo
+""", sede='principal', modulo='A')
+
+LISTAR_CONTADORES = _consulta('listar_contadores', """
+SELECT modulo, ultimo_turno, fecha_reseteo
+FROM contadores_turnos
+WHERE sede = :sede
+ORDER BY modulo
+""", tipos={'fecha_reseteo': DateTime}, sede='principal')
+
+DESBLOQUEAR_CONTADOR = _consulta('desbloquear_contador', """
+UPDATE contadores_turnos SET manual_reset = FALSE WHERE sede = :sede AND modulo = :modulo
+""", sede='principal', modulo='A')
+
+DESBLOQUEAR_CONTADORES = _sentencia("UPDATE contadores_turnos SET manual_reset = FALSE WHERE sede = :sede")
+
+RESETEAR_CONTADOR = _consulta('resetear_contador', """
+UPDATE contadores_turnos SET ultimo_turno = 0, fecha_reseteo = {ahora} WHERE sede = :sede AND modulo = :modulo
+""", sede='principal', modulo='A')
+
+RESETEAR_CONTADORES = _sentencia("UPDATE contadores_turnos SET ultimo_turno = 0, fecha_reseteo = {ahora} WHERE sede = :sede")
+
+# ============================================================================
+# RUTAS DE TAQUILLA (módulos que atiende cada taquilla, con peso)
+# ============================================================================
+
+RUTAS_TAQUILLA = _consulta('rutas_taquilla', """
+SELECT modulo, peso, CASE WHEN dia = {hoy} THEN servidos ELSE 0 END AS servidos
+FROM rutas_taquilla
+WHERE sede = :sede AND taquilla = :taquilla AND peso > 0
+ORDER BY modulo
+""", sede='principal', taquilla='Taquilla 1')
+
+# El módulo atendido queda con :servidos (:virtual = servidos / peso). Los que iban
+# por detrás de él solo podían estar sin turnos en espera: avanzan hasta casi
+# :virtual para no acumular turnos a su favor; a los demás el -1 no los toca
+SERVIR_RUTA = _consulta('servir_ruta', """
+UPDATE rutas_taquilla
+SET servidos = CASE
+        WHEN modulo = :modulo THEN :servidos
+        ELSE GREATEST(CASE WHEN dia = {hoy} THEN servidos ELSE 0 END, FLOOR(:virtual * peso) - 1)
+    END,
+    dia = {hoy}
+WHERE sede = :sede AND taquilla = :taquilla
+""", sqlite="""
+UPDATE rutas_taquilla
+SET servidos = CASE
+        WHEN modulo = :modulo THEN :servidos
+        ELSE MAX(CASE WHEN dia = {hoy} THEN servidos ELSE 0 END, CAST(:virtual * peso AS INTEGER) - 1)
+    END,
+    dia = {hoy}
+WHERE sede = :sede AND taquilla = :taquilla
+""", sede='principal', taquilla='Taquilla 1', modulo='A', servidos=1, virtual=1.0)
+
+LISTAR_RUTAS = _consulta('listar_rutas', """
+SELECT taquilla, modulo, peso, CASE WHEN dia = {hoy} THEN servidos ELSE 0 END AS servidos
+FROM rutas_taquilla
+WHERE sede = :sede
+ORDER BY taquilla, modulo
+""", sede='principal')
+
+BORRAR_RUTAS_TAQUILLA = _consulta('borrar_rutas_taquilla', """
+DELETE FROM rutas_taquilla WHERE sede = :sede AND taquilla = :taquilla
+""", sede='principal', taquilla='Taquilla 1')
+
+INSERTAR_RUTA = _sentencia("""
+INSERT INTO rutas_taquilla (sede, taquilla, modulo, peso) VALUES (:sede, :taquilla, :modulo, :peso)
+""")
+
+# ============================================================================
+# ARCHIVO (paso de días anteriores a las tablas de histórico, por lotes)
+# ============================================================================
+
+# Solo se archivan turnos atendidos: los que siguen en espera o llamando de días
+# anteriores se quedan en la cola de las taquillas hasta cerrarse.
+# Lote de turnos: hasta la clave (fecha_creacion, id) del último turno del lote
+_LOTE_TURNOS = (
+    "fecha_creacion < :corte AND estado = 'atendido' "
+    "AND (fecha_creacion < :fecha OR (fecha_creacion = :fecha AND id <= :id))"
+)
+_COLUMNAS_TURNOS_HISTORICO = (
+    "id, sede, modulo, numero_turno, estado, taquilla_asignada, nombre_usuario, "
+    "cedula_usuario, tipo_tramite, fecha_creacion, fecha_llamado"
+)
+_COLUMNAS_CONTROL_HISTORICO = (
+    "id, sede, nombre1, nombre2, apellido1, apellido2, documento, tema_solicitud, "
+    "fecha_lectura, dia_lectura, procesado, turno_asignado, fecha_procesado"
+)
+
+FIN_LOTE_TURNOS = _consulta('fin_lote_turnos', """
+SELECT fecha_creacion, id FROM (
+    SELECT fecha_creacion, id FROM turnos
+    WHERE fecha_creacion < :corte AND estado = 'atendido'
+    ORDER BY fecha_creacion, id
+    LIMIT :lote
+) lote
+ORDER BY fecha_creacion DESC, id DESC
+LIMIT 1
+""", tipos={'fecha_creacion': DateTime}, corte='2025-01-01', lote=1000)
+
+CONTEOS_LOTE_TURNOS = _consulta('conteos_lote_turnos', f"""
+SELECT sede, DATE(fecha_creacion) AS dia, modulo, estado, COUNT(*) AS cantidad
+FROM turnos
+WHERE {_LOTE_TURNOS}
+GROUP BY sede, DATE(fecha_creacion), modulo, estado
+""", corte='2025-01-01', fecha='2024-12-31 23:59:59', id=1000)
+
+ARCHIVAR_TURNOS = _consulta('archivar_turnos', f"""
+INSERT INTO turnos_historico ({_COLUMNAS_TURNOS_HISTORICO})
+SELECT {_COLUMNAS_TURNOS_HISTORICO} FROM turnos
+WHERE {_LOTE_TURNOS}
+""", corte='2025-01-01', fecha='2024-12-31 23:59:59', id=1000)
+
+BORRAR_TURNOS_ARCHIVADOS = _consulta('borrar_turnos_archivados', f"""
+DELETE FROM turnos WHERE {_LOTE_TURNOS}
+""", corte='2025-01-01', fecha='2024-12-31 23:59:59', id=1000)
+
+# contadores_estado cuenta lo que hay en turnos: se descuenta lo archivado
+DESCONTAR_CONTADOR_ESTADO = _sentencia("""
+UPDATE contadores_estado SET cantidad = cantidad - :cantidad
+WHERE sede = :sede AND dia = :dia AND modulo = :modulo AND estado = :estado
+""")
+
+BORRAR_CONTADORES_VACIOS = _sentencia("DELETE FROM contadores_estado WHERE cantidad <= 0")
+
+FIN_LOTE_CONTROL = _consulta('fin_lote_control', """
+SELECT MAX(id) FROM (
+    SELECT id FROM control_turnos_externos
+    WHERE dia_lectura < :dia
+    ORDER BY id
+    LIMIT :lote
+) lote
+""", dia='2025-01-01', lote=1000)
+
+ARCHIVAR_CONTROL = _consulta('archivar_control', f"""
+INSERT INTO control_turnos_externos_historico ({_COLUMNAS_CONTROL_HISTORICO})
+SELECT {_COLUMNAS_CONTROL_HISTORICO} FROM control_turnos_externos
+WHERE dia_lectura < :dia AND id <= :hasta
+""", dia='2025-01-01', hasta=1000)
+
+BORRAR_CONTROL_ARCHIVADO = _consulta('borrar_control_archivado', """
+DELETE FROM control_turnos_externos WHERE dia_lectura < :dia AND id <= :hasta
+""", dia='2025-01-01', hasta=1000)
+
+CONTAR_ARCHIVABLES = _consulta('contar_archivables', """
+SELECT
+    (SELECT COUNT(*) FROM turnos WHERE fecha_creacion < :corte AND estado = 'atendido'),
+    (SELECT COUNT(*) FROM control_turnos_externos WHERE dia_lectura < :dia)
+""", corte='2025-01-01', dia='2025-01-01')
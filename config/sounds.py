@@ -1,31 +1,80 @@
-import streamlit as st
+import os
 import base64
+import functools
+import streamlit as st
+from config.registro import obtener_logger
+
+log = obtener_logger('sonidos')
+
+# Sonidos servidos desde static/ (server.enableStaticServing en .streamlit/config.toml)
+DIRECTORIO_SONIDOS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+# Formatos en orden de preferencia: el mp3 lo genera el Dockerfile con AUDIO_COMPACTO=1
+FORMATOS_AUDIO = (('mp3', 'audio/mpeg'), ('wav', 'audio/wav'))
+SONIDOS = {
+    'llamado': 'llamada_turno',
+    'notificacion': 'llamada_turno',
+}
+# 'estatico': el navegador descarga el archivo una vez (URL app/static/...)
+# 'embebido': data URI en base64, codificado una sola vez por proceso
+AUDIO_MODO = os.getenv('AUDIO_MODO', 'estatico')
+
+
+@functools.lru_cache(maxsize=None)
+def _archivo_sonido(nombre):
+    """(archivo, tipo MIME) del primer formato disponible del sonido, o None"""
+    base = SONIDOS.get(nombre, nombre)
+    for extension, mime in FORMATOS_AUDIO:
+        archivo = f"{base}.{extension}"
+        if os.path.exists(os.path.join(DIRECTORIO_SONIDOS, archivo)):
+            return archivo, mime
+    log.warning("sonido_no_encontrado", sonido=nombre, directorio=DIRECTORIO_SONIDOS)
+    return None
 
-def autoplay_audio(file_path: str):
+
+@functools.lru_cache(maxsize=None)
+def _data_uri(archivo, mime):
+    """Lee y codifica el archivo una sola vez por proceso"""
+    with open(os.path.join(DIRECTORIO_SONIDOS, archivo), "rb") as f:
+        return f"data:{mime};base64,{base64.b64encode(f.read()).decode()}"
+
+
+def fuente_audio(nombre):
+    """(src, tipo MIME) para la etiqueta <audio>, o None si el sonido no existe"""
+    encontrado = _archivo_sonido(nombre)
+    if not encontrado:
+        return None
+    archivo, mime = encontrado
+    if AUDIO_MODO == 'embebido':
+        return _data_uri(archivo, mime), mime
+    return f"app/static/{archivo}", mime
+
+
+def autoplay_audio(nombre, evento=None, contenedor=None):
     """
-    Reproduce un archivo de audio automáticamente
+    Reproduce un sonido automáticamente. `evento` identifica el llamado: con un
+    valor distinto el navegador vuelve a crear la etiqueta y suena otra vez.
+    Devuelve False si el sonido no existe.
     """
-    try:
-        with open(file_path, "rb") as f:
-            data = f.read()
-            b64 = base64.b64encode(data).decode()
-            md = f"""
-                <audio autoplay>
-                <source src="data:audio/mp3;base64,{b64}" type="audio/mp3">
-                </audio>
-                """
-            st.markdown(md, unsafe_allow_html=True)
-    except Exception as e:
-        st.error(f"Error reproduciendo audio: {e}")
-
-def play_notification_sound():
+    fuente = fuente_audio(nombre)
+    if not fuente:
+        return False
+    src, mime = fuente
+    md = f"""
+        <audio autoplay data-evento="{evento or ''}">
+        <source src="{src}" type="{mime}">
+        </audio>
+        """
+    (contenedor or st).markdown(md, unsafe_allow_html=True)
+    return True
+
+def play_notification_sound(evento=None, contenedor=None):
     """
     Reproduce sonido de notificación general
     """
-    autoplay_audio("sounds/notification.mp3")
+    return autoplay_audio('notificacion', evento, contenedor)
 
-def play_call_turn_sound():
+def play_call_turn_sound(evento=None, contenedor=None):
     """
     Reproduce sonido específico para llamado de turnos
     """
-    autoplay_audio("sounds/call_turn.mp3")
\ No newline at end of file
+    return autoplay_audio('llamado', evento, contenedor)
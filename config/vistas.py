@@ -0,0 +1,151 @@
+"""
+Lecturas de las páginas sin Streamlit: el ciclo de la Pantalla de Turnos y los
+datos de la Interfaz de Taquillas y del Panel de Control (las consultas
+independientes de un render se hacen a la vez, ver config/asincrono.py).
+Las páginas solo dibujan lo que devuelven
+estas funciones, y el simulador de carga las llama igual que una pantalla o
+una taquilla real.
+"""
+
+import pandas as pd
+from sqlalchemy.exc import SQLAlchemyError
+from config.database import (
+    SEDE, get_db_engine, obtener_version_tablero, obtener_llamados_recientes,
+    taquilla_tiene_turno_activo, obtener_turno_activo_taquilla,
+    consulta_pagina_espera, armar_cola
+)
+from config import repositorio as repo
+from config.asincrono import ejecutar, en_paralelo, en_hilo, consultar
+from config import cliente_cola
+from config.registro import obtener_logger
+from config.metricas import medir
+
+log = obtener_logger('vistas')
+
+COLUMNAS_TABLERO = ['turno', 'nombre_usuario', 'taquilla_asignada', 'hora_llamado', 'estado', 'llamado_id']
+
+
+def obtener_tablero(sede=None):
+    """
+    Turno actual de la sede (el último llamado, aunque ya esté atendido) e historial
+    de los 4 anteriores, leídos del buffer de llamados recientes en una sola consulta
+    """
+    return _armar_tablero(obtener_llamados_recientes(5, sede))
+
+
+def _armar_tablero(llamados):
+    if not llamados:
+        return None, pd.DataFrame()
+
+    turno_actual = dict(zip(COLUMNAS_TABLERO, llamados[0]))
+    historial_df = pd.DataFrame(llamados[1:], columns=COLUMNAS_TABLERO)
+    return turno_actual, historial_df
+
+
+class EstadoPantalla:
+    """Lo que muestra la pantalla de una sede entre un ciclo y el siguiente"""
+
+    def __init__(self, sede=None):
+        self.sede = sede or SEDE
+        self.version = None
+        self.turno_actual = None
+        self.historial_df = pd.DataFrame()
+        self.ultimo_llamado = None
+        self.primera_carga = True
+
+
+def actualizar_pantalla(estado):
+    """
+    Un ciclo de la pantalla: lee la versión del tablero y solo vuelve a consultar
+    los llamados cuando cambió (o si no se pudo leer la versión). Con el motor de
+    cola activo, versión y llamados salen de su memoria en una sola petición.
+    Devuelve (hay_cambios, llamado_nuevo): llamado_nuevo es el id del llamado que
+    debe sonar, None al abrir la pantalla o si el cambio fue un turno atendido.
+    """
+    with medir('tablero_version'):
+        motor = cliente_cola.tablero(estado.sede)
+        version = motor[0] if motor else obtener_version_tablero(estado.sede)
+    hay_cambios = version is None or version != estado.version
+    llamado_nuevo = None
+    if hay_cambios:
+        with medir('tablero_refresco'):
+            if motor:
+                estado.turno_actual, estado.historial_df = _armar_tablero(motor[1])
+            else:
+                estado.turno_actual, estado.historial_df = obtener_tablero(estado.sede)
+        estado.version = version
+
+        llamado = estado.turno_actual['llamado_id'] if estado.turno_actual else None
+        if not estado.primera_carga and llamado and llamado != estado.ultimo_llamado:
+            llamado_nuevo = llamado
+        estado.ultimo_llamado = llamado
+        estado.primera_carga = False
+    return hay_cambios, llamado_nuevo
+
+
+async def _cola_turnos(desde, limite, sede):
+    """obtener_cola_turnos con la página, los turnos en atención y los conteos leídos a la vez"""
+    engine = get_db_engine()
+    if not engine:
+        return armar_cola([], [], [], limite)
+
+    try:
+        filas = await en_paralelo(
+            espera=consultar(engine, *consulta_pagina_espera(desde, limite, sede)),
+            llamando=consultar(engine, repo.TURNOS_LLAMANDO, {"sede": sede}),
+            conteos=consultar(engine, repo.CONTAR_POR_ESTADO, {"sede": sede})
+        )
+    except SQLAlchemyError as e:
+        log.error("cola_turnos_error", sede=sede, error=e)
+        return armar_cola([], [], [], limite)
+    return armar_cola(filas['espera'], filas['llamando'], filas['conteos'], limite)
+
+
+async def _vista_taquilla(taquilla, desde, limite, sede):
+    return await en_paralelo(
+        ocupada=en_hilo(taquilla_tiene_turno_activo, taquilla, sede),
+        turno_activo=en_hilo(obtener_turno_activo_taquilla, taquilla, sede),
+        cola=_cola_turnos(desde, limite, sede)
+    )
+
+
+@medir('vista_taquilla')
+def cargar_vista_taquilla(taquilla, desde=None, limite=10, sede=None):
+    """
+    Datos de un render de la Interfaz de Taquillas: estado de la taquilla, turno
+    activo y una página de la cola de su sede (ver obtener_cola_turnos). Las cinco
+    lecturas son independientes y se hacen a la vez; con el motor de cola activo
+    se responden desde su memoria.
+    """
+    sede = sede or SEDE
+    vista = cliente_cola.vista_taquilla(taquilla, sede, desde, limite)
+    if vista is not None:
+        return vista
+    return ejecutar(_vista_taquilla(taquilla, desde, limite, sede))
+
+
+def _leer_df(engine, consulta, params):
+    with engine.connect() as conn:
+        return pd.read_sql(consulta, conn, params=params)
+
+
+def obtener_estadisticas_panel(sede=None):
+    """
+    Estadísticas del Panel de Control de la sede: (espera por módulo, próximos turnos, total de hoy).
+    Lee contadores_estado y el índice de la cola a la vez, no recorre turnos.
+    No captura errores de base de datos: la página los muestra.
+    """
+    engine = get_db_engine()
+    if not engine:
+        return pd.DataFrame(), pd.DataFrame(), 0
+
+    params = {"sede": sede or SEDE}
+    datos = ejecutar(en_paralelo(
+        # Conteos desde contadores_estado (una fila por módulo, no por turno)
+        espera=en_hilo(_leer_df, engine, repo.ESPERA_POR_MODULO, params),
+        proximos=en_hilo(_leer_df, engine, repo.PROXIMOS_EN_ESPERA, params),
+        total=consultar(engine, repo.CONTAR_TURNOS_HOY, params)
+    ))
+    df_espera = datos['espera']
+    df_espera['cantidad'] = df_espera['cantidad'].astype(int)
+    return df_espera, datos['proximos'], int(datos['total'][0][0])
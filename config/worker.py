@@ -0,0 +1,131 @@
+import os
+import random
+import threading
+from datetime import datetime
+from config.database import sincronizar_control_externo, obtener_personas_pendientes, depurar_contadores_estado
+from config.asignacion import asignar_turnos
+from config.registro import obtener_logger
+from config.metricas import medir
+
+log = obtener_logger('worker')
+
+# Configuración del ciclo externa → control → turnos
+WORKER_INTERVALO = float(os.getenv('WORKER_INTERVALO', '5'))        # segundos entre ciclos
+WORKER_JITTER = float(os.getenv('WORKER_JITTER', '1'))              # segundos aleatorios extra
+WORKER_BACKOFF_MAX = float(os.getenv('WORKER_BACKOFF_MAX', '120'))  # espera máxima tras errores
+WORKER_RECONCILIAR_CADA = int(os.getenv('WORKER_RECONCILIAR_CADA', '60'))  # ciclos entre syncs completas
+# '1' arranca el worker como hilo dentro del proceso de Streamlit; '0' si corre worker_turnos.py aparte
+WORKER_EN_PROCESO = os.getenv('WORKER_EN_PROCESO', '1') == '1'
+
+_estado = {
+    'ciclos': 0,
+    'ultima_ejecucion': None,
+    'ultimo_resumen': None,
+    'ultimos_asignados': 0,
+    'fallos_consecutivos': 0,
+    'ultimo_error': None,
+    'lock': threading.Lock()
+}
+
+_hilo = None
+_hilo_lock = threading.Lock()
+_despertar = threading.Event()
+_detener = threading.Event()
+
+
+@medir('ciclo_worker')
+def ejecutar_ciclo(modo=None):
+    """
+    Un ciclo completo: sincroniza la vista externa con la tabla de control y
+    asigna turnos a las personas pendientes. Los errores de BD se propagan.
+    """
+    with _estado['lock']:
+        ciclo = _estado['ciclos']
+    if modo is None and WORKER_RECONCILIAR_CADA > 0 and ciclo % WORKER_RECONCILIAR_CADA == 0:
+        modo = 'completo'
+
+    resumen = sincronizar_control_externo(modo=modo)
+    personas = obtener_personas_pendientes()
+    asignados = asignar_turnos(personas)
+    if modo == 'completo':
+        # Junto con la reconciliación: los contadores abiertos de días anteriores ya en cero
+        depurar_contadores_estado()
+
+    with _estado['lock']:
+        _estado['ciclos'] += 1
+        _estado['ultima_ejecucion'] = datetime.now()
+        _estado['ultimo_resumen'] = resumen
+        _estado['ultimos_asignados'] = asignados
+        _estado['fallos_consecutivos'] = 0
+        _estado['ultimo_error'] = None
+    return asignados
+
+
+def _registrar_fallo(error):
+    """Guarda el error del ciclo y devuelve cuántos fallos seguidos van"""
+    with _estado['lock']:
+        _estado['fallos_consecutivos'] += 1
+        _estado['ultimo_error'] = str(error)
+        return _estado['fallos_consecutivos']
+
+
+def calcular_espera(fallos, intervalo=None, jitter=None, backoff_max=None):
+    """Intervalo normal o backoff exponencial tras fallos, más un jitter aleatorio"""
+    intervalo = WORKER_INTERVALO if intervalo is None else intervalo
+    jitter = WORKER_JITTER if jitter is None else jitter
+    backoff_max = WORKER_BACKOFF_MAX if backoff_max is None else backoff_max
+    espera = intervalo
+    if fallos:
+        espera = min(intervalo * (2 ** fallos), backoff_max)
+    return espera + random.uniform(0, jitter)
+
+
+def ejecutar_bucle(intervalo=None, jitter=None, backoff_max=None, detener=None):
+    """Bucle del worker; termina cuando se activa el evento `detener`"""
+    detener = detener or _detener
+    fallos = 0
+    while not detener.is_set():
+        try:
+            asignados = ejecutar_ciclo()
+            fallos = 0
+            log.debug("ciclo_completado", asignados=asignados)
+        except Exception as e:
+            fallos = _registrar_fallo(e)
+            log.error("ciclo_error", fallos_seguidos=fallos, error=e)
+
+        _despertar.wait(calcular_espera(fallos, intervalo, jitter, backoff_max))
+        _despertar.clear()
+
+
+def iniciar_worker_en_hilo():
+    """Arranca el worker como hilo daemon una sola vez por proceso (si WORKER_EN_PROCESO)"""
+    global _hilo
+    if not WORKER_EN_PROCESO:
+        return False
+    with _hilo_lock:
+        if _hilo and _hilo.is_alive():
+            return True
+        _detener.clear()
+        _hilo = threading.Thread(target=ejecutar_bucle, name='worker-turnos', daemon=True)
+        _hilo.start()
+        log.info("worker_iniciado", intervalo=WORKER_INTERVALO, reconciliar_cada=WORKER_RECONCILIAR_CADA)
+    return True
+
+
+def detener_worker():
+    """Detiene el hilo del worker si está corriendo"""
+    _detener.set()
+    _despertar.set()
+
+
+def solicitar_ejecucion():
+    """Despierta al worker para que ejecute un ciclo sin esperar el intervalo"""
+    _despertar.set()
+
+
+def estado_worker():
+    """Copia del estado del último ciclo para mostrar en las páginas"""
+    with _estado['lock']:
+        estado = {k: v for k, v in _estado.items() if k != 'lock'}
+    estado['activo'] = bool(_hilo and _hilo.is_alive())
+    return estado
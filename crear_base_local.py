@@ -0,0 +1,36 @@
+"""
+Crea una base SQLite local con el esquema completo y registros externos de prueba
+Uso: python crear_base_local.py [--url sqlite:///turnos_local.db] [--registros 20]
+Después: DATABASE_URL=<url> EXTERNAL_DATABASE_URL=<url> streamlit run app.py
+"""
+
+import os
+import sys
+import argparse
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Base SQLite local para desarrollo")
+    parser.add_argument("--url", default=os.getenv('DATABASE_URL', 'sqlite:///turnos_local.db'), help="URL SQLAlchemy de la base local")
+    parser.add_argument("--registros", type=int, default=20, help="Registros telefónicos de hoy a crear en la vista externa")
+    args = parser.parse_args()
+
+    if not args.url.startswith('sqlite'):
+        print("❌ La base local debe ser SQLite (sqlite:///archivo.db)")
+        sys.exit(1)
+    os.environ['DATABASE_URL'] = args.url
+    os.environ.setdefault('EXTERNAL_DATABASE_URL', args.url)
+
+    from config.database import get_db_engine, get_external_db_engine
+    from config.base_local import preparar_base_local, registrar_externos
+    from config.conexiones import cerrar_engines
+
+    try:
+        preparar_base_local(get_db_engine(), get_external_db_engine())
+        documentos = registrar_externos(get_external_db_engine(), args.registros)
+        print(f"✅ Base local lista en {args.url} con {len(documentos)} registros externos de hoy")
+        print(f"   DATABASE_URL={args.url} EXTERNAL_DATABASE_URL={os.environ['EXTERNAL_DATABASE_URL']} streamlit run app.py")
+    except Exception as e:
+        print(f"❌ Error creando la base local: {e}")
+        sys.exit(1)
+    finally:
+        cerrar_engines()
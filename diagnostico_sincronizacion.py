@@ -0,0 +1,116 @@
+"""
+Diagnóstico de la sincronización de la vista externa con la tabla de control
+Uso: python diagnostico_sincronizacion.py [--muestra 20] [--repeticiones 5] [--sin-planes]
+Muestra conteos de filas, planes de ejecución (EXPLAIN) de la vista externa y de
+control, latencia de cada base y el retraso entre el registro externo, la lectura
+en control y la asignación del turno. Reemplaza la verificación que corría en cada
+render de la Interfaz de Taquillas; se ejecuta solo cuando se necesita.
+"""
+
+import sys
+import argparse
+from config.diagnostico import contar_filas, planes, medir_latencias, verificar_sincronizacion, medir_retrasos
+from config.database import EXTERNAL_TABLE_NAME
+from config.conexiones import cerrar_engines
+
+
+def _ms(segundos):
+    return "-" if segundos is None else f"{segundos * 1000:.1f}"
+
+
+def _duracion(segundos):
+    if segundos is None:
+        return "-"
+    if abs(segundos) < 120:
+        return f"{segundos:.0f}s"
+    return f"{segundos / 60:.1f}min"
+
+
+def _imprimir_plan(nombre, filas):
+    for fila in filas:
+        print(f"   {nombre}: {fila.get('table')} type={fila.get('type')} key={fila.get('key')} rows={fila.get('rows')}")
+
+
+def diagnosticar(muestra, repeticiones, con_planes=True):
+    """Imprime el diagnóstico completo; devuelve False si alguna sección falló"""
+    ok = True
+
+    print(f"📊 Filas (vista externa {EXTERNAL_TABLE_NAME})")
+    conteos = contar_filas()
+    if conteos is None:
+        print("❌ No se pudieron contar las filas")
+        ok = False
+    else:
+        externa, control = conteos['externa'], conteos['control']
+        print(f"   externa: {externa['hoy']} de hoy (filtro de la sincronización), {externa['total']} en total")
+        print(f"   control: {control['hoy']} de hoy, {control['pendientes']} pendientes, {control['total']} en total")
+
+    if con_planes:
+        print("\n🔍 Planes de ejecución")
+        resultado = planes()
+        if resultado is None:
+            print("❌ No se pudieron obtener los planes")
+            ok = False
+        else:
+            for base, consultas in resultado.items():
+                for nombre, filas in consultas.items():
+                    _imprimir_plan(f"{base}.{nombre}", filas)
+
+    print(f"\n⏱️  Latencia por base (ms, {repeticiones} repeticiones)")
+    latencias = medir_latencias(repeticiones)
+    if latencias is None:
+        print("❌ No se pudo medir la latencia")
+        ok = False
+    else:
+        print(f"   {'base':<10} {'medida':<11} {'p50':>8} {'p95':>8} {'máx':>8}")
+        for fuente, medidas in latencias.items():
+            for medida, datos in medidas.items():
+                print(f"   {fuente:<10} {medida:<11} {_ms(datos['p50']):>8} {_ms(datos['p95']):>8} {_ms(datos['max']):>8}")
+
+    print(f"\n🔄 Últimos {muestra} registros externos")
+    verificacion = verificar_sincronizacion(muestra)
+    if verificacion is None:
+        print("❌ No se pudo verificar la sincronización")
+        ok = False
+    else:
+        print(f"   {len(verificacion['externos'])} externos, {len(verificacion['control'])} en control desde ayer")
+        for fecha, documento, tema in verificacion['faltantes']:
+            print(f"   ⚠️  sin fila en control: {documento} ({tema}, {fecha})")
+
+    print("\n🕒 Retraso de hoy")
+    retrasos = medir_retrasos()
+    if retrasos is None:
+        print("❌ No se pudo medir el retraso")
+        ok = False
+    else:
+        for etapa, nombre in (
+            ('registro_a_lectura', 'registro → control'),
+            ('lectura_a_turno', 'control → turno'),
+            ('registro_a_turno', 'registro → turno'),
+        ):
+            datos = retrasos[etapa]
+            if not datos['n']:
+                print(f"   {nombre:<20} sin datos")
+                continue
+            print(f"   {nombre:<20} n={datos['n']} p50={_duracion(datos['p50'])} "
+                  f"p95={_duracion(datos['p95'])} máx={_duracion(datos['max'])}")
+        print(f"   {retrasos['sin_leer']} registros externos de hoy aún sin leer; "
+              f"{retrasos['pendientes']} pendientes de turno (el más antiguo espera "
+              f"{_duracion(retrasos['pendiente_mas_antiguo'])})")
+
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diagnóstico de la sincronización vista externa → control")
+    parser.add_argument("--muestra", type=int, default=20, help="Registros externos recientes a revisar")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones por medida de latencia")
+    parser.add_argument("--sin-planes", action="store_true", help="No correr EXPLAIN")
+    args = parser.parse_args()
+
+    try:
+        exito = diagnosticar(args.muestra, args.repeticiones, not args.sin_planes)
+        print("\n✅ Diagnóstico completo" if exito else "\n❌ Diagnóstico incompleto")
+    finally:
+        cerrar_engines()
+    sys.exit(0 if exito else 1)
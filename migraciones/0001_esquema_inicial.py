@@ -0,0 +1,123 @@
+"""Tablas base: turnos, control_turnos_externos y contadores_turnos"""
+from sqlalchemy import text
+from config.dialectos import SQLPorDialecto, es_sqlite
+
+DESCRIPCION = "Esquema inicial: turnos, control_turnos_externos y contadores_turnos"
+
+
+def _aplicar_sqlite(conn):
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS turnos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        modulo VARCHAR(10) NOT NULL,
+        numero_turno VARCHAR(10) NOT NULL,
+        estado VARCHAR(10) DEFAULT 'espera' CHECK (estado IN ('espera', 'llamando', 'atendido')),
+        taquilla_asignada VARCHAR(50),
+        nombre_usuario VARCHAR(100),
+        cedula_usuario VARCHAR(20),
+        tipo_tramite VARCHAR(50),
+        fecha_creacion TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+        fecha_llamado TIMESTAMP NULL
+    )
+    """))
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS control_turnos_externos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre1 VARCHAR(100),
+        nombre2 VARCHAR(100),
+        apellido1 VARCHAR(100),
+        apellido2 VARCHAR(100),
+        documento VARCHAR(20) NOT NULL,
+        tema_solicitud VARCHAR(100),
+        fecha_lectura TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+        procesado BOOLEAN DEFAULT FALSE,
+        turno_asignado VARCHAR(20),
+        fecha_procesado TIMESTAMP NULL
+    )
+    """))
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS contadores_turnos (
+        modulo VARCHAR(10) NOT NULL PRIMARY KEY,
+        ultimo_turno INT DEFAULT 0,
+        fecha_reseteo TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+        manual_reset BOOLEAN DEFAULT FALSE
+    )
+    """))
+    # En SQLite los nombres de índice son globales y van en sentencias aparte
+    for nombre, tabla, columnas in [
+        ("idx_estado", "turnos", "estado"),
+        ("idx_modulo", "turnos", "modulo"),
+        ("idx_fecha_creacion", "turnos", "fecha_creacion"),
+        ("idx_documento", "control_turnos_externos", "documento"),
+        ("idx_procesado", "control_turnos_externos", "procesado"),
+        ("idx_fecha_lectura", "control_turnos_externos", "fecha_lectura"),
+        ("idx_documento_fecha", "control_turnos_externos", "documento, fecha_lectura"),
+    ]:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas})"))
+
+
+def aplicar(conn):
+    if es_sqlite(conn):
+        _aplicar_sqlite(conn)
+        for modulo in ["A", "P", "L", "C", "S"]:
+            conn.execute(
+                SQLPorDialecto("{insertar_ignorando} INTO contadores_turnos (modulo, ultimo_turno, fecha_reseteo) VALUES (:modulo, 0, {ahora})"),
+                {"modulo": modulo}
+            )
+        return
+
+    # Tabla de turnos principal
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS turnos (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        modulo VARCHAR(10) NOT NULL,
+        numero_turno VARCHAR(10) NOT NULL,
+        estado ENUM('espera', 'llamando', 'atendido') DEFAULT 'espera',
+        taquilla_asignada VARCHAR(50),
+        nombre_usuario VARCHAR(100),
+        cedula_usuario VARCHAR(20),
+        tipo_tramite VARCHAR(50),
+        fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        fecha_llamado TIMESTAMP NULL,
+        INDEX idx_estado (estado),
+        INDEX idx_modulo (modulo),
+        INDEX idx_fecha_creacion (fecha_creacion)
+    )
+    """))
+
+    # Tabla de control para capturar el orden de llegada
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS control_turnos_externos (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        nombre1 VARCHAR(100),
+        nombre2 VARCHAR(100),
+        apellido1 VARCHAR(100),
+        apellido2 VARCHAR(100),
+        documento VARCHAR(20) NOT NULL,
+        tema_solicitud VARCHAR(100),
+        fecha_lectura TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        procesado BOOLEAN DEFAULT FALSE,
+        turno_asignado VARCHAR(20),
+        fecha_procesado TIMESTAMP NULL,
+        INDEX idx_documento (documento),
+        INDEX idx_procesado (procesado),
+        INDEX idx_fecha_lectura (fecha_lectura),
+        INDEX idx_documento_fecha (documento, fecha_lectura)
+    )
+    """))
+
+    # Contadores para gestionar números de turnos (en cero, sin sincronizar con histórico)
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS contadores_turnos (
+        modulo VARCHAR(10) NOT NULL PRIMARY KEY,
+        ultimo_turno INT DEFAULT 0,
+        fecha_reseteo TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        manual_reset BOOLEAN DEFAULT FALSE,
+        INDEX idx_modulo (modulo)
+    )
+    """))
+    for modulo in ["A", "P", "L", "C", "S"]:
+        conn.execute(
+            text("INSERT IGNORE INTO contadores_turnos (modulo, ultimo_turno, fecha_reseteo) VALUES (:modulo, 0, NOW())"),
+            {"modulo": modulo}
+        )
@@ -0,0 +1,50 @@
+"""Clave única (documento, tema_solicitud, dia_lectura) para la sincronización por lotes"""
+from sqlalchemy import text
+from config.migraciones import existe_columna
+from config.dialectos import es_sqlite
+
+DESCRIPCION = "control_turnos_externos: dia_lectura, clave única e índice de pendientes"
+
+
+def _aplicar_sqlite(conn):
+    # SQLite no puede pasar la columna a NOT NULL; la sincronización siempre la llena
+    conn.execute(text("ALTER TABLE control_turnos_externos ADD COLUMN dia_lectura DATE NULL"))
+    conn.execute(text("UPDATE control_turnos_externos SET dia_lectura = DATE(fecha_lectura)"))
+    conn.execute(text("""
+    DELETE FROM control_turnos_externos
+    WHERE id NOT IN (
+        SELECT MIN(id) FROM control_turnos_externos
+        GROUP BY documento, tema_solicitud, dia_lectura
+    )
+    """))
+    conn.execute(text("""
+    CREATE UNIQUE INDEX uk_documento_tema_dia
+    ON control_turnos_externos (documento, tema_solicitud, dia_lectura)
+    """))
+    conn.execute(text("CREATE INDEX idx_dia_procesado ON control_turnos_externos (dia_lectura, procesado)"))
+
+
+def aplicar(conn):
+    if existe_columna(conn, 'control_turnos_externos', 'dia_lectura'):
+        return
+    if es_sqlite(conn):
+        _aplicar_sqlite(conn)
+        return
+
+    conn.execute(text("ALTER TABLE control_turnos_externos ADD COLUMN dia_lectura DATE NULL AFTER fecha_lectura"))
+    conn.execute(text("UPDATE control_turnos_externos SET dia_lectura = DATE(fecha_lectura)"))
+    # Si hay duplicados históricos se conserva el más antiguo
+    conn.execute(text("""
+    DELETE c1 FROM control_turnos_externos c1
+    JOIN control_turnos_externos c2
+      ON c1.documento = c2.documento
+     AND c1.tema_solicitud <=> c2.tema_solicitud
+     AND c1.dia_lectura = c2.dia_lectura
+     AND c1.id > c2.id
+    """))
+    conn.execute(text("""
+    ALTER TABLE control_turnos_externos
+    MODIFY dia_lectura DATE NOT NULL,
+    ADD UNIQUE KEY uk_documento_tema_dia (documento, tema_solicitud, dia_lectura),
+    ADD INDEX idx_dia_procesado (dia_lectura, procesado)
+    """))
@@ -0,0 +1,26 @@
+"""Cursores de la sincronización incremental"""
+from sqlalchemy import text
+from config.dialectos import es_sqlite
+
+DESCRIPCION = "sync_cursores: último valor sincronizado por fuente"
+
+
+def aplicar(conn):
+    if es_sqlite(conn):
+        # Sin ON UPDATE: la fecha queda como la de creación del cursor
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS sync_cursores (
+            fuente VARCHAR(150) NOT NULL PRIMARY KEY,
+            ultimo_valor VARCHAR(64) NOT NULL,
+            fecha_actualizacion TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+        )
+        """))
+        return
+
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS sync_cursores (
+        fuente VARCHAR(150) NOT NULL PRIMARY KEY,
+        ultimo_valor VARCHAR(64) NOT NULL,
+        fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """))
@@ -0,0 +1,52 @@
+"""Un solo turno 'llamando' por taquilla, garantizado por la base de datos"""
+from sqlalchemy import text
+from config.migraciones import existe_columna, existe_indice
+from config.dialectos import es_sqlite
+
+DESCRIPCION = "turnos: taquilla_activa generada con clave única"
+
+
+def _aplicar_sqlite(conn):
+    # Sin columnas generadas con clave única: índice único parcial equivalente
+    if existe_indice(conn, 'turnos', 'uk_taquilla_activa'):
+        return
+    conn.execute(text("""
+    UPDATE turnos SET estado = 'atendido'
+    WHERE estado = 'llamando'
+    AND id < (
+        SELECT MAX(t2.id) FROM turnos t2
+        WHERE t2.estado = 'llamando' AND t2.taquilla_asignada = turnos.taquilla_asignada
+    )
+    """))
+    conn.execute(text("""
+    CREATE UNIQUE INDEX uk_taquilla_activa ON turnos (taquilla_asignada)
+    WHERE estado = 'llamando'
+    """))
+
+
+def aplicar(conn):
+    if es_sqlite(conn):
+        _aplicar_sqlite(conn)
+        return
+    if existe_columna(conn, 'turnos', 'taquilla_activa'):
+        return
+
+    # Si una taquilla ya tiene varios turnos 'llamando', los más antiguos quedan atendidos
+    conn.execute(text("""
+    UPDATE turnos t
+    JOIN (
+        SELECT taquilla_asignada, MAX(id) AS id_actual
+        FROM turnos
+        WHERE estado = 'llamando'
+        GROUP BY taquilla_asignada
+        HAVING COUNT(*) > 1
+    ) d ON t.taquilla_asignada = d.taquilla_asignada
+    SET t.estado = 'atendido'
+    WHERE t.estado = 'llamando' AND t.id < d.id_actual
+    """))
+    conn.execute(text("""
+    ALTER TABLE turnos
+    ADD COLUMN taquilla_activa VARCHAR(50)
+        GENERATED ALWAYS AS (IF(estado = 'llamando', taquilla_asignada, NULL)) STORED,
+    ADD UNIQUE KEY uk_taquilla_activa (taquilla_activa)
+    """))
@@ -0,0 +1,15 @@
+"""Versión del tablero que consultan las pantallas"""
+from sqlalchemy import text
+from config.dialectos import SQLPorDialecto
+
+DESCRIPCION = "estado_tablero: versión incrementada en cada cambio visible"
+
+
+def aplicar(conn):
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS estado_tablero (
+        id TINYINT NOT NULL PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    )
+    """))
+    conn.execute(SQLPorDialecto("{insertar_ignorando} INTO estado_tablero (id, version) VALUES (1, 0)"))
@@ -0,0 +1,68 @@
+"""Buffer de últimos llamados ya formateados para las pantallas"""
+from sqlalchemy import text
+from config.dialectos import SQLPorDialecto, es_sqlite
+
+DESCRIPCION = "llamados_recientes: últimos llamados para las pantallas"
+
+# Llamados que se copian del histórico (el valor por defecto de TABLERO_LLAMADOS_RECIENTES,
+# fijo aquí: la migración no depende del entorno en que se aplique)
+LLAMADOS_INICIALES = 10
+
+
+def aplicar(conn):
+    if es_sqlite(conn):
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS llamados_recientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            turno_id INT NOT NULL,
+            turno VARCHAR(20) NOT NULL,
+            nombre_usuario VARCHAR(100),
+            taquilla VARCHAR(50),
+            hora_llamado CHAR(8),
+            estado VARCHAR(20)
+        )
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_turno_id ON llamados_recientes (turno_id)"))
+    else:
+        conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS llamados_recientes (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            turno_id INT NOT NULL,
+            turno VARCHAR(20) NOT NULL,
+            nombre_usuario VARCHAR(100),
+            taquilla VARCHAR(50),
+            hora_llamado CHAR(8),
+            estado VARCHAR(20),
+            INDEX idx_turno_id (turno_id)
+        )
+        """))
+
+    # Carga inicial desde el histórico si el buffer está vacío
+    if conn.execute(text("SELECT COUNT(*) FROM llamados_recientes")).scalar() > 0:
+        return
+    conn.execute(
+        SQLPorDialecto("""
+        INSERT INTO llamados_recientes (turno_id, turno, nombre_usuario, taquilla, hora_llamado, estado)
+        SELECT id, CONCAT(modulo, numero_turno), nombre_usuario, taquilla_asignada,
+               DATE_FORMAT(fecha_llamado, '%H:%i:%s'), estado
+        FROM (
+            SELECT * FROM turnos
+            WHERE fecha_llamado IS NOT NULL
+            ORDER BY fecha_llamado DESC
+            LIMIT :limite
+        ) ultimos
+        ORDER BY fecha_llamado
+        """, sqlite="""
+        INSERT INTO llamados_recientes (turno_id, turno, nombre_usuario, taquilla, hora_llamado, estado)
+        SELECT id, modulo || numero_turno, nombre_usuario, taquilla_asignada,
+               strftime('%H:%M:%S', fecha_llamado), estado
+        FROM (
+            SELECT * FROM turnos
+            WHERE fecha_llamado IS NOT NULL
+            ORDER BY fecha_llamado DESC
+            LIMIT :limite
+        ) ultimos
+        ORDER BY fecha_llamado
+        """),
+        {"limite": LLAMADOS_INICIALES}
+    )
@@ -0,0 +1,35 @@
+"""Índices compuestos para las consultas de cada llamado, asignación y pantalla"""
+from sqlalchemy import text
+from config.migraciones import existe_indice
+from config.dialectos import es_sqlite
+
+DESCRIPCION = "turnos: índices compuestos de las consultas frecuentes"
+
+# (nombre, columnas, consultas que lo usan)
+INDICES = [
+    ("idx_cedula_estado_fecha", "cedula_usuario, estado, fecha_creacion",
+     "ya_tiene_turno_pendiente_robusto, verificación por cédula en asignar_turnos"),
+    ("idx_taquilla_estado", "taquilla_asignada, estado",
+     "taquilla_tiene_turno_activo, obtener_turno_activo_taquilla"),
+    ("idx_estado_fecha", "estado, fecha_creacion, id",
+     "obtener_turnos_por_estado, llamar_siguiente_turno"),
+    ("idx_fecha_llamado", "fecha_llamado",
+     "consultas de pantalla sobre el histórico de llamados"),
+]
+
+
+def aplicar(conn):
+    sqlite = es_sqlite(conn)
+    for nombre, columnas, _ in INDICES:
+        if not existe_indice(conn, 'turnos', nombre):
+            if sqlite:
+                conn.execute(text(f"CREATE INDEX {nombre} ON turnos ({columnas})"))
+            else:
+                conn.execute(text(f"ALTER TABLE turnos ADD INDEX {nombre} ({columnas})"))
+
+    # idx_estado queda cubierto por el prefijo de idx_estado_fecha
+    if existe_indice(conn, 'turnos', 'idx_estado'):
+        if sqlite:
+            conn.execute(text("DROP INDEX idx_estado"))
+        else:
+            conn.execute(text("ALTER TABLE turnos DROP INDEX idx_estado"))
@@ -0,0 +1,25 @@
+"""Conteo de turnos por día, módulo y estado para los tableros"""
+from sqlalchemy import text
+
+DESCRIPCION = "contadores_estado: turnos por (dia, modulo, estado) mantenidos en cada transición"
+
+
+def aplicar(conn):
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS contadores_estado (
+        dia DATE NOT NULL,
+        modulo VARCHAR(10) NOT NULL,
+        estado VARCHAR(20) NOT NULL,
+        cantidad INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, modulo, estado)
+    )
+    """))
+
+    # Carga inicial desde el histórico (SQL fijo: el del repositorio cambia con el esquema)
+    conn.execute(text("DELETE FROM contadores_estado"))
+    conn.execute(text("""
+    INSERT INTO contadores_estado (dia, modulo, estado, cantidad)
+    SELECT DATE(fecha_creacion), modulo, estado, COUNT(*)
+    FROM turnos
+    GROUP BY DATE(fecha_creacion), modulo, estado
+    """))
@@ -0,0 +1,154 @@
+"""Dimensión sede (oficina) en turnos, control, contadores, llamados y tablero"""
+from sqlalchemy import text
+from config.migraciones import existe_columna, existe_indice
+from config.dialectos import es_sqlite
+
+DESCRIPCION = "sede en turnos, control, contadores, llamados y tablero; índices por sede"
+
+# Los datos existentes son de la única oficina que había. La sede es fija (el valor
+# por defecto de SEDE) para que el resultado no dependa del entorno de quien migra
+SEDE_INICIAL = 'principal'
+TABLAS_CON_SEDE = ['turnos', 'control_turnos_externos', 'llamados_recientes']
+
+# (nombre, tabla, columnas): las consultas calientes filtran primero por sede
+INDICES = [
+    ("idx_sede_estado_fecha", "turnos", "sede, estado, fecha_creacion, id"),
+    ("idx_sede_taquilla_estado", "turnos", "sede, taquilla_asignada, estado"),
+    ("idx_sede_fecha", "turnos", "sede, fecha_creacion"),
+    ("idx_sede_id", "llamados_recientes", "sede, id"),
+]
+# Cubiertos por los anteriores (o reemplazados por su versión por sede)
+INDICES_REEMPLAZADOS = [("idx_estado_fecha", "turnos"), ("idx_taquilla_estado", "turnos")]
+
+# SQLite no puede cambiar la clave primaria con ALTER: la tabla se recrea, dentro de
+# la transacción de la migración (en SQLite el DDL es transaccional)
+CREAR_CONTADORES_TURNOS_SQLITE = """
+CREATE TABLE contadores_turnos (
+    sede VARCHAR(30) NOT NULL,
+    modulo VARCHAR(10) NOT NULL,
+    ultimo_turno INT DEFAULT 0,
+    fecha_reseteo TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    manual_reset BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (sede, modulo)
+)
+"""
+
+
+def _agregar_columna_sede(conn, tabla):
+    if existe_columna(conn, tabla, 'sede'):
+        return
+    conn.execute(text(f"ALTER TABLE {tabla} ADD COLUMN sede VARCHAR(30) NOT NULL DEFAULT '{SEDE_INICIAL}'"))
+
+
+def _indices(conn, sqlite):
+    for nombre, tabla, columnas in INDICES:
+        if not existe_indice(conn, tabla, nombre):
+            if sqlite:
+                conn.execute(text(f"CREATE INDEX {nombre} ON {tabla} ({columnas})"))
+            else:
+                conn.execute(text(f"ALTER TABLE {tabla} ADD INDEX {nombre} ({columnas})"))
+    for nombre, tabla in INDICES_REEMPLAZADOS:
+        if existe_indice(conn, tabla, nombre):
+            if sqlite:
+                conn.execute(text(f"DROP INDEX {nombre}"))
+            else:
+                conn.execute(text(f"ALTER TABLE {tabla} DROP INDEX {nombre}"))
+
+    # Un turno 'llamando' por taquilla dentro de cada sede ("Taquilla 1" existe en todas)
+    if existe_indice(conn, 'turnos', 'uk_taquilla_activa'):
+        if sqlite:
+            conn.execute(text("DROP INDEX uk_taquilla_activa"))
+            conn.execute(text("""
+            CREATE UNIQUE INDEX uk_sede_taquilla_activa ON turnos (sede, taquilla_asignada)
+            WHERE estado = 'llamando'
+            """))
+        else:
+            conn.execute(text("""
+            ALTER TABLE turnos
+            DROP INDEX uk_taquilla_activa,
+            ADD UNIQUE KEY uk_sede_taquilla_activa (sede, taquilla_activa)
+            """))
+
+
+def _contadores_turnos(conn, sqlite):
+    """
+    La clave pasa a (sede, modulo) conservando ultimo_turno. En MySQL es un solo ALTER
+    (el DDL hace commit implícito: con varias sentencias, una falla a mitad perdería
+    los contadores y la numeración volvería a empezar)
+    """
+    if existe_columna(conn, 'contadores_turnos', 'sede'):
+        return
+    if not sqlite:
+        conn.execute(text(f"""
+        ALTER TABLE contadores_turnos
+        ADD COLUMN sede VARCHAR(30) NOT NULL DEFAULT '{SEDE_INICIAL}' FIRST,
+        DROP PRIMARY KEY,
+        ADD PRIMARY KEY (sede, modulo)
+        """))
+        return
+    conn.execute(text("ALTER TABLE contadores_turnos RENAME TO contadores_turnos_sin_sede"))
+    conn.execute(text(CREAR_CONTADORES_TURNOS_SQLITE))
+    conn.execute(text(f"""
+    INSERT INTO contadores_turnos (sede, modulo, ultimo_turno, fecha_reseteo, manual_reset)
+    SELECT '{SEDE_INICIAL}', modulo, ultimo_turno, fecha_reseteo, manual_reset FROM contadores_turnos_sin_sede
+    """))
+    conn.execute(text("DROP TABLE contadores_turnos_sin_sede"))
+
+
+def _contadores_estado(conn):
+    """Datos derivados: se recrea con la sede al frente de la clave y se recalcula desde turnos"""
+    conn.execute(text("DROP TABLE IF EXISTS contadores_estado"))
+    conn.execute(text("""
+    CREATE TABLE contadores_estado (
+        sede VARCHAR(30) NOT NULL,
+        dia DATE NOT NULL,
+        modulo VARCHAR(10) NOT NULL,
+        estado VARCHAR(20) NOT NULL,
+        cantidad INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (sede, dia, modulo, estado)
+    )
+    """))
+    conn.execute(text("""
+    INSERT INTO contadores_estado (sede, dia, modulo, estado, cantidad)
+    SELECT sede, DATE(fecha_creacion), modulo, estado, COUNT(*)
+    FROM turnos
+    GROUP BY sede, DATE(fecha_creacion), modulo, estado
+    """))
+
+
+def _estado_tablero(conn, sqlite):
+    """Una versión por sede: cada pantalla solo se refresca con los cambios de su oficina"""
+    if existe_columna(conn, 'estado_tablero', 'sede'):
+        return
+    if not sqlite:
+        # La fila única (id = 1) queda como la de la sede inicial, en un solo ALTER
+        conn.execute(text(f"""
+        ALTER TABLE estado_tablero
+        ADD COLUMN sede VARCHAR(30) NOT NULL DEFAULT '{SEDE_INICIAL}' FIRST,
+        DROP PRIMARY KEY,
+        DROP COLUMN id,
+        ADD PRIMARY KEY (sede)
+        """))
+        return
+    conn.execute(text("ALTER TABLE estado_tablero RENAME TO estado_tablero_sin_sede"))
+    conn.execute(text("""
+    CREATE TABLE estado_tablero (
+        sede VARCHAR(30) NOT NULL PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0
+    )
+    """))
+    conn.execute(text(f"""
+    INSERT INTO estado_tablero (sede, version)
+    SELECT '{SEDE_INICIAL}', version FROM estado_tablero_sin_sede WHERE id = 1
+    """))
+    conn.execute(text("DROP TABLE estado_tablero_sin_sede"))
+
+
+def aplicar(conn):
+    sqlite = es_sqlite(conn)
+    for tabla in TABLAS_CON_SEDE:
+        _agregar_columna_sede(conn, tabla)
+    _indices(conn, sqlite)
+    _contadores_turnos(conn, sqlite)
+    _contadores_estado(conn)
+    _estado_tablero(conn, sqlite)
@@ -0,0 +1,33 @@
+"""Rutas taquilla → módulos con peso, y cola por módulo indexada"""
+from sqlalchemy import text
+from config.migraciones import existe_indice
+from config.dialectos import es_sqlite
+
+DESCRIPCION = "rutas_taquilla: módulos que atiende cada taquilla; índice de la cola por módulo"
+
+
+def aplicar(conn):
+    # servidos cuenta los turnos de hoy (dia) de cada módulo en la taquilla,
+    # para repartir los llamados según el peso
+    conn.execute(text("""
+    CREATE TABLE IF NOT EXISTS rutas_taquilla (
+        sede VARCHAR(30) NOT NULL,
+        taquilla VARCHAR(50) NOT NULL,
+        modulo VARCHAR(10) NOT NULL,
+        peso INT NOT NULL DEFAULT 1,
+        servidos INT NOT NULL DEFAULT 0,
+        dia DATE NULL,
+        PRIMARY KEY (sede, taquilla, modulo)
+    )
+    """))
+
+    # Siguiente turno de un módulo: una búsqueda en el índice, sin recorrer las otras colas
+    if not existe_indice(conn, 'turnos', 'idx_sede_modulo_estado_fecha'):
+        if es_sqlite(conn):
+            conn.execute(text(
+                "CREATE INDEX idx_sede_modulo_estado_fecha ON turnos (sede, modulo, estado, fecha_creacion, id)"
+            ))
+        else:
+            conn.execute(text(
+                "ALTER TABLE turnos ADD INDEX idx_sede_modulo_estado_fecha (sede, modulo, estado, fecha_creacion, id)"
+            ))
@@ -0,0 +1,88 @@
+"""Tablas de histórico para turnos y control, y vistas que las unen con las operativas"""
+from sqlalchemy import text
+from config.migraciones import existe_indice
+from config.dialectos import es_sqlite
+
+DESCRIPCION = "turnos_historico y control_turnos_externos_historico; vistas turnos_todos y control_todos"
+
+COLUMNAS_TURNOS = (
+    "id, sede, modulo, numero_turno, estado, taquilla_asignada, nombre_usuario, "
+    "cedula_usuario, tipo_tramite, fecha_creacion, fecha_llamado"
+)
+COLUMNAS_CONTROL = (
+    "id, sede, nombre1, nombre2, apellido1, apellido2, documento, tema_solicitud, "
+    "fecha_lectura, dia_lectura, procesado, turno_asignado, fecha_procesado"
+)
+
+# Mismas columnas que las tablas operativas; el id se conserva (sin autoincremento)
+TABLAS = [
+    """
+    CREATE TABLE IF NOT EXISTS turnos_historico (
+        id INT NOT NULL PRIMARY KEY,
+        sede VARCHAR(30) NOT NULL,
+        modulo VARCHAR(10) NOT NULL,
+        numero_turno VARCHAR(10) NOT NULL,
+        estado VARCHAR(10) NOT NULL,
+        taquilla_asignada VARCHAR(50),
+        nombre_usuario VARCHAR(100),
+        cedula_usuario VARCHAR(20),
+        tipo_tramite VARCHAR(50),
+        fecha_creacion TIMESTAMP NULL,
+        fecha_llamado TIMESTAMP NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS control_turnos_externos_historico (
+        id INT NOT NULL PRIMARY KEY,
+        sede VARCHAR(30) NOT NULL,
+        nombre1 VARCHAR(100),
+        nombre2 VARCHAR(100),
+        apellido1 VARCHAR(100),
+        apellido2 VARCHAR(100),
+        documento VARCHAR(20) NOT NULL,
+        tema_solicitud VARCHAR(100),
+        fecha_lectura TIMESTAMP NULL,
+        dia_lectura DATE,
+        procesado BOOLEAN,
+        turno_asignado VARCHAR(20),
+        fecha_procesado TIMESTAMP NULL
+    )
+    """,
+]
+
+# (nombre, tabla, columnas): reportes por sede y fecha, y búsqueda por cédula
+INDICES = [
+    ("idx_historico_sede_fecha", "turnos_historico", "sede, fecha_creacion"),
+    ("idx_historico_cedula", "turnos_historico", "cedula_usuario"),
+    ("idx_control_historico_dia", "control_turnos_externos_historico", "dia_lectura"),
+    ("idx_control_historico_documento", "control_turnos_externos_historico", "documento"),
+]
+
+# Reportes sobre todo el histórico: lo operativo (hoy) más lo archivado
+VISTAS = [
+    ("turnos_todos", f"""
+    SELECT {COLUMNAS_TURNOS} FROM turnos
+    UNION ALL
+    SELECT {COLUMNAS_TURNOS} FROM turnos_historico
+    """),
+    ("control_todos", f"""
+    SELECT {COLUMNAS_CONTROL} FROM control_turnos_externos
+    UNION ALL
+    SELECT {COLUMNAS_CONTROL} FROM control_turnos_externos_historico
+    """),
+]
+
+
+def aplicar(conn):
+    sqlite = es_sqlite(conn)
+    for tabla in TABLAS:
+        conn.execute(text(tabla))
+    for nombre, tabla, columnas in INDICES:
+        if not existe_indice(conn, tabla, nombre):
+            conn.execute(text(f"CREATE INDEX {nombre} ON {tabla} ({columnas})"))
+    for nombre, consulta in VISTAS:
+        if sqlite:
+            conn.execute(text(f"DROP VIEW IF EXISTS {nombre}"))
+            conn.execute(text(f"CREATE VIEW {nombre} AS {consulta}"))
+        else:
+            conn.execute(text(f"CREATE OR REPLACE VIEW {nombre} AS {consulta}"))
@@ -0,0 +1,20 @@
+"""Índice de contadores_estado por estado para los conteos en vivo"""
+from sqlalchemy import text
+from config.migraciones import existe_indice
+from config.dialectos import es_sqlite
+
+DESCRIPCION = "contadores_estado: índice (sede, estado, dia) para los conteos en vivo"
+
+# Espera y llamando se suman de todos los días y atendido solo de hoy: con el estado
+# antes del día, cada lectura recorre solo las filas de su estado (cantidad incluida)
+INDICE = "idx_sede_estado_dia"
+COLUMNAS = "sede, estado, dia, modulo, cantidad"
+
+
+def aplicar(conn):
+    if existe_indice(conn, 'contadores_estado', INDICE):
+        return
+    if es_sqlite(conn):
+        conn.execute(text(f"CREATE INDEX {INDICE} ON contadores_estado ({COLUMNAS})"))
+    else:
+        conn.execute(text(f"ALTER TABLE contadores_estado ADD INDEX {INDICE} ({COLUMNAS})"))
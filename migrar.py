@@ -0,0 +1,47 @@
+"""
+Script para aplicar las migraciones del esquema de base de datos
+Uso: python migrar.py            -> aplica las migraciones pendientes
+     python migrar.py --estado   -> muestra la versión actual y las pendientes
+     python migrar.py --hasta N  -> aplica solo hasta la versión N
+Se ejecuta una vez por despliegue (ver Dockerfile), no en cada carga de página.
+"""
+
+import sys
+import argparse
+from config.database import get_db_engine
+from config.migraciones import aplicar_migraciones, migraciones_pendientes, version_actual
+from config.conexiones import cerrar_engines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de turnos")
+    parser.add_argument("--estado", action="store_true", help="Muestra la versión actual y las migraciones pendientes")
+    parser.add_argument("--hasta", type=int, default=None, help="Aplica solo hasta esta versión")
+    args = parser.parse_args()
+
+    engine = get_db_engine()
+    if not engine:
+        print("❌ No hay conexión a la base de datos")
+        sys.exit(1)
+
+    try:
+        if args.estado:
+            with engine.connect() as conn:
+                print(f"📋 Versión actual del esquema: {version_actual(conn):04d}")
+            pendientes = migraciones_pendientes(engine)
+            if pendientes:
+                print("🔄 Migraciones pendientes:")
+                for version, archivo in pendientes:
+                    print(f"   - {archivo}")
+            else:
+                print("✅ Sin migraciones pendientes")
+        else:
+            aplicadas = aplicar_migraciones(engine, hasta=args.hasta)
+            if aplicadas:
+                print(f"✅ Migraciones aplicadas: {', '.join(f'{v:04d}' for v in aplicadas)}")
+            else:
+                print("✅ Esquema al día, nada que aplicar")
+    except Exception as e:
+        print(f"❌ Error aplicando migraciones: {e}")
+        sys.exit(1)
+    finally:
+        cerrar_engines()
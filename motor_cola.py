@@ -0,0 +1,45 @@
+"""
+Motor de cola en memoria (opcional)
+Uso: python motor_cola.py [--host 127.0.0.1] [--puerto 8765]
+Mantiene las colas de todas las sedes en memoria y atiende por HTTP local los
+llamados, los turnos atendidos, la vista de taquilla y el tablero; cada cambio
+se escribe en la base antes de aplicarse en memoria.
+Para usarlo, configurar MOTOR_COLA_URL=http://<host>:<puerto> en el servicio de Streamlit.
+"""
+
+import argparse
+import signal
+import threading
+from config.motor_cola import iniciar_motor, MOTOR_COLA_HOST, MOTOR_COLA_PUERTO
+from config.conexiones import cerrar_engines
+from config.metricas import iniciar_servidor_metricas
+
+detener = threading.Event()
+servidor = None
+
+
+def _manejar_senal(signum, frame):
+    print("\n🛑 Señal recibida, deteniendo motor de cola...")
+    detener.set()
+    # shutdown() espera a serve_forever, que corre en este mismo hilo
+    threading.Thread(target=servidor.shutdown, daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motor de cola en memoria con escritura a la base")
+    parser.add_argument("--host", default=MOTOR_COLA_HOST, help="Dirección en la que escucha")
+    parser.add_argument("--puerto", type=int, default=MOTOR_COLA_PUERTO, help="Puerto HTTP")
+    args = parser.parse_args()
+
+    try:
+        motor, servidor = iniciar_motor(args.host, args.puerto, detener)
+        iniciar_servidor_metricas()
+        signal.signal(signal.SIGTERM, _manejar_senal)
+        signal.signal(signal.SIGINT, _manejar_senal)
+        espera = sum(len(cola.ids_espera) for cola in motor.sedes.values())
+        print(f"🚀 Motor de cola en http://{args.host}:{args.puerto} ({len(motor.sedes)} sedes, {espera} turnos en espera)")
+        servidor.serve_forever()
+        servidor.server_close()
+        print("✅ Motor de cola detenido")
+    finally:
+        cerrar_engines()
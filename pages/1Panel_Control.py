@@ -1,11 +1,19 @@
 import streamlit as st
 import pandas as pd
-from config.database import get_db_engine, obtener_siguiente_turno_lote, resetear_contadores_turnos, inicializar_contadores_turnos, desbloquear_contadores_turnos
-from utils.helpers import setup_page_config
-from sqlalchemy import text
+from config.database import get_db_engine, obtener_siguiente_turno_lote, resetear_contadores_turnos, inicializar_contadores_turnos, desbloquear_contadores_turnos, reconstruir_contadores_estado, listar_rutas, guardar_rutas_taquilla
+from config.vistas import obtener_estadisticas_panel
+from config.conexiones import estadisticas_pools
+from config.metricas import OPERACION_SEGUNDOS, OPERACION_SENTENCIAS, texto_prometheus, iniciar_servidor_metricas
+from utils.helpers import setup_page_config, seleccionar_sede, get_taquillas_disponibles
+from config import repositorio as repo
+from config.registro import obtener_logger
+from datetime import datetime
 
 setup_page_config("Panel de Control - Registro", "wide")
 
+log = obtener_logger('panel')
+iniciar_servidor_metricas()
+
 # Configuración de módulos SOLO para clasificación
 # Configuración de módulos SOLO para clasificación
 MODULOS_CONFIG = {
@@ -16,58 +24,27 @@ MODULOS_CONFIG = {
     "S": "Soporte Técnico"
 }
 
-def obtener_estadisticas():
+def obtener_estadisticas(sede):
     """
-    Obtiene estadísticas desde la tabla de turnos
+    Obtiene estadísticas de la sede desde los contadores por estado
     """
-    engine = get_db_engine()
-    if engine:
-        try:
-            with engine.connect() as conn:
-                # Turnos en espera por módulo
-                query_espera = text("""
-                SELECT modulo, COUNT(*) as cantidad 
-                FROM turnos 
-                WHERE estado = 'espera' 
-                GROUP BY modulo
-                ORDER BY modulo
-                """)
-                df_espera = pd.read_sql(query_espera, conn)
-                
-                # Próximos turnos
-                query_proximos = text("""
-                SELECT modulo, numero_turno, nombre_usuario, tipo_tramite
-                FROM turnos 
-                WHERE estado = 'espera' 
-                ORDER BY fecha_creacion 
-                LIMIT 5
-                """)
-                df_proximos = pd.read_sql(query_proximos, conn)
-                
-                # Total de turnos hoy
-                query_hoy = text("""
-                SELECT COUNT(*) as total_hoy 
-                FROM turnos 
-                WHERE DATE(fecha_creacion) = CURDATE()
-                """)
-                result = conn.execute(query_hoy)
-                total_hoy = result.fetchone()[0]
-                
-                return df_espera, df_proximos, total_hoy
-                
-        except Exception as e:
-            st.error(f"❌ Error obteniendo estadísticas: {e}")
-            return pd.DataFrame(), pd.DataFrame(), 0
-    return pd.DataFrame(), pd.DataFrame(), 0
+    try:
+        return obtener_estadisticas_panel(sede)
+    except Exception as e:
+        log.exception("estadisticas_error")
+        st.error(f"❌ Error obteniendo estadísticas: {e}")
+        return pd.DataFrame(), pd.DataFrame(), 0
 
 # INTERFAZ PRINCIPAL
+sede = seleccionar_sede()
 st.title("🏠 Panel de control - sistema de turnos")
+st.caption(f"🏢 Sede: {sede}")
 st.markdown("---")
 
 # Estadísticas en tiempo real
 st.subheader("📊 Estado Actual del Sistema")
 
-df_espera, df_proximos, total_hoy = obtener_estadisticas()
+df_espera, df_proximos, total_hoy = obtener_estadisticas(sede)
 
 # Métricas principales
 col1, col2 = st.columns(2)
@@ -107,14 +84,7 @@ if engine:
     try:
         with engine.connect() as conn:
             # Consulta simplificada - que pandas maneje el formato de fecha
-            query = text("""
-            SELECT modulo, numero_turno, nombre_usuario, tipo_tramite, taquilla_asignada,
-                   fecha_creacion, estado
-            FROM turnos 
-            ORDER BY fecha_creacion DESC 
-            LIMIT 8
-            """)
-            ultimos_turnos = pd.read_sql(query, conn)
+            ultimos_turnos = pd.read_sql(repo.ULTIMOS_REGISTRADOS, conn, params={"sede": sede})
             
             if not ultimos_turnos.empty:
                 # Formatear la hora con pandas
@@ -142,6 +112,7 @@ if engine:
                 st.info("No hay turnos registrados aún")
                 
     except Exception as e:
+        log.exception("ultimos_turnos_error")
         st.error(f"Error cargando últimos turnos: {e}")
         # Mostrar error detallado para debugging
         st.error(f"Detalle del error: {str(e)}")
@@ -164,11 +135,7 @@ with st.expander("🔧 Herramientas de mantenimiento", expanded=False):
     if engine:
         try:
             with engine.connect() as conn:
-                result = conn.execute(text("""
-                    SELECT modulo, ultimo_turno, fecha_reseteo
-                    FROM contadores_turnos
-                    ORDER BY modulo
-                """))
+                result = conn.execute(repo.LISTAR_CONTADORES, {"sede": sede})
                 contadores = result.fetchall()
                 
                 # Mostrar en columnas
@@ -179,8 +146,75 @@ with st.expander("🔧 Herramientas de mantenimiento", expanded=False):
                         st.metric(f"Módulo {modulo}", f"{proximo:03d}")
                         st.caption(f"Último: {ultimo_turno:03d}")
         except Exception as e:
+            log.exception("contadores_error")
             st.error(f"Error cargando contadores: {e}")
     
+    st.subheader("🧭 Módulos por taquilla:", divider=True)
+
+    # Sin rutas una taquilla llama el turno más antiguo de cualquier módulo; con rutas
+    # solo los de sus módulos, repartidos según el peso
+    rutas = listar_rutas(sede)
+    if rutas:
+        df_rutas = pd.DataFrame(rutas, columns=['Taquilla', 'Módulo', 'Peso', 'Llamados hoy'])
+        st.dataframe(df_rutas, width='stretch', hide_index=True)
+    else:
+        st.info("Todas las taquillas atienden todos los módulos")
+
+    taquilla_ruta = st.selectbox("Taquilla", get_taquillas_disponibles(), key="ruta_taquilla")
+    actuales = {ruta[1]: ruta[2] for ruta in rutas if ruta[0] == taquilla_ruta}
+    cols_peso = st.columns(len(MODULOS_CONFIG))
+    pesos = {}
+    for idx, (modulo, nombre_modulo) in enumerate(MODULOS_CONFIG.items()):
+        with cols_peso[idx]:
+            pesos[modulo] = st.number_input(
+                f"Peso {modulo}", min_value=0, max_value=10, value=int(actuales.get(modulo, 0)),
+                key=f"peso_{taquilla_ruta}_{modulo}", help=f"{nombre_modulo}. 0 = no lo atiende"
+            )
+    if st.button("💾 Guardar módulos de la taquilla", key="btn_rutas", type="secondary"):
+        if guardar_rutas_taquilla(taquilla_ruta, pesos, sede):
+            st.success(f"✅ Módulos de {taquilla_ruta} actualizados")
+            st.rerun()
+        else:
+            st.error("❌ No se pudieron guardar los módulos")
+
+    st.subheader("🔌 Conexiones a base de datos:", divider=True)
+
+    # Pools compartidos por todas las sesiones de este proceso
+    pools = estadisticas_pools()
+    if pools:
+        cols_pool = st.columns(len(pools))
+        for idx, (nombre, datos) in enumerate(pools.items()):
+            with cols_pool[idx]:
+                st.metric(f"BD {nombre}", f"{datos['en_uso']}/{datos['tamano']}")
+                st.caption(
+                    f"Overflow: {datos['overflow']} | Libres: {datos['disponibles']} | "
+                    f"Espera prom.: {datos.get('espera_promedio_ms', 0)} ms | "
+                    f"Espera máx.: {datos.get('espera_max_ms', 0)} ms"
+                )
+
+    st.subheader("📈 Tiempos por operación:", divider=True)
+
+    # Métricas de este proceso (el worker aparte expone las suyas en METRICAS_PUERTO)
+    duraciones = OPERACION_SEGUNDOS.resumen()
+    sentencias = OPERACION_SENTENCIAS.resumen()
+    if duraciones:
+        filas = []
+        for clave, (total, promedio) in sorted(duraciones.items()):
+            filas.append({
+                'Operación': dict(clave)['operacion'],
+                'Ejecuciones': total,
+                'Promedio (ms)': round(promedio * 1000, 1),
+                'Sentencias prom.': round(sentencias.get(clave, (0, 0.0))[1], 1)
+            })
+        st.dataframe(pd.DataFrame(filas), width='stretch', hide_index=True)
+    else:
+        st.info("Aún no hay operaciones medidas en este proceso")
+
+    if st.toggle("Ver métricas en formato Prometheus", key="ver_prometheus"):
+        metricas = texto_prometheus()
+        st.code(metricas, language=None)
+        st.download_button("⬇️ Descargar métricas", metricas, file_name="metrics.txt", mime="text/plain")
+
     st.divider()
 
     confirmacion = st.checkbox(
@@ -190,7 +224,7 @@ with st.expander("🔧 Herramientas de mantenimiento", expanded=False):
 
     if confirmacion:
         if st.button("🚀 Resetear contadores", key="btn_reset", type="secondary"):
-            if resetear_contadores_turnos():
+            if resetear_contadores_turnos(sede=sede):
                 st.success("✅ ✅ CONTADORES RESETEADOS A CERO")
                 st.info("💡 Los próximos turnos asignados serán 001, 002, 003...")
                 st.info("📋 Todos los registros de turnos se conservaron en el histórico")
@@ -201,4 +235,15 @@ with st.expander("🔧 Herramientas de mantenimiento", expanded=False):
             else:
                 st.error("❌ Error durante el reseteo")
 
-    st.divider()
\ No newline at end of file
+    st.divider()
+
+    st.info("🔢 **Reparar estadísticas** - Recalcula los conteos por estado desde la tabla de turnos")
+    if st.button("🔧 Reparar conteos de hoy", key="btn_reparar_conteos", type="secondary"):
+        diferencias = reconstruir_contadores_estado(datetime.now().date())
+        if diferencias is None:
+            st.error("❌ Error reparando los conteos")
+        elif diferencias:
+            st.warning(f"⚠️ Se corrigieron {len(diferencias)} conteos")
+            st.rerun()
+        else:
+            st.success("✅ Los conteos ya coincidían con la tabla de turnos")
@@ -1,9 +1,10 @@
 import streamlit as st
-import pandas as pd
 import time
-from config.database import get_db_engine
-from utils.helpers import setup_page_config
-from sqlalchemy import text
+from config.vistas import EstadoPantalla, actualizar_pantalla
+from config.sounds import play_call_turn_sound
+from config.registro import obtener_logger
+from config.metricas import iniciar_servidor_metricas
+from utils.helpers import setup_page_config, seleccionar_sede
 
 # Configuración especial para pantalla TV
 st.set_page_config(
@@ -12,97 +13,6 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-def obtener_turnos_llamando():
-    """Obtiene los últimos 10 turnos llamados (incluye atendidos recientemente)"""
-    engine = get_db_engine()
-    if engine:
-        try:
-            with engine.connect() as conn:
-                query = text("""
-                SELECT modulo, numero_turno, taquilla_asignada, fecha_llamado, estado, nombre_usuario
-                FROM turnos 
-                WHERE estado IN ('llamando', 'atendido')
-                AND fecha_llamado IS NOT NULL
-                ORDER BY fecha_llamado DESC 
-                LIMIT 10
-                """)
-                result = conn.execute(query)
-                turnos = result.fetchall()
-                
-                # Convertir a DataFrame para manejo más fácil
-                if turnos:
-                    df = pd.DataFrame(turnos, columns=['modulo', 'numero_turno', 'taquilla_asignada', 'fecha_llamado', 'estado', 'nombre_usuario'])
-                    return df
-                else:
-                    return pd.DataFrame()
-                    
-        except Exception as e:
-            print(f"Error al obtener turnos llamando: {e}")
-            return pd.DataFrame()
-    return pd.DataFrame()
-
-def obtener_turno_actual():
-    """Obtiene el turno más reciente que fue llamado (aunque ya esté atendido)"""
-    engine = get_db_engine()
-    if engine:
-        try:
-            with engine.connect() as conn:
-                query = text("""
-                SELECT modulo, numero_turno, taquilla_asignada, fecha_llamado, estado, nombre_usuario
-                FROM turnos 
-                WHERE fecha_llamado IS NOT NULL
-                ORDER BY fecha_llamado DESC 
-                LIMIT 1
-                """)
-                result = conn.execute(query)
-                turno = result.fetchone()
-                
-                if turno:
-                    return {
-                        'modulo': turno[0],
-                        'numero_turno': turno[1],
-                        'taquilla_asignada': turno[2],
-                        'fecha_llamado': turno[3],
-                        'estado': turno[4],
-                        'nombre_usuario': turno[5]
-                    }
-                else:
-                    return None
-                    
-        except Exception as e:
-            print(f"Error al obtener turno actual: {e}")
-            return None
-    return None
-
-def obtener_historial_turnos():
-    """Obtiene el historial de turnos (excluyendo el actual) - máximo 4"""
-    engine = get_db_engine()
-    if engine:
-        try:
-            with engine.connect() as conn:
-                query = text("""
-                SELECT modulo, numero_turno, taquilla_asignada, fecha_llamado, estado, nombre_usuario
-                FROM turnos 
-                WHERE fecha_llamado IS NOT NULL
-                AND estado IN ('llamando', 'atendido')
-                ORDER BY fecha_llamado DESC 
-                LIMIT 1, 4  -- Salta el más reciente (actual) y toma los siguientes 4
-                """)
-                result = conn.execute(query)
-                turnos = result.fetchall()
-                
-                # Convertir a DataFrame
-                if turnos:
-                    df = pd.DataFrame(turnos, columns=['modulo', 'numero_turno', 'taquilla_asignada', 'fecha_llamado', 'estado', 'nombre_usuario'])
-                    return df
-                else:
-                    return pd.DataFrame()
-                    
-        except Exception as e:
-            print(f"Error al obtener historial: {e}")
-            return pd.DataFrame()
-    return pd.DataFrame()
-
 # CSS personalizado mejorado - estilo más formal
 st.markdown("""
 <style>
@@ -238,28 +148,12 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def format_hora(fecha_llamado):
-    """Formatea la hora del llamado"""
-    if pd.isna(fecha_llamado) or fecha_llamado is None:
-        return "--:--:--"
-    try:
-        return pd.to_datetime(fecha_llamado).strftime('%H:%M:%S')
-    except:
-        return "--:--:--"
-
-# Contenedor principal
-main_placeholder = st.empty()
-
-# Bucle de actualización automática
-while True:
+def mostrar_tablero(turno_actual, historial_df):
+    """Dibuja el turno actual y el historial en el contenedor principal"""
     with main_placeholder.container():
         # Encabezado principal
         st.markdown('<div class="main-header">TURNOS MEJORES BACHILLERES</div>', unsafe_allow_html=True)
         
-        # Obtener datos
-        turno_actual = obtener_turno_actual()
-        historial_df = obtener_historial_turnos()
-        
         # Crear layout dividido con columnas de Streamlit
         col_left, col_right = st.columns([1, 1], gap="large")
         
@@ -272,16 +166,16 @@ while True:
                 nombre_usuario = turno_actual.get("nombre_usuario", "")
                 if nombre_usuario:
                     # El turno principal en amarillo muestra "A002 - SUSANA LOPEZ"
-                    turno_con_nombre = f"{turno_actual['modulo']}{turno_actual['numero_turno']} - {nombre_usuario}"
+                    turno_con_nombre = f"{turno_actual['turno']} - {nombre_usuario}"
                     st.markdown(f'<div class="current-turno">{turno_con_nombre}</div>', unsafe_allow_html=True)
                 else:
-                    st.markdown(f'<div class="current-turno">{turno_actual["modulo"]}{turno_actual["numero_turno"]}</div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="current-turno">{turno_actual["turno"]}</div>', unsafe_allow_html=True)
                 
                 # Mostrar taquilla
                 st.markdown(f'<div class="taquilla-info">{turno_actual["taquilla_asignada"]}</div>', unsafe_allow_html=True)
                 
                 # HORA DE LLAMADA
-                hora_llamado = format_hora(turno_actual["fecha_llamado"])
+                hora_llamado = turno_actual["hora_llamado"] or "--:--:--"
                 st.markdown(f'''
                 <div class="hora-llamada">
                     <div class="hora-label">Hora de llamado</div>
@@ -309,11 +203,11 @@ while True:
             if not historial_df.empty:
                 # Mostrar historial (máximo 4 turnos)
                 for i, turno in historial_df.iterrows():
-                    hora_llamado = format_hora(turno["fecha_llamado"])
+                    hora_llamado = turno["hora_llamado"] or "--:--:--"
                     nombre_usuario = turno.get("nombre_usuario", "")
                     
                     # TURNO CON NOMBRE CONCATENADO PARA HISTORIAL
-                    turno_con_nombre = f"{turno['modulo']}{turno['numero_turno']} - {nombre_usuario}" if nombre_usuario else f"{turno['modulo']}{turno['numero_turno']}"
+                    turno_con_nombre = f"{turno['turno']} - {nombre_usuario}" if nombre_usuario else turno['turno']
                     
                     st.markdown(f"""
                     <div class="historial-item">
@@ -326,5 +220,31 @@ while True:
                     """, unsafe_allow_html=True)
             else:
                 st.markdown('<div class="empty-state">No hay turnos en el historial</div>', unsafe_allow_html=True)
+
+log = obtener_logger('pantalla')
+iniciar_servidor_metricas()
+
+# Contenedor principal
+main_placeholder = st.empty()
+# Contenedor del sonido, aparte para no redibujar el tablero al reproducirlo
+audio_placeholder = st.empty()
+
+# Bucle de actualización automática: cada ciclo solo lee la versión del tablero
+# de la sede y vuelve a consultar turnos cuando cambió (ver config/vistas.py)
+pantalla = EstadoPantalla(seleccionar_sede())
+while True:
+    hay_cambios, llamado_nuevo = actualizar_pantalla(pantalla)
+    turno_actual = pantalla.turno_actual
+    if hay_cambios:
+        log.debug("tablero_actualizado", sede=pantalla.sede, version=pantalla.version, turno=turno_actual['turno'] if turno_actual else None)
+    
+    # El sonido solo se reproduce cuando llega un llamado nuevo, no al abrir
+    # la pantalla ni cuando el cambio es un turno marcado como atendido
+    if llamado_nuevo:
+        play_call_turn_sound(llamado_nuevo, audio_placeholder)
+    
+    # Sin turno actual se muestra la hora, así que se redibuja cada ciclo
+    if hay_cambios or not turno_actual:
+        mostrar_tablero(turno_actual, pantalla.historial_df)
     
     time.sleep(3)  # Actualizar cada 3 segundos
\ No newline at end of file
@@ -1,273 +1,45 @@
 import streamlit as st
 import pandas as pd
-from config.database import (
-    get_db_engine, obtener_turnos_por_estado, 
-    sincronizar_y_obtener_personas_ordenadas,
-    taquilla_tiene_turno_activo, obtener_turno_activo_taquilla,
-    ya_tiene_turno_pendiente, obtener_siguiente_turno_lote,
-    ya_tiene_turno_pendiente_robusto, limpiar_cache_personas
-)
-from utils.helpers import setup_page_config
-from sqlalchemy import text
+from config.database import get_db_engine, limpiar_cache_turnos_pendientes, obtener_rutas_taquilla
+from config.vistas import cargar_vista_taquilla
+from config import cliente_cola
+from config.worker import iniciar_worker_en_hilo, solicitar_ejecucion, estado_worker
+from config.metricas import iniciar_servidor_metricas
+from utils.helpers import setup_page_config, seleccionar_sede, get_taquillas_disponibles
+from config import repositorio as repo
+from config.registro import obtener_logger
 from datetime import datetime
 
 setup_page_config("Interfaz de Taquillas", "wide")
 
-# Al inicio de la página, después de setup_page_config
-from config.database import verificar_sincronizacion
-verificar_sincronizacion()
+TURNOS_POR_PAGINA = 10
 
-def asignar_turnos_rapido():
-    """Función rápida para asignar turnos - USANDO TABLA DE CONTROL"""
-    from config.database import limpiar_cache_personas
-    
-    # LIMPIAR CACHE ANTES DE ASIGNAR
-    limpiar_cache_personas()
-    
-    # Obtener personas EN ORDEN CORRECTO desde la tabla de control
-    personas = sincronizar_y_obtener_personas_ordenadas()
-    if not personas:
-        print("🔍 No hay personas nuevas para asignar turnos")
-        return 0
-    
-    turnos_asignados = 0
-    engine = get_db_engine()
-    
-    print(f"🔍 Procesando {len(personas)} personas en ORDEN CORRECTO DE LLEGADA")
-    
-    for persona in personas:
-        # Ahora persona[0] es el ID, persona[5] es el documento, persona[6] es el tema_solicitud
-        id_control = persona[0]  # ID de la tabla de control
-        documento = persona[5]   # Documento en posición [5]
-        tema_solicitud = persona[6]  # Tema de solicitud en posición [6]
-        
-        # MANEJO SEGURO DE VALORES NULOS para nombres
-        nombre1 = str(persona[1]) if persona[1] is not None else ''
-        nombre2 = str(persona[2]) if persona[2] is not None else ''
-        apellido1 = str(persona[3]) if persona[3] is not None else ''
-        apellido2 = str(persona[4]) if persona[4] is not None else ''
-        
-        # Limpiar y formatear el nombre
-        nombre1 = nombre1.strip()
-        apellido1 = apellido1.strip()
-        
-        # Construir nombre simple: nombre1 + apellido1
-        nombre_simple = f"{nombre1} {apellido1}".strip()
-        
-        print(f"🔍 Procesando: ID {id_control} - Documento: {documento} - {nombre_simple} - Solicitud: {tema_solicitud}")
-        
-        # VERIFICACIÓN DETALLADA en turnos principales
-        if engine:
-            try:
-                with engine.connect() as conn:
-                    # Consulta COMPLETA de todos los turnos de hoy para esta cédula
-                    result = conn.execute(
-                        text("""
-                        SELECT id, modulo, numero_turno, estado, fecha_creacion 
-                        FROM turnos 
-                        WHERE cedula_usuario = :cedula 
-                        AND DATE(fecha_creacion) = CURDATE()
-                        ORDER BY fecha_creacion DESC
-                        """),
-                        {"cedula": documento}
-                    )
-                    turnos_existentes = result.fetchall()
-                    
-                    if turnos_existentes:
-                        print(f"📋 Turnos existentes para {documento}:")
-                        for turno in turnos_existentes:
-                            print(f"   - {turno[1]}{turno[2]} | Estado: {turno[3]} | Fecha: {turno[4]}")
-                        
-                        # Verificar si hay algún turno NO atendido
-                        turnos_pendientes = [t for t in turnos_existentes if t[3] in ('espera', 'llamando')]
-                        if turnos_pendientes:
-                            print(f"⏭️ Saltando {documento} - tiene {len(turnos_pendientes)} turno(s) pendiente(s)")
-                            
-                            # Marcar como procesado en control (pero sin asignar turno)
-                            conn.execute(
-                                text("""
-                                UPDATE control_turnos_externos 
-                                SET procesado = TRUE 
-                                WHERE id = :id_control  -- Usar ID específico en lugar de documento
-                                """),
-                                {"id_control": id_control}
-                            )
-                            conn.commit()
-                            continue
-                        else:
-                            print(f"✅ {documento} - Todos los turnos están atendidos, puede recibir nuevo turno")
-                    else:
-                        print(f"✅ {documento} - No tiene turnos hoy, puede recibir primer turno")
-                        
-            except Exception as e:
-                print(f"❌ Error verificando turnos para {documento}: {e}")
-                continue
-        
-        # Si llegamos aquí, puede asignar turno
-        # DETERMINAR MÓDULO SEGÚN TEMA DE SOLICITUD
-        if tema_solicitud == 'Legalización fondo':
-            modulo = 'P'
-        else:  # 'Inscripción convocatoria' o cualquier otro
-            modulo = 'A'
-            
-        siguiente_numero = obtener_siguiente_turno_lote(modulo)
-        turno_formateado = f"{siguiente_numero:03d}"
-        turno_completo = f"{modulo}{turno_formateado}"
-        
-        if engine:
-            try:
-                with engine.connect() as conn:
-                    # VERIFICACIÓN FINAL EN TRANSACCIÓN
-                    result = conn.execute(
-                        text("""
-                        SELECT COUNT(*) FROM turnos 
-                        WHERE cedula_usuario = :cedula 
-                        AND estado IN ('espera', 'llamando')
-                        AND DATE(fecha_creacion) = CURDATE()
-                        """),
-                        {"cedula": documento}
-                    )
-                    count_pendientes = result.fetchone()[0]
-                    
-                    if count_pendientes > 0:
-                        print(f"🚫 TRANSACCIÓN BLOQUEADA: {documento} tiene {count_pendientes} turno(s) pendiente(s)")
-                        
-                        # Marcar como procesado en control
-                        conn.execute(
-                            text("""
-                            UPDATE control_turnos_externos 
-                            SET procesado = TRUE 
-                            WHERE id = :id_control  -- Usar ID específico
-                            """),
-                            {"id_control": id_control}
-                        )
-                        conn.commit()
-                        continue
-                    
-                    print(f"🎫 ASIGNANDO NUEVO TURNO: {turno_completo} para {documento} (ID: {id_control}) - {tema_solicitud}")
-                    
-                    # Insertar en tabla principal de turnos
-                    conn.execute(
-                        text("""
-                        INSERT INTO turnos 
-                        (modulo, numero_turno, estado, nombre_usuario, cedula_usuario, tipo_tramite) 
-                        VALUES (:modulo, :numero_turno, 'espera', :nombre, :cedula, :tramite)
-                        """),
-                        {
-                            "modulo": modulo, 
-                            "numero_turno": turno_formateado,
-                            "nombre": nombre_simple,
-                            "cedula": documento, 
-                            "tramite": tema_solicitud  # Usar el tema de solicitud real
-                        }
-                    )
-                    
-                    # Marcar como procesado en tabla de control
-                    conn.execute(
-                        text("""
-                        UPDATE control_turnos_externos 
-                        SET procesado = TRUE, turno_asignado = :turno, fecha_procesado = NOW()
-                        WHERE id = :id_control  -- Usar ID específico
-                        """),
-                        {"id_control": id_control, "turno": turno_completo}
-                    )
-                    
-                    conn.commit()
-                    turnos_asignados += 1
-                    print(f"✅✅✅ TURNO ASIGNADO EXITOSAMENTE: {turno_completo} para {documento} ({tema_solicitud})")
-                    
-            except Exception as e:
-                print(f"❌ Error asignando turno para {documento}: {e}")
-    
-    print(f"📊 RESUMEN: {turnos_asignados} turnos asignados en esta ejecución")
-    return turnos_asignados
+log = obtener_logger('taquillas')
 
-def llamar_siguiente_turno_con_actualizacion(taquilla):
-    """Función que actualiza la lista automáticamente antes de llamar el siguiente turno"""
+def llamar_siguiente_turno_con_actualizacion(taquilla, sede):
+    """Llama el siguiente turno; la asignación la hace el worker en segundo plano"""
     
-    # Primero actualizar la lista de turnos (con el orden corregido)
-    with st.spinner("🔄 Actualizando lista de turnos..."):
-        turnos_asignados = asignar_turnos_rapido()
-        if turnos_asignados > 0:
-            st.toast(f'✅ {turnos_asignados} nuevos turnos asignados', icon='✅')
-    
-    # Luego proceder a llamar el siguiente turno
-    if taquilla_tiene_turno_activo(taquilla):
-        return None, None, "❌ Ya tienes un turno en atención. Termina el actual primero."
-    
-    engine = get_db_engine()
-    if not engine:
-        return None, None, "❌ Error de conexión a la base de datos"
+    # Pedir al worker un ciclo adelantado sin esperar a que termine
+    solicitar_ejecucion()
     
-    try:
-        with engine.connect() as conn:
-            # Asegurarse de tomar el turno más antiguo (que llegó primero)
-            result = conn.execute(
-                text("""
-                SELECT id, modulo, numero_turno, nombre_usuario, tipo_tramite 
-                FROM turnos 
-                WHERE estado = 'espera' 
-                ORDER BY fecha_creacion ASC  -- ¡IMPORTANTE! Tomar el más antiguo primero
-                LIMIT 1
-                """)
-            )
-            turno = result.fetchone()
-            
-            if turno:
-                conn.execute(
-                    text("""
-                    UPDATE turnos 
-                    SET estado = 'llamando', taquilla_asignada = :taquilla, fecha_llamado = NOW() 
-                    WHERE id = :id
-                    """),
-                    {"taquilla": taquilla.strip(), "id": turno[0]}
-                )
-                conn.commit()
-                
-                turno_info = f"{turno[1]}{turno[2]}"
-                print(f"📢 Taquilla {taquilla} llamando turno: {turno_info} (más antiguo)")
-                return turno_info, turno[0], f"✅ Turno {turno_info} asignado a {taquilla}"
-            else:
-                print(f"ℹ️ Taquilla {taquilla}: No hay turnos en espera")
-                return None, None, "ℹ️ No hay turnos en espera"
-                
-    except Exception as e:
-        print(f"❌ Error al llamar turno en taquilla {taquilla}: {e}")
-        return None, None, f"❌ Error al llamar turno: {e}"
+    # Reclamar el turno más antiguo de la sede de forma atómica (ver llamar_siguiente_turno),
+    # a través del motor de cola si está activo
+    return cliente_cola.llamar(taquilla, sede)
 
 def marcar_como_atendido(turno_id):
-    """Función optimizada"""
-    engine = get_db_engine()
-    if not engine:
-        return False
-    
+    """Marca el turno como atendido (ver marcar_turno_atendido)"""
     try:
-        with engine.connect() as conn:
-            # Obtener información del turno antes de marcarlo como atendido
-            result = conn.execute(
-                text("SELECT modulo, numero_turno, taquilla_asignada, cedula_usuario FROM turnos WHERE id = :id"),
-                {"id": int(turno_id)}
-            )
-            turno_info = result.fetchone()
-            
-            conn.execute(
-                text("UPDATE turnos SET estado = 'atendido' WHERE id = :id"),
-                {"id": int(turno_id)}
-            )
-            conn.commit()
-            
-            if turno_info:
-                print(f"✅ Turno {turno_info[0]}{turno_info[1]} marcado como atendido en {turno_info[2]}")
-                # LIMPIAR CACHE DE LA CÉDULA PARA EVITAR DUPLICADOS
-                from config.database import limpiar_cache_turnos_pendientes
-                if turno_info[3]:  # cedula_usuario
-                    limpiar_cache_turnos_pendientes(turno_info[3])
-            return True
+        exito, turno_info = cliente_cola.atender(turno_id)
+        if turno_info and turno_info[3]:  # cedula_usuario
+            # LIMPIAR CACHE DE LA CÉDULA PARA EVITAR DUPLICADOS
+            limpiar_cache_turnos_pendientes(turno_info[3])
+        return exito
     except Exception as e:
+        log.exception("marcar_atendido_error", turno_id=turno_id)
         st.error(f"❌ Error al marcar como atendido: {e}")
         return False
 
-def obtener_turnos_activos(taquilla):
+def obtener_turnos_activos(taquilla, sede):
     """Función optimizada"""
     engine = get_db_engine()
     if not engine:
@@ -275,14 +47,7 @@ def obtener_turnos_activos(taquilla):
     
     try:
         with engine.connect() as conn:
-            query = text("""
-            SELECT id, modulo, numero_turno, estado, nombre_usuario, tipo_tramite, fecha_llamado
-            FROM turnos 
-            WHERE taquilla_asignada = :taquilla AND estado != 'atendido' 
-            ORDER BY fecha_llamado DESC
-            """)
-            
-            df = pd.read_sql(query, conn, params={"taquilla": taquilla})
+            df = pd.read_sql(repo.TURNOS_NO_ATENDIDOS_TAQUILLA, conn, params={"sede": sede, "taquilla": taquilla})
             
             if not df.empty and 'fecha_llamado' in df.columns:
                 df['hora_llamado'] = pd.to_datetime(df['fecha_llamado']).dt.strftime('%H:%M:%S')
@@ -292,54 +57,49 @@ def obtener_turnos_activos(taquilla):
             return df
             
     except Exception as e:
+        log.exception("turnos_activos_error", taquilla=taquilla)
         st.error(f"❌ Error al obtener turnos activos: {e}")
         return pd.DataFrame()
 
 # INTERFAZ PRINCIPAL MEJORADA
 st.title("🖥️ Gestión por Taquilla")
 
-# EJECUCIÓN AUTOMÁTICA AL CARGAR LA PÁGINA (solo primera vez) - MEJORADA
-if 'auto_assigned' not in st.session_state:
-    # Mostrar progreso mientras se asignan turnos
-    with st.status("🔄 Inicializando sistema de turnos...", expanded=True) as status:
-        st.write("📋 Verificando conexión a base de datos...")
-        engine = get_db_engine()
-        if engine:
-            st.write("✅ Conexión establecida")
-        else:
-            st.error("❌ Error de conexión")
-        
-        st.write("👥 Sincronizando con lista externa...")
-        personas = sincronizar_y_obtener_personas_ordenadas()
-        st.write(f"📊 {len(personas)} personas encontradas en la lista")
-        
-        st.write("🎫 Asignando turnos automáticamente...")
-        turnos_iniciales = asignar_turnos_rapido()
-        
-        if turnos_iniciales > 0:
-            status.update(label=f"✅ {turnos_iniciales} turnos asignados automáticamente", state="complete")
-            st.toast(f'✅ {turnos_iniciales} turnos asignados automáticamente', icon='✅')
-        else:
-            status.update(label="✅ Sistema listo - No hay nuevos turnos para asignar", state="complete")
-    
-    st.session_state.auto_assigned = True
+# La sincronización y asignación corren en el worker, no en cada render
+iniciar_worker_en_hilo()
+iniciar_servidor_metricas()
+worker = estado_worker()
+if worker['ultima_ejecucion']:
+    segundos = int((datetime.now() - worker['ultima_ejecucion']).total_seconds())
+    st.caption(f"🔄 Última sincronización hace {segundos}s")
+if worker['ultimo_error']:
+    st.warning(f"⚠️ El worker de turnos está fallando ({worker['fallos_consecutivos']} intentos): {worker['ultimo_error']}")
 
 st.markdown("---")
 
-# Selección de taquilla
-taquilla = st.selectbox(
-    "Selecciona tu taquilla",
-    ["Taquilla 1", "Taquilla 2", "Taquilla 3", "Taquilla 4", "Taquilla 5", "Taquilla 6", "Taquilla 7", "Taquilla 8"]
-)
+# Selección de sede y taquilla (los nombres de taquilla se repiten en cada sede)
+sede = seleccionar_sede()
+taquilla = st.selectbox("Selecciona tu taquilla", get_taquillas_disponibles())
+
+# Módulos que atiende la taquilla (se configuran en el Panel de Control)
+rutas = obtener_rutas_taquilla(taquilla, sede)
+if rutas:
+    st.caption("🧭 Atiende los módulos " + ", ".join(f"{modulo} (peso {peso})" for modulo, peso, _ in rutas))
 
 st.markdown("---")
 
 # SECCIÓN: Estado Actual de la Taquilla
-st.subheader(f"📊 Estado de {taquilla}")
+st.subheader(f"📊 Estado de {taquilla} ({sede})")
+
+# Página actual de la cola: None es el inicio; si no, la clave del último turno visto.
+# Al cambiar de sede se vuelve al inicio de su cola.
+if 'cola_paginas' not in st.session_state or st.session_state.get('cola_sede') != sede:
+    st.session_state.cola_paginas = [None]
+    st.session_state.cola_sede = sede
 
-# Verificar estado de la taquilla
-taquilla_ocupada = taquilla_tiene_turno_activo(taquilla)
-turno_activo = obtener_turno_activo_taquilla(taquilla)
+# Estado de la taquilla y una página de la cola (conteos calculados en SQL)
+vista = cargar_vista_taquilla(taquilla, st.session_state.cola_paginas[-1], TURNOS_POR_PAGINA, sede)
+taquilla_ocupada = vista['ocupada']
+turno_activo = vista['turno_activo']
 
 col1, col2 = st.columns(2)
 
@@ -360,20 +120,16 @@ with col2:
 
 st.markdown("---")
 
-# Obtener estado actual de turnos
-personas_sin_turno = sincronizar_y_obtener_personas_ordenadas()
-turnos_por_estado = obtener_turnos_por_estado()
-
-# Separar turnos por estado
-turnos_llamando = [t for t in turnos_por_estado if t[6] == 'llamando']
-turnos_espera = [t for t in turnos_por_estado if t[6] == 'espera']
+cola = vista['cola']
+turnos_llamando = cola['llamando']
+turnos_espera = cola['espera']
 
 # Mostrar estadísticas rápidas
 col_stat1, col_stat2, col_stat3 = st.columns(3)
 with col_stat1:
-    st.metric("⏳ Turnos en espera", len(turnos_espera))
+    st.metric("⏳ Turnos en espera", cola['conteos'].get('espera', 0))
 with col_stat2:
-    st.metric("📢 Turnos en atención", len(turnos_llamando))
+    st.metric("📢 Turnos en atención", cola['conteos'].get('llamando', 0))
     
 
 st.markdown("---")
@@ -413,8 +169,11 @@ st.markdown("---")
 if turnos_espera:
     st.subheader("⏳ Turnos en Espera")
     
-    # Mostrar máximo 10 turnos en espera
-    for i, turno in enumerate(turnos_espera[:10]):
+    pagina = len(st.session_state.cola_paginas)
+    if pagina > 1:
+        st.caption(f"Página {pagina} de la cola")
+    
+    for i, turno in enumerate(turnos_espera):
         col1, col2, col3 = st.columns([1, 3, 3])
         with col1:
             st.write(f"**{turno[1]}{turno[2]}**")
@@ -423,8 +182,19 @@ if turnos_espera:
         with col3:
             st.write(turno[5])  # trámite
     
-    if len(turnos_espera) > 10:
-        st.info(f"... y {len(turnos_espera) - 10} turnos más en espera")
+    col_pag1, col_pag2 = st.columns(2)
+    with col_pag1:
+        if pagina > 1 and st.button("⏮️ Volver al inicio de la cola", width='stretch'):
+            st.session_state.cola_paginas = [None]
+            st.rerun()
+    with col_pag2:
+        if cola['siguiente'] and st.button(f"⏬ Ver siguientes {TURNOS_POR_PAGINA}", width='stretch'):
+            st.session_state.cola_paginas.append(cola['siguiente'])
+            st.rerun()
+elif len(st.session_state.cola_paginas) > 1:
+    # La página pedida se vació (los turnos ya se llamaron): volver al inicio
+    st.session_state.cola_paginas = [None]
+    st.rerun()
 else:
     st.info("ℹ️ No hay turnos en espera")
 
@@ -463,26 +233,14 @@ else:
     with col1:
         if st.button("📢 Llamar Siguiente Turno", width='stretch', type="primary"):
             # Esta función ahora incluye actualización automática
-            turno_llamado, turno_id, mensaje = llamar_siguiente_turno_con_actualizacion(taquilla)
+            turno_llamado, turno_id, mensaje, usuario, tramite = llamar_siguiente_turno_con_actualizacion(taquilla, sede)
             
             if turno_llamado:
                 st.success(mensaje)
                 st.toast('✅ Turno asignado correctamente', icon='✅')
                 
                 # Mostrar información del usuario llamado
-                engine = get_db_engine()
-                if engine:
-                    try:
-                        with engine.connect() as conn:
-                            result = conn.execute(
-                                text("SELECT nombre_usuario, tipo_tramite FROM turnos WHERE id = :id"),
-                                {"id": turno_id}
-                            )
-                            usuario_info = result.fetchone()
-                            if usuario_info:
-                                st.info(f"**Usuario:** {usuario_info[0]} | **Trámite:** {usuario_info[1]}")
-                    except Exception as e:
-                        st.error(f"Error obteniendo información: {e}")
+                st.info(f"**Usuario:** {usuario} | **Trámite:** {tramite}")
                 
                 # Actualizar inmediatamente
                 st.rerun()
@@ -498,16 +256,11 @@ st.subheader("🔄 Forzar actualización de listado")
 
 col1, col2 = st.columns(2)
 with col1:
-    if st.button("🔄 Actualizar Lista de Turnos", type="secondary", use_container_width=True):
-        with st.spinner("Actualizando lista de turnos..."):
-            turnos_asignados = asignar_turnos_rapido()
-            if turnos_asignados > 0:
-                st.success(f"✅ {turnos_asignados} nuevos turnos asignados")
-            else:
-                st.info("ℹ️ No hay nuevos turnos para asignar")
-            st.rerun()
+    if st.button("🔄 Actualizar Lista de Turnos", width='stretch', type="secondary"):
+        solicitar_ejecucion()
+        st.info("ℹ️ Sincronización solicitada; los nuevos turnos aparecerán en unos segundos")
 
 # Información adicional
 st.markdown("---")
 st.caption("💡 **Sistema de taquilla única**: Cada taquilla solo puede atender un turno a la vez. Debes finalizar la atención actual antes de llamar al siguiente turno.")
-st.caption("🔄 **Actualización automática**: La lista de turnos se actualiza automáticamente al llamar un nuevo turno.")
\ No newline at end of file
+st.caption("🔄 **Actualización automática**: La lista de turnos se sincroniza en segundo plano cada pocos segundos.")
\ No newline at end of file
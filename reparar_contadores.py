@@ -0,0 +1,31 @@
+"""
+Script para verificar y reconstruir los conteos por estado (contadores_estado)
+Uso: python reparar_contadores.py [--dia 2025-01-31] [--verificar]
+Recalcula desde la tabla turnos los conteos por (sede, día, módulo, estado) que leen
+los tableros. Sin --dia recorre todo el histórico: usar en horario de baja carga.
+"""
+
+import sys
+import argparse
+from config.database import reconstruir_contadores_estado
+from config.conexiones import cerrar_engines
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstrucción de contadores_estado desde turnos")
+    parser.add_argument("--dia", help="Día a reparar (YYYY-MM-DD); por defecto todo el histórico")
+    parser.add_argument("--verificar", action="store_true", help="Solo muestra las diferencias, no modifica")
+    args = parser.parse_args()
+
+    diferencias = reconstruir_contadores_estado(args.dia, solo_verificar=args.verificar)
+    cerrar_engines()
+
+    if diferencias is None:
+        sys.exit(1)
+    for sede, dia, modulo, estado, contador, real in diferencias:
+        print(f"   {sede} {dia} {modulo} {estado}: contador {contador} / real {real}")
+    if not diferencias:
+        print("✅ Los contadores coinciden con la tabla de turnos")
+    elif args.verificar:
+        sys.exit(1)
+    else:
+        print("✅ Contadores reconstruidos")
@@ -1,37 +1,42 @@
 """
 Script para resetear los contadores de turnos a cero
-Uso: python reset_turnos.py
+Uso: python reset_turnos.py  (contadores de la sede SEDE)
 Nota: Solo resetea el contador, NO elimina registros de turnos
 Los contadores quedan en cero y continúan desde ahí (001, 002, 003...)
 """
 
-from config.database import get_db_engine, resetear_contadores_turnos, inicializar_contadores_turnos, Session, ContadorTurnos
-from sqlalchemy import text
+from config.database import SEDE, get_db_engine, resetear_contadores_turnos, inicializar_contadores_turnos
+from config.conexiones import cerrar_engines
+from config import repositorio as repo
 from datetime import datetime
 
 def visualizar_estado_actual():
     """Muestra el estado actual de los contadores"""
+    engine = get_db_engine()
+    if not engine:
+        print("❌ No hay conexión a la base de datos")
+        return False
+
     try:
-        session = Session()
-        contadores = session.query(ContadorTurnos).all()
+        with engine.connect() as conn:
+            result = conn.execute(repo.LISTAR_CONTADORES, {"sede": SEDE})
+            contadores = result.fetchall()
 
-        print("\n📊 ESTADO ACTUAL DE LOS CONTADORES:")
+        print(f"\n📊 ESTADO ACTUAL DE LOS CONTADORES (sede {SEDE}):")
         print("-" * 40)
 
         if not contadores:
             print("❌ No hay contadores inicializados")
             return False
 
-        for contador in contadores:
-            print(f"📋 Módulo {contador.modulo}: {contador.ultimo_turno:03d}")
+        for modulo, ultimo_turno, _ in contadores:
+            print(f"📋 Módulo {modulo}: {ultimo_turno:03d}")
 
         return True
 
     except Exception as e:
         print(f"❌ Error al visualizar estado: {e}")
         return False
-    finally:
-        session.close()
 
 if __name__ == "__main__":
     print("\n" + "="*70)
@@ -71,4 +76,6 @@ if __name__ == "__main__":
     elif opcion == "2":
         print("❌ Saliendo sin cambios...")
     else:
-        print("❌ Opción inválida")
\ No newline at end of file
+        print("❌ Opción inválida")
+
+    cerrar_engines()
@@ -0,0 +1,289 @@
+"""
+Simulador de eventos discretos de un día de atención
+Uso: python simulador_carga.py [--horas 9] [--escala 1] [--taquillas 8] [--pantallas 4]
+                               [--servicio-min 4] [--distribucion lognormal]
+                               [--curva "8:60,9:150,..."] [--salida simulacion_resultados.json]
+Reproduce sobre una base SQLite temporal una curva de llegadas de registros
+externos (Poisson por hora), el worker de asignación, N taquillas que llaman y
+atienden con tiempos de servicio aleatorios y M pantallas consultando el
+tablero. Cada evento llama las funciones reales (config/database.py,
+config/worker.py, config/vistas.py) en un reloj simulado.
+Reporta p50/p95/p99 por operación, sentencias por segundo simulado, largo de la
+cola en el tiempo, espera de los ciudadanos y la utilización: la fracción del
+día que el proceso estaría ocupado ejecutando operaciones (Python y SQL). Si se
+acerca a 1, un contenedor no alcanza. Los eventos se ejecutan uno a la vez: las
+latencias son sin contención y la escala máxima es una extrapolación lineal,
+así que conviene confirmarla corriendo con --escala cerca de ese valor.
+"""
+
+import os
+import sys
+import json
+import math
+import heapq
+import random
+import shutil
+import argparse
+import tempfile
+import time
+
+# Llegadas por hora de un día de convocatoria (hora:llegadas)
+CURVA_POR_DEFECTO = "8:60,9:150,10:220,11:180,12:90,13:80,14:160,15:140,16:70"
+
+INTERVALO_PANTALLA = 3      # segundos entre consultas de cada pantalla (como la página)
+REINTENTO_TAQUILLA = 20     # segundos antes de volver a llamar si no había turnos
+PAUSA_TAQUILLA = 10         # segundos entre atender y llamar al siguiente
+MUESTREO_COLA = 60          # segundos entre muestras del largo de la cola
+
+
+def _percentil(valores, porcentaje):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(len(ordenados) * porcentaje / 100) - 1)
+    return ordenados[indice]
+
+
+def leer_curva(texto):
+    """'8:60,9:150' -> [(8, 60.0), (9, 150.0)]"""
+    curva = []
+    for tramo in texto.split(','):
+        hora, llegadas = tramo.split(':')
+        curva.append((int(hora), float(llegadas)))
+    return sorted(curva)
+
+
+def generar_llegadas(curva, escala, horas, azar):
+    """Segundos simulados (desde la primera hora de la curva) de cada llegada, Poisson por hora"""
+    inicio = curva[0][0]
+    llegadas = []
+    for hora, por_hora in curva:
+        desde = (hora - inicio) * 3600
+        if desde >= horas * 3600 or por_hora <= 0:
+            continue
+        tasa = por_hora * escala / 3600
+        t = desde + azar.expovariate(tasa)
+        while t < min(desde + 3600, horas * 3600):
+            llegadas.append(t)
+            t += azar.expovariate(tasa)
+    return llegadas
+
+
+def tiempo_servicio(distribucion, media_min, azar):
+    """Segundos de atención de un turno"""
+    media = media_min * 60
+    if distribucion == 'fija':
+        return media
+    if distribucion == 'exponencial':
+        return azar.expovariate(1 / media)
+    # lognormal con desviación igual a la mitad de la media
+    sigma = math.sqrt(math.log(1 + 0.25))
+    return azar.lognormvariate(math.log(media) - sigma ** 2 / 2, sigma)
+
+
+class Registro:
+    """Latencia real y sentencias de cada operación ejecutada en la simulación"""
+
+    def __init__(self):
+        self.operaciones = {}
+
+    def medir(self, operacion, funcion, *args):
+        from config.metricas import medir
+
+        with medir(f"simulacion_{operacion}") as medicion:
+            inicio = time.perf_counter()
+            resultado = funcion(*args)
+            segundos = time.perf_counter() - inicio
+        self.operaciones.setdefault(operacion, []).append((segundos, medicion.sentencias))
+        return resultado
+
+    def resumen(self):
+        resultados = {}
+        for operacion, ejecuciones in sorted(self.operaciones.items()):
+            tiempos = [segundos * 1000 for segundos, _ in ejecuciones]
+            resultados[operacion] = {
+                'ejecuciones': len(ejecuciones),
+                'ms_p50': round(_percentil(tiempos, 50), 3),
+                'ms_p95': round(_percentil(tiempos, 95), 3),
+                'ms_p99': round(_percentil(tiempos, 99), 3),
+                'segundos_total': round(sum(tiempos) / 1000, 3),
+                'sentencias': sum(sentencias for _, sentencias in ejecuciones),
+            }
+        return resultados
+
+
+def simular(args):
+    """Corre el día simulado y devuelve el diccionario de resultados"""
+    from config.database import (
+        SEDE, get_db_engine, get_external_db_engine, inicializar_contadores_turnos,
+        llamar_siguiente_turno, marcar_turno_atendido
+    )
+    from config.base_local import preparar_base_local, sembrar_historico, registrar_externos
+    from config.worker import ejecutar_ciclo, WORKER_INTERVALO
+    from config.vistas import EstadoPantalla, actualizar_pantalla, cargar_vista_taquilla
+    from config import repositorio as repo
+
+    azar = random.Random(args.semilla)
+    engine = get_db_engine()
+    engine_ext = get_external_db_engine()
+    print(f"🌱 Preparando base con {args.historico} turnos históricos...")
+    preparar_base_local(engine, engine_ext)
+    inicializar_contadores_turnos()
+    sembrar_historico(engine, args.historico, semilla=args.semilla)
+
+    curva = leer_curva(args.curva)
+    fin = args.horas * 3600
+    llegadas = generar_llegadas(curva, args.escala, args.horas, azar)
+    print(f"🚶 {len(llegadas)} llegadas en {args.horas} h, {args.taquillas} taquillas, {args.pantallas} pantallas")
+
+    registro = Registro()
+    eventos = []
+    secuencia = 0
+
+    def programar(t, tipo, dato=None):
+        nonlocal secuencia
+        if t <= fin:
+            heapq.heappush(eventos, (t, secuencia, tipo, dato))
+            secuencia += 1
+
+    llegada_por_documento = {}
+    llamado_por_turno = {}
+    esperas = []
+    muestras = []
+    atendidos = 0
+
+    for numero, t in enumerate(llegadas):
+        programar(t, 'llegada', numero)
+    intervalo_worker = args.intervalo_worker or WORKER_INTERVALO
+    programar(azar.uniform(0, intervalo_worker), 'worker')
+    for i in range(1, args.taquillas + 1):
+        programar(azar.uniform(0, PAUSA_TAQUILLA), 'llamar', f"Taquilla {i}")
+    pantallas = [EstadoPantalla() for _ in range(args.pantallas)]
+    for j in range(args.pantallas):
+        programar(azar.uniform(0, INTERVALO_PANTALLA), 'pantalla', j)
+    programar(0, 'muestra')
+
+    inicio_real = time.perf_counter()
+    while eventos:
+        t, _, tipo, dato = heapq.heappop(eventos)
+
+        if tipo == 'llegada':
+            # El registro telefónico ocurre en el sistema externo: no se mide
+            documento = registrar_externos(engine_ext, 1, prefijo='SIM-', inicio=dato, semilla=dato)[0]
+            llegada_por_documento[documento] = t
+
+        elif tipo == 'worker':
+            registro.medir('ciclo_worker', ejecutar_ciclo)
+            programar(t + intervalo_worker, 'worker')
+
+        elif tipo == 'llamar':
+            _, turno_id, _, _, _ = registro.medir('llamar', llamar_siguiente_turno, dato)
+            registro.medir('vista_taquilla', cargar_vista_taquilla, dato)
+            if turno_id is None:
+                programar(t + REINTENTO_TAQUILLA, 'llamar', dato)
+            else:
+                llamado_por_turno[turno_id] = t
+                programar(t + tiempo_servicio(args.distribucion, args.servicio_min, azar), 'atender', (dato, turno_id))
+
+        elif tipo == 'atender':
+            taquilla, turno_id = dato
+            exito, turno = registro.medir('atender', marcar_turno_atendido, turno_id)
+            registro.medir('vista_taquilla', cargar_vista_taquilla, taquilla)
+            if exito and turno:
+                atendidos += 1
+                llegada = llegada_por_documento.get(turno[3])
+                if llegada is not None:
+                    esperas.append((llamado_por_turno.pop(turno_id) - llegada) / 60)
+            programar(t + PAUSA_TAQUILLA, 'llamar', taquilla)
+
+        elif tipo == 'pantalla':
+            registro.medir('pantalla', actualizar_pantalla, pantallas[dato])
+            programar(t + INTERVALO_PANTALLA, 'pantalla', dato)
+
+        elif tipo == 'muestra':
+            with engine.connect() as conn:
+                conteos = {estado: int(cantidad) for estado, cantidad in conn.execute(repo.CONTAR_POR_ESTADO, {"sede": SEDE})}
+            muestras.append({
+                'minuto': round(t / 60),
+                'espera': conteos.get('espera', 0),
+                'llamando': conteos.get('llamando', 0),
+            })
+            programar(t + MUESTREO_COLA, 'muestra')
+
+    segundos_reales = time.perf_counter() - inicio_real
+    operaciones = registro.resumen()
+    segundos_ocupado = sum(datos['segundos_total'] for datos in operaciones.values())
+    sentencias = sum(datos['sentencias'] for datos in operaciones.values())
+    utilizacion = segundos_ocupado / fin
+    return {
+        'parametros': {clave: valor for clave, valor in vars(args).items() if clave != 'salida'},
+        'llegadas': len(llegadas),
+        'atendidos': atendidos,
+        'en_cola_al_cierre': muestras[-1]['espera'] if muestras else None,
+        'espera_min_p50': round(_percentil(esperas, 50), 1) if esperas else None,
+        'espera_min_p95': round(_percentil(esperas, 95), 1) if esperas else None,
+        'sentencias_por_segundo': round(sentencias / fin, 2),
+        'utilizacion': round(utilizacion, 4),
+        'escala_maxima_estimada': round(args.escala / utilizacion, 1) if utilizacion else None,
+        'segundos_reales': round(segundos_reales, 1),
+        'operaciones': operaciones,
+        'cola': muestras,
+    }
+
+
+def _imprimir(resultados):
+    print(f"\n{'operación':<16} {'ejec.':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sent.':>8}")
+    for operacion, datos in resultados['operaciones'].items():
+        print(f"{operacion:<16} {datos['ejecuciones']:>7} {datos['ms_p50']:>9.3f} {datos['ms_p95']:>9.3f} "
+              f"{datos['ms_p99']:>9.3f} {datos['sentencias']:>8}")
+
+    print("\n⏳ Cola por hora (espera / en atención):")
+    for muestra in resultados['cola']:
+        if muestra['minuto'] % 60 == 0:
+            print(f"   h+{muestra['minuto'] // 60:<2} {muestra['espera']:>5} / {muestra['llamando']}")
+
+    print(f"\n🚶 Llegadas: {resultados['llegadas']}  ✅ Atendidos: {resultados['atendidos']}  "
+          f"⏳ En cola al cierre: {resultados['en_cola_al_cierre']}")
+    print(f"⏱️ Espera hasta el llamado: p50 {resultados['espera_min_p50']} min, p95 {resultados['espera_min_p95']} min")
+    print(f"🗄️ {resultados['sentencias_por_segundo']} sentencias/s simulado, utilización "
+          f"{resultados['utilizacion'] * 100:.1f}% -> escala máxima estimada x{resultados['escala_maxima_estimada']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulación de carga de un día de atención")
+    parser.add_argument("--horas", type=float, default=9, help="Horas simuladas desde la primera hora de la curva")
+    parser.add_argument("--curva", default=CURVA_POR_DEFECTO, help="Llegadas por hora, 'hora:llegadas,...'")
+    parser.add_argument("--escala", type=float, default=1.0, help="Multiplicador de la curva de llegadas")
+    parser.add_argument("--taquillas", type=int, default=8, help="Taquillas atendiendo")
+    parser.add_argument("--pantallas", type=int, default=4, help="Pantallas de TV consultando el tablero")
+    parser.add_argument("--servicio-min", type=float, default=4, help="Minutos promedio de atención")
+    parser.add_argument("--distribucion", choices=['lognormal', 'exponencial', 'fija'], default='lognormal',
+                        help="Distribución del tiempo de atención")
+    parser.add_argument("--intervalo-worker", type=float, default=None, help="Segundos entre ciclos del worker (WORKER_INTERVALO)")
+    parser.add_argument("--historico", type=int, default=50000, help="Turnos históricos sembrados")
+    parser.add_argument("--semilla", type=int, default=7, help="Semilla de los números aleatorios")
+    parser.add_argument("--salida", default="simulacion_resultados.json", help="Archivo JSON de resultados")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="simulacion_turnos_")
+    url = f"sqlite:///{os.path.join(directorio, 'simulacion.db')}"
+    os.environ['DATABASE_URL'] = url
+    os.environ['EXTERNAL_DATABASE_URL'] = url
+    # La tabla externa local tiene id creciente: sincronización incremental como en producción
+    os.environ.setdefault('EXTERNAL_CURSOR_COLUMN', 'id')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    # Los módulos de config se importan después de fijar la base y el nivel de log
+    from config.conexiones import cerrar_engines
+
+    try:
+        resultados = simular(args)
+    finally:
+        cerrar_engines()
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    _imprimir(resultados)
+    with open(args.salida, "w", encoding="utf-8") as archivo:
+        json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+    print(f"📄 Resultados en {args.salida}")
+    sys.exit(0)
@@ -0,0 +1,154 @@
+"""
+Prueba de concurrencia del llamado de turnos
+Uso: python test_concurrencia_taquillas.py [--taquillas 8] [--turnos 80] [--url mysql+mysqlconnector://...]
+     pytest test_concurrencia_taquillas.py
+Crea turnos de prueba (módulo T), lanza varias taquillas en hilos paralelos que
+llaman y atienden hasta vaciar la cola, y verifica que ningún turno se llame dos
+veces y que ninguna taquilla tenga dos turnos activos.
+Corre sobre una base aislada (config/base_local.base_de_prueba): por defecto una
+SQLite temporal, nunca la base del .env. En SQLite BEGIN IMMEDIATE serializa todas
+las transacciones, así que la prueba verifica la lógica del llamado pero no ejercita
+FOR UPDATE SKIP LOCKED; para eso hay que pasar --url con una base MySQL de pruebas
+(sin turnos reales en espera; sus datos se borran al terminar).
+"""
+
+import sys
+import argparse
+import threading
+from collections import Counter
+from sqlalchemy import text
+from datetime import date
+from config.database import SEDE, llamar_siguiente_turno, marcar_turno_atendido, reconstruir_contadores_estado
+from config.base_local import base_de_prueba
+
+PREFIJO_PRUEBA = 'PRUEBA-CONC-'
+
+
+def _preparar_turnos(engine, num_turnos):
+    """Inserta los turnos de prueba; falla si hay turnos reales en espera"""
+    with engine.connect() as conn:
+        reales = conn.execute(
+            text("""
+            SELECT COUNT(*) FROM turnos
+            WHERE sede = :sede AND estado IN ('espera', 'llamando') AND cedula_usuario NOT LIKE :prefijo
+            """),
+            {"sede": SEDE, "prefijo": f"{PREFIJO_PRUEBA}%"}
+        ).scalar()
+        assert not reales, f"Hay {reales} turnos reales en espera o en atención; usa una base de pruebas"
+
+        for i in range(1, num_turnos + 1):
+            conn.execute(
+                text("""
+                INSERT INTO turnos (sede, modulo, numero_turno, estado, nombre_usuario, cedula_usuario, tipo_tramite)
+                VALUES (:sede, 'T', :numero, 'espera', :nombre, :cedula, 'Prueba concurrencia')
+                """),
+                {"sede": SEDE, "numero": f"{i:03d}", "nombre": f"Prueba {i}", "cedula": f"{PREFIJO_PRUEBA}{i}"}
+            )
+        conn.commit()
+
+
+def _limpiar(engine):
+    """Borra los turnos de prueba y sus llamados recientes (para que no queden en las pantallas)"""
+    with engine.connect() as conn:
+        conn.execute(
+            text("""
+            DELETE FROM llamados_recientes
+            WHERE turno_id IN (SELECT id FROM turnos WHERE cedula_usuario LIKE :prefijo)
+            """),
+            {"prefijo": f"{PREFIJO_PRUEBA}%"}
+        )
+        conn.execute(text("DELETE FROM turnos WHERE cedula_usuario LIKE :prefijo"), {"prefijo": f"{PREFIJO_PRUEBA}%"})
+        conn.commit()
+    # Los turnos de prueba se insertan sin pasar por los contadores por estado
+    reconstruir_contadores_estado(date.today())
+
+
+def _taquillas_en_paralelo(num_taquillas, num_turnos, engine):
+    """Varias taquillas vacían la cola a la vez: cada turno se llama exactamente una vez"""
+    _preparar_turnos(engine, num_turnos)
+    llamados = []
+    errores = []
+    lock = threading.Lock()
+    inicio = threading.Barrier(num_taquillas)
+
+    def taquilla_worker(nombre):
+        inicio.wait()
+        while True:
+            turno, turno_id, mensaje, _, _ = llamar_siguiente_turno(nombre)
+            if not turno:
+                if mensaje.startswith("❌"):
+                    with lock:
+                        errores.append((nombre, mensaje))
+                return
+            with lock:
+                llamados.append((nombre, turno_id))
+            marcar_turno_atendido(turno_id)
+
+    hilos = [
+        threading.Thread(target=taquilla_worker, args=(f"Prueba {i}",))
+        for i in range(1, num_taquillas + 1)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    repetidos = [turno_id for turno_id, veces in Counter(t for _, t in llamados).items() if veces > 1]
+    assert not repetidos, f"Turnos llamados más de una vez: {repetidos}"
+    assert len(llamados) == num_turnos, f"Se llamaron {len(llamados)} de {num_turnos} turnos"
+    assert not errores, f"Errores en taquillas: {errores[:5]}"
+    print(f"   ✅ {num_turnos} turnos llamados exactamente una vez por {num_taquillas} taquillas")
+
+
+def _clics_misma_taquilla(engine):
+    """Dos (o más) clics simultáneos desde la MISMA taquilla: solo uno puede quedar activo"""
+    _preparar_turnos(engine, 4)
+    resultados = []
+    lock = threading.Lock()
+    doble = threading.Barrier(4)
+
+    def clic_misma_taquilla():
+        doble.wait()
+        resultado = llamar_siguiente_turno("Prueba doble")
+        with lock:
+            resultados.append(resultado)
+
+    hilos = [threading.Thread(target=clic_misma_taquilla) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    exitos = [r for r in resultados if r[0]]
+    assert len(exitos) == 1, f"La misma taquilla obtuvo {len(exitos)} turnos activos"
+    print("   ✅ Una taquilla solo obtiene un turno activo con clics simultáneos")
+
+
+def test_concurrencia_taquillas(num_taquillas=8, num_turnos=80, url=None):
+    """Falla (AssertionError) si algún turno se llama dos veces o una taquilla queda con dos activos"""
+    print("🔍 PRUEBA DE CONCURRENCIA DE TAQUILLAS")
+    with base_de_prueba(url) as engine:
+        assert engine, "No hay conexión a la base de pruebas"
+        try:
+            _taquillas_en_paralelo(num_taquillas, num_turnos, engine)
+            _limpiar(engine)
+            _clics_misma_taquilla(engine)
+        finally:
+            _limpiar(engine)
+    print("✅ PRUEBA SUPERADA")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrencia del llamado de turnos sobre una base aislada")
+    parser.add_argument("--taquillas", type=int, default=8, help="Taquillas en paralelo")
+    parser.add_argument("--turnos", type=int, default=80, help="Turnos de prueba")
+    parser.add_argument("--url", default=None, help="Base de pruebas (p. ej. MySQL para ejercitar SKIP LOCKED); por defecto una SQLite temporal")
+    args = parser.parse_args()
+
+    try:
+        test_concurrencia_taquillas(args.taquillas, args.turnos, args.url)
+    except AssertionError as e:
+        print(f"❌ {e}")
+        print("❌ PRUEBA FALLIDA")
+        sys.exit(1)
+    sys.exit(0)
@@ -0,0 +1,113 @@
+"""
+Prueba de planes de ejecución de las consultas del repositorio
+Uso: python test_planes_consultas.py [--sembrar 10000] [--url mysql+mysqlconnector://...]
+     pytest test_planes_consultas.py
+Corre EXPLAIN sobre cada consulta registrada en config/repositorio.py y falla si
+alguna recorre la tabla turnos completa (type = ALL; en SQLite, EXPLAIN QUERY PLAN
+con 'SCAN turnos' sin índice).
+Con pocas filas MySQL prefiere el recorrido completo aunque exista índice, por eso
+se siembran turnos atendidos de días anteriores (cédula PLAN-...) que se borran al terminar.
+Corre sobre una base aislada (config/base_local.base_de_prueba): por defecto una
+SQLite temporal, nunca la base del .env; con --url, una base de pruebas (p. ej. MySQL
+para revisar sus planes reales).
+"""
+
+import sys
+import argparse
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from config.database import SEDE
+from config.base_local import base_de_prueba
+from config.repositorio import CONSULTAS
+from config.dialectos import es_sqlite
+from config.diagnostico import explicar
+
+PREFIJO_PRUEBA = 'PLAN-'
+TABLAS_VIGILADAS = ('turnos',)
+
+
+def _sembrar(engine, cantidad):
+    """Inserta `cantidad` turnos históricos de prueba repartidos en los últimos 60 días"""
+    ahora = datetime.now()
+    filas = [
+        {
+            "sede": SEDE,
+            "modulo": 'A' if i % 2 else 'P',
+            "numero": f"{i % 1000:03d}",
+            "cedula": f"{PREFIJO_PRUEBA}{i}",
+            "taquilla": f"Taquilla {i % 8 + 1}",
+            "fecha": ahora - timedelta(days=1 + i % 60, minutes=i % 600),
+        }
+        for i in range(cantidad)
+    ]
+    with engine.connect() as conn:
+        for i in range(0, len(filas), 1000):
+            conn.execute(
+                text("""
+                INSERT INTO turnos
+                (sede, modulo, numero_turno, estado, nombre_usuario, cedula_usuario, tipo_tramite,
+                 taquilla_asignada, fecha_creacion, fecha_llamado)
+                VALUES (:sede, :modulo, :numero, 'atendido', 'Prueba plan', :cedula, 'Prueba plan',
+                        :taquilla, :fecha, :fecha)
+                """),
+                filas[i:i + 1000]
+            )
+        conn.commit()
+        conn.execute(text("ANALYZE turnos" if es_sqlite(conn) else "ANALYZE TABLE turnos"))
+        conn.commit()
+    print(f"🌱 {cantidad} turnos de prueba sembrados")
+
+
+def _limpiar(engine):
+    with engine.connect() as conn:
+        conn.execute(text("DELETE FROM turnos WHERE cedula_usuario LIKE :prefijo"), {"prefijo": f"{PREFIJO_PRUEBA}%"})
+        conn.commit()
+
+
+def test_planes_consultas(sembrar=10000, url=None):
+    """Falla (AssertionError) si alguna consulta recorre completas las tablas vigiladas"""
+    print("🔍 PRUEBA DE PLANES DE CONSULTA")
+    with base_de_prueba(url) as engine:
+        assert engine, "No hay conexión a la base de pruebas"
+        try:
+            if sembrar:
+                _sembrar(engine, sembrar)
+
+            fallas = []
+            with engine.connect() as conn:
+                for nombre, (consulta, params) in CONSULTAS.items():
+                    try:
+                        plan = explicar(conn, consulta, params)
+                    except Exception as e:
+                        fallas.append(f"{nombre}: no se pudo explicar ({e})")
+                        continue
+
+                    for fila in plan:
+                        tabla = fila.get('table')
+                        resumen = f"{tabla} type={fila.get('type')} key={fila.get('key')} rows={fila.get('rows')}"
+                        if tabla in TABLAS_VIGILADAS and fila.get('type') == 'ALL':
+                            fallas.append(f"{nombre}: recorrido completo -> {resumen}")
+                        else:
+                            print(f"   ✅ {nombre}: {resumen}")
+                conn.rollback()
+        finally:
+            if sembrar:
+                _limpiar(engine)
+
+    assert not fallas, "\n".join(fallas)
+    print("✅ PRUEBA SUPERADA")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN de las consultas del repositorio sobre una base aislada")
+    parser.add_argument("--sembrar", type=int, default=10000, help="Turnos históricos de prueba a insertar (0 para no sembrar)")
+    parser.add_argument("--url", default=None, help="Base de pruebas (p. ej. MySQL); por defecto una SQLite temporal")
+    args = parser.parse_args()
+
+    try:
+        test_planes_consultas(args.sembrar, args.url)
+    except AssertionError as e:
+        print(f"❌ {e}")
+        print("❌ PRUEBA FALLIDA")
+        sys.exit(1)
+    sys.exit(0)
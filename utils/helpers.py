@@ -1,5 +1,6 @@
 import streamlit as st
 from datetime import datetime
+from config.database import SEDE, SEDES
 
 def format_turno(modulo, numero_turno):
     """
@@ -11,7 +12,7 @@ def get_taquillas_disponibles():
     """
     Retorna lista de taquillas disponibles
     """
-    return [f"Taquilla {i}" for i in range(1, 6)]
+    return [f"Taquilla {i}" for i in range(1, 9)]
 
 def get_modulos_disponibles():
     """
@@ -19,6 +20,18 @@ def get_modulos_disponibles():
     """
     return ["A", "L", "P", "C", "S"]
 
+def seleccionar_sede():
+    """
+    Sede de la página: ?sede=... en la URL (así cada pantalla de TV queda fija
+    en su oficina) o, si hay varias sedes configuradas, un selector en la barra lateral
+    """
+    sede = st.query_params.get("sede")
+    if sede:
+        return sede
+    if len(SEDES) <= 1:
+        return SEDES[0] if SEDES else SEDE
+    return st.sidebar.selectbox("🏢 Sede", SEDES, index=SEDES.index(SEDE) if SEDE in SEDES else 0)
+
 def setup_page_config(title, layout="centered"):
     """
     Configuración básica de la página
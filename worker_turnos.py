@@ -0,0 +1,45 @@
+"""
+Worker de asignación de turnos en segundo plano
+Uso: python worker_turnos.py [--intervalo 5] [--jitter 1] [--una-vez] [--completo]
+Sincroniza la vista externa con la tabla de control y asigna turnos cada intervalo,
+para que las páginas de Streamlit solo lean resultados.
+Si se ejecuta aparte, configurar WORKER_EN_PROCESO=0 en el servicio de Streamlit.
+"""
+
+import argparse
+import signal
+from config.worker import (
+    ejecutar_ciclo, ejecutar_bucle, detener_worker,
+    WORKER_INTERVALO, WORKER_JITTER, WORKER_BACKOFF_MAX
+)
+from config.conexiones import cerrar_engines
+from config.metricas import iniciar_servidor_metricas
+
+
+def _manejar_senal(signum, frame):
+    print("\n🛑 Señal recibida, deteniendo worker...")
+    detener_worker()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker de sincronización y asignación de turnos")
+    parser.add_argument("--intervalo", type=float, default=WORKER_INTERVALO, help="Segundos entre ciclos")
+    parser.add_argument("--jitter", type=float, default=WORKER_JITTER, help="Segundos aleatorios añadidos a cada espera")
+    parser.add_argument("--backoff-max", type=float, default=WORKER_BACKOFF_MAX, help="Espera máxima tras errores")
+    parser.add_argument("--una-vez", action="store_true", help="Ejecuta un solo ciclo y termina")
+    parser.add_argument("--completo", action="store_true", help="Con --una-vez, relee el día completo (reconciliación)")
+    args = parser.parse_args()
+
+    try:
+        if args.una_vez:
+            asignados = ejecutar_ciclo(modo='completo' if args.completo else None)
+            print(f"✅ Ciclo completado: {asignados} turnos asignados")
+        else:
+            iniciar_servidor_metricas()
+            signal.signal(signal.SIGTERM, _manejar_senal)
+            signal.signal(signal.SIGINT, _manejar_senal)
+            print(f"🚀 Worker iniciado: cada {args.intervalo}s (+{args.jitter}s jitter), backoff máx {args.backoff_max}s")
+            ejecutar_bucle(args.intervalo, args.jitter, args.backoff_max)
+            print("✅ Worker detenido")
+    finally:
+        cerrar_engines()